@@ -1,11 +1,27 @@
 import argparse
+import functools
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import tracemalloc
 from configparser import ConfigParser
 
 from swisscom_ai.research_keyphrase.embeddings.emb_distrib_local import EmbeddingDistributorLocal
+from swisscom_ai.research_keyphrase.embeddings.emb_distrib_preload import EmbeddingDistributorPreload
 from swisscom_ai.research_keyphrase.model.input_representation import InputTextObj
-from swisscom_ai.research_keyphrase.model.method import MMRPhrase
+from swisscom_ai.research_keyphrase.model.method import MMRPhrase, MMRPhraseBatch
 from swisscom_ai.research_keyphrase.preprocessing.postagging import PosTaggingCoreNLP
+from swisscom_ai.research_keyphrase.preprocessing.postagging_cache import PosTaggingCache
+from swisscom_ai.research_keyphrase.util.corpus import read_corpus, read_done_ids
 from swisscom_ai.research_keyphrase.util.fileIO import read_file
+from swisscom_ai.research_keyphrase.util.instrumentation import MetricsRegistry, add_callback, stage
+
+# State of the corpus extraction worker processes : the embedding distributor is set before the pool is forked (and
+# shared copy-on-write), the pos tagger is created in each worker
+_worker_state = {}
 
 
 def extract_keyphrases(embedding_distrib, ptagger, raw_text, N, lang, beta=0.55, alias_threshold=0.7):
@@ -24,44 +40,266 @@ def extract_keyphrases(embedding_distrib, ptagger, raw_text, N, lang, beta=0.55,
     2)list of associated relevance scores (list of float)
     3)list containing for each keyphrase a list of alias (list of list of string)
     """
-    tagged = ptagger.pos_tag_raw_text(raw_text)
-    text_obj = InputTextObj(tagged, lang)
+    with stage('tagging', nb_chars=len(raw_text)):
+        tagged = ptagger.pos_tag_raw_text(raw_text)
+    with stage('input_representation') as s:
+        text_obj = InputTextObj(tagged, lang)
+        s.record(nb_tokens=len(text_obj.tokens))
     return MMRPhrase(embedding_distrib, text_obj, N=N, beta=beta, alias_threshold=alias_threshold)
 
 
-def load_local_embedding_distributor():
+def extract_keyphrases_batch(embedding_distrib, ptagger, raw_texts, N, lang, beta=0.55, alias_threshold=0.7):
+    """
+    Method that extract a set of keyphrases for each document of a batch.
+    The embeddings of the whole batch are computed in one call, the output is the same as calling
+    @extract_keyphrases on each document.
+
+    :param embedding_distrib: An Embedding Distributor object see @EmbeddingDistributor
+    :param ptagger: A Pos Tagger object see @PosTagger
+    :param raw_texts: A list of strings containing the raw texts to extract
+    :param N: The number of keyphrases to extract per document
+    :param lang: The language
+    :param beta: beta factor for MMR (tradeoff informativness/diversity)
+    :param alias_threshold: threshold to group candidates as aliases
+    :return: A list containing for each document the tuple returned by @extract_keyphrases
+    """
+    with stage('tagging', nb_docs=len(raw_texts)):
+        tagged_texts = [ptagger.pos_tag_raw_text(raw_text) for raw_text in raw_texts]
+    with stage('input_representation', nb_docs=len(raw_texts)):
+        text_objs = [InputTextObj(tagged, lang) for tagged in tagged_texts]
+    return MMRPhraseBatch(embedding_distrib, text_objs, N=N, beta=beta, alias_threshold=alias_threshold)
+
+
+def load_local_embedding_distributor(preload=False):
+    """
+    :param preload: if true load the model in a background thread and return immediately, the first embedding
+    request waits for the model (see @EmbeddingDistributorPreload)
+    """
     config_parser = ConfigParser()
     config_parser.read('config.ini')
     sent2vec_model_path = config_parser.get('SENT2VEC', 'model_path')
+    if preload:
+        return EmbeddingDistributorPreload(EmbeddingDistributorLocal, sent2vec_model_path)
     return EmbeddingDistributorLocal(sent2vec_model_path)
 
 
-def load_local_corenlp_pos_tagger():
+def load_local_corenlp_pos_tagger(host=None, port=None):
     config_parser = ConfigParser()
     config_parser.read('config.ini')
-    host = config_parser.get('STANFORDCORENLPTAGGER', 'host')
-    port = config_parser.get('STANFORDCORENLPTAGGER', 'port')
+    if host is None:
+        host = config_parser.get('STANFORDCORENLPTAGGER', 'host')
+    if port is None:
+        port = config_parser.get('STANFORDCORENLPTAGGER', 'port')
     return PosTaggingCoreNLP(host, port)
 
 
+def load_tagging_cache(pos_tagger, cache_dir, lang, max_size_mb=1024):
+    return PosTaggingCache(pos_tagger, cache_dir, lang=lang, max_size=int(max_size_mb * 1024 ** 2))
+
+
+def extract_corpus(embedding_distrib, corpus_path, output_path, N, lang, beta=0.55, alias_threshold=0.7,
+                   tagger_host=None, tagger_port=None, workers=None, max_in_flight=None, resume=False, ordered=False,
+                   tag_cache=None, tag_cache_size=1024):
+    """
+    Extract keyphrases for each document of a corpus with a pool of worker processes and write the results
+    as JSONL (one line per document, written as soon as it is available).
+    The pool is forked after the embedding distributor has been loaded, s.t. the model is shared by the workers.
+
+    :param embedding_distrib: An Embedding Distributor object see @EmbeddingDistributor
+    :param corpus_path: directory, JSONL file or file listing the documents see @read_corpus
+    :param output_path: path of the JSONL output file
+    :param N: The number of keyphrases to extract per document
+    :param lang: The language
+    :param beta: beta factor for MMR (tradeoff informativness/diversity)
+    :param alias_threshold: threshold to group candidates as aliases
+    :param tagger_host: CoreNLP host (default taken from config.ini)
+    :param tagger_port: CoreNLP port (default taken from config.ini)
+    :param workers: number of worker processes (default number of CPUs)
+    :param max_in_flight: maximum number of documents submitted but not written yet (default 2 * workers)
+    :param resume: if true skip the documents already in the output file (except the failed ones) and append the new
+    results
+    :param ordered: if true write the results in the order of the corpus (otherwise in order of completion)
+    :param tag_cache: directory of the POS tagging cache (optional) see @PosTaggingCache
+    :param tag_cache_size: maximum size of the POS tagging cache in MB
+    :return: number of documents submitted
+    """
+    workers = workers or os.cpu_count()
+    max_in_flight = max_in_flight or 2 * workers
+    done_ids = read_done_ids(output_path) if resume else set()
+
+    _worker_state['embedding_distrib'] = embedding_distrib
+    results = queue.Queue()
+    in_flight = threading.BoundedSemaphore(max_in_flight)
+    pool = multiprocessing.get_context('fork').Pool(workers, initializer=_init_worker,
+                                                    initargs=(tagger_host, tagger_port, lang, tag_cache,
+                                                              tag_cache_size))
+    writer_error = []
+    with open(output_path, 'a' if resume else 'w') as output_file:
+        writer = threading.Thread(target=_write_results,
+                                  args=(results, output_file, ordered, in_flight, writer_error))
+        writer.start()
+        nb_docs = 0
+        try:
+            for doc_id, raw_text in read_corpus(corpus_path):
+                if doc_id in done_ids:
+                    continue
+                # The writer releases a slot per written result, stop if it died
+                while not in_flight.acquire(timeout=0.1):
+                    if writer_error:
+                        break
+                if writer_error:
+                    break
+                pool.apply_async(_extract_document, (doc_id, raw_text, N, lang, beta, alias_threshold),
+                                 callback=functools.partial(_put_result, results, nb_docs),
+                                 error_callback=functools.partial(_put_error, results, nb_docs, doc_id))
+                nb_docs += 1
+        finally:
+            pool.close()
+            pool.join()
+            results.put(None)
+            writer.join()
+    if writer_error:
+        raise RuntimeError('Writing the results to {} failed'.format(output_path)) from writer_error[0]
+    return nb_docs
+
+
+def _init_worker(tagger_host, tagger_port, lang, tag_cache, tag_cache_size):
+    pos_tagger = load_local_corenlp_pos_tagger(tagger_host, tagger_port)
+    if tag_cache:
+        pos_tagger = load_tagging_cache(pos_tagger, tag_cache, lang, tag_cache_size)
+    _worker_state['pos_tagger'] = pos_tagger
+
+
+def _extract_document(doc_id, raw_text, N, lang, beta, alias_threshold):
+    start = time.time()
+    try:
+        tagged = _worker_state['pos_tagger'].pos_tag_raw_text(raw_text)
+        tagging_time = time.time() - start
+        text_obj = InputTextObj(tagged, lang)
+        keyphrases, relevance, aliases = MMRPhrase(_worker_state['embedding_distrib'], text_obj, N=N, beta=beta,
+                                                   alias_threshold=alias_threshold)
+    except Exception as e:
+        return {'id': doc_id, 'error': repr(e), 'timings': {'total': time.time() - start}}
+
+    return {'id': doc_id, 'keyphrases': keyphrases, 'relevance': relevance, 'aliases': aliases,
+            'timings': {'tagging': tagging_time, 'extraction': time.time() - start - tagging_time,
+                        'total': time.time() - start}}
+
+
+def _put_result(results, idx, record):
+    results.put((idx, record))
+
+
+def _put_error(results, idx, doc_id, error):
+    results.put((idx, {'id': doc_id, 'error': repr(error)}))
+
+
+def _write_results(results, output_file, ordered, in_flight, writer_error):
+    pending = {}  # idx -> record, results waiting for the previous ones when ordered
+    next_idx = 0
+    try:
+        while True:
+            item = results.get()
+            if item is None:
+                break
+            idx, record = item
+            if not ordered:
+                _write_record(output_file, record, in_flight)
+                continue
+            pending[idx] = record
+            while next_idx in pending:
+                _write_record(output_file, pending.pop(next_idx), in_flight)
+                next_idx += 1
+    except Exception as e:
+        writer_error.append(e)  # Checked by the submitting loop of @extract_corpus
+
+
+def _write_record(output_file, record, in_flight):
+    output_file.write(json.dumps(record) + '\n')
+    output_file.flush()
+    in_flight.release()
+
+
+def _run(args, parser):
+    """
+    Run the command line with the parsed arguments
+    """
+    # The model is loaded while the text is POS tagged
+    embedding_distributor = load_local_embedding_distributor(preload=True)
+
+    if args.corpus:
+        if not args.output:
+            parser.error('-output is required with -corpus')
+        # The worker processes share the loaded model
+        nb_written = extract_corpus(embedding_distributor.wait(), args.corpus, args.output, args.N, args.lang,
+                                    tagger_host=args.tagger_host, tagger_port=args.tagger_port, workers=args.workers,
+                                    max_in_flight=args.max_in_flight, resume=args.resume, ordered=args.ordered,
+                                    tag_cache=args.tag_cache, tag_cache_size=args.tag_cache_size)
+        print('Processed', nb_written, 'documents')
+    else:
+        if args.text_file:
+            raw_text = read_file(args.text_file)
+        else:
+            raw_text = args.raw_text
+
+        pos_tagger = load_local_corenlp_pos_tagger(args.tagger_host, args.tagger_port)
+        if args.tag_cache:
+            pos_tagger = load_tagging_cache(pos_tagger, args.tag_cache, args.lang, args.tag_cache_size)
+        print(extract_keyphrases(embedding_distributor, pos_tagger, raw_text, args.N, args.lang))
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Extract keyphrases from raw text')
 
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument('-raw_text', help='raw text to process')
     group.add_argument('-text_file', help='file containing the raw text to process')
-    
+    group.add_argument('-corpus', help='directory, JSONL file (id and text fields) or file listing the documents '
+                                       'to process, the results are written to -output')
 
     parser.add_argument('-tagger_host', help='CoreNLP host', default='localhost')
     parser.add_argument('-tagger_port', help='CoreNLP port', default=9000)
     parser.add_argument('-N', help='number of keyphrases to extract', required=True, type=int)
+    parser.add_argument('-lang', help='language of the text', default='en')
+    parser.add_argument('-output', help='JSONL output file (corpus mode)')
+    parser.add_argument('-workers', help='number of worker processes (corpus mode)', type=int)
+    parser.add_argument('-max_in_flight', help='maximum number of documents being processed (corpus mode)', type=int)
+    parser.add_argument('-resume', help='skip the documents already in the output (corpus mode)', action='store_true')
+    parser.add_argument('-ordered', help='write the results in the corpus order (corpus mode)', action='store_true')
+    parser.add_argument('-tag_cache', help='directory of the POS tagging cache (reused across runs)')
+    parser.add_argument('-tag_cache_size', help='maximum size of the POS tagging cache in MB', type=float,
+                        default=1024)
+    parser.add_argument('-stage_metrics', help='print the time and metrics of each extraction stage (not collected '
+                                               'in the worker processes of the corpus mode)', action='store_true')
+    parser.add_argument('-profile', help='write the cProfile statistics of the run to this file (see pstats)')
+    parser.add_argument('-tracemalloc', help='write a tracemalloc snapshot of the memory allocated at the end of the '
+                                             'run to this file and print the top allocations')
     args = parser.parse_args()
 
-    if args.text_file:
-        raw_text = read_file(args.text_file)
-    else:
-        raw_text = args.raw_text
+    registry = None
+    if args.stage_metrics:
+        registry = MetricsRegistry()
+        add_callback(registry)
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    if args.tracemalloc:
+        tracemalloc.start()
 
-    embedding_distributor = load_local_embedding_distributor()
-    pos_tagger = load_local_corenlp_pos_tagger(args.tagger_host, args.tagger_port)
-    print(extract_keyphrases(embedding_distributor, pos_tagger, raw_text, args.N, 'en'))
+    try:
+        _run(args, parser)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if args.tracemalloc:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            snapshot.dump(args.tracemalloc)
+            print('Top allocations :')
+            for statistic in snapshot.statistics('lineno')[:10]:
+                print(statistic)
+        if registry is not None:
+            print(registry.report())
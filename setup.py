@@ -48,6 +48,6 @@ setup(
     # $ pip install -e .[dev,test]
     extras_require={
         'dev': [],
-        'test': [],
+        'test': ['pytest', 'hypothesis'],
     },
 )
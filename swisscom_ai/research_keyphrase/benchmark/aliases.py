@@ -0,0 +1,79 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Microbenchmark of get_aliases on synthetic similarity matrices"""
+
+import argparse
+import time
+
+import numpy as np
+
+from swisscom_ai.research_keyphrase.model.method import get_aliases
+
+
+def get_aliases_reference(kp_sim_between, candidates, threshold):
+    """Previous implementation of @get_aliases (full sort of each row, walked in python until the threshold)"""
+    kp_sim_between = np.nan_to_num(kp_sim_between)
+    idx_sorted = np.flip(np.argsort(kp_sim_between), 1)
+    aliases = []
+    for kp_idx, item in enumerate(idx_sorted):
+        alias_for_item = []
+        for i in item:
+            if kp_sim_between[kp_idx, i] >= threshold:
+                alias_for_item.append(candidates[i])
+            else:
+                break
+        aliases.append(alias_for_item)
+    return aliases
+
+
+def synthetic_similarities(nb_keyphrases, nb_candidates, seed=0):
+    """
+    :return: ndarray of shape (nb_keyphrases, nb_candidates) of similarities in [-1, 1] (rounded s.t. there are ties)
+    and NaN for the similarity of each keyphrase with itself
+    """
+    rng = np.random.RandomState(seed)
+    kp_sim_between = np.round(np.tanh(rng.randn(nb_keyphrases, nb_candidates)), 3)
+    kp_sim_between[np.arange(nb_keyphrases), np.arange(nb_keyphrases)] = np.nan
+    return kp_sim_between
+
+
+def benchmark_aliases(sizes, nb_keyphrases=10, threshold=0.7, repeat=10):
+    """
+    :param sizes: list of numbers of candidates
+    :return: list of dict (one per size) with the mean timings in seconds of both implementations, whether they find
+    the same aliases for each keyphrase and whether they are in the same order (the previous implementation used an
+    unstable sort, the order of aliases with equal similarities may differ)
+    """
+    results = []
+    for size in sizes:
+        kp_sim_between = synthetic_similarities(nb_keyphrases, size)
+        candidates = np.array(['candidate{}'.format(i) for i in range(size)])
+
+        start = time.time()
+        for _ in range(repeat):
+            aliases = get_aliases(kp_sim_between, candidates, threshold)
+        aliases_time = (time.time() - start) / repeat
+
+        start = time.time()
+        for _ in range(repeat):
+            reference = get_aliases_reference(kp_sim_between, candidates, threshold)
+        reference_time = (time.time() - start) / repeat
+
+        results.append({'nb_candidates': size, 'time': aliases_time, 'reference_time': reference_time,
+                        'same_aliases': [sorted(kp_aliases) for kp_aliases in aliases] ==
+                        [sorted(kp_aliases) for kp_aliases in reference],
+                        'same_order': aliases == reference})
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Microbenchmark of get_aliases')
+    parser.add_argument('-sizes', help='numbers of candidates', nargs='+', type=int, default=[100, 1000, 10000])
+    parser.add_argument('-threshold', help='alias threshold', default=0.7, type=float)
+    args = parser.parse_args()
+
+    for res in benchmark_aliases(args.sizes, threshold=args.threshold):
+        print(res)
@@ -0,0 +1,59 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Compare the throughput of the per-document and the packed CoreNLP POS tagging (a CoreNLP server must be running)"""
+
+import argparse
+import time
+
+from swisscom_ai.research_keyphrase.preprocessing.postagging import PosTaggingCoreNLP, PACKED_MAX_CHARS
+from swisscom_ai.research_keyphrase.util.fileIO import read_file
+
+
+def benchmark_packing(pos_tagger, texts, max_chars=PACKED_MAX_CHARS):
+    """
+    :param pos_tagger: @PosTaggingCoreNLP object
+    :param texts: list of string to POS tag
+    :param max_chars: @see PosTaggingCoreNLP.pos_tag_raw_texts
+    :return: dict with the throughput (documents per second) of both paths and whether their outputs are identical
+    """
+    start = time.time()
+    per_doc = [pos_tagger.pos_tag_raw_text(text) for text in texts]
+    per_doc_time = time.time() - start
+
+    start = time.time()
+    packed = pos_tagger.pos_tag_raw_texts(texts, max_chars=max_chars)
+    packed_time = time.time() - start
+
+    return {'nb_docs': len(texts),
+            'per_doc_docs_per_sec': len(texts) / per_doc_time,
+            'packed_docs_per_sec': len(texts) / packed_time,
+            'speedup': per_doc_time / packed_time,
+            'identical': per_doc == packed}
+
+
+def synthetic_texts(nb_docs):
+    sentences = ['The mobile network was upgraded last year.', 'Customer service answers in three languages',
+                 'Prices of the new subscription plans are lower than expected!', 'Is the data plan unlimited?']
+    return [' '.join(sentences[(i + j) % len(sentences)] for j in range(1 + i % 3)) for i in range(nb_docs)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare per-document and packed CoreNLP POS tagging')
+    parser.add_argument('-tagger_host', help='CoreNLP host', default='localhost')
+    parser.add_argument('-tagger_port', help='CoreNLP port', default=9000)
+    parser.add_argument('-listing_file_path', help='file containing in each row a path to a file to POS tag '
+                                                   '(synthetic documents are used if not set)')
+    parser.add_argument('-nb_docs', help='number of synthetic documents', default=500, type=int)
+    parser.add_argument('-max_chars', help='maximum number of characters of a packed request',
+                        default=PACKED_MAX_CHARS, type=int)
+    args = parser.parse_args()
+
+    if args.listing_file_path:
+        docs = [read_file(path) for path in read_file(args.listing_file_path).splitlines()]
+    else:
+        docs = synthetic_texts(args.nb_docs)
+
+    print(benchmark_packing(PosTaggingCoreNLP(args.tagger_host, args.tagger_port), docs, args.max_chars))
@@ -0,0 +1,75 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Memory saved and ranking drift of the float32 and int8 embedding precisions compared to float64"""
+
+import argparse
+import time
+
+import numpy as np
+
+from swisscom_ai.research_keyphrase.embeddings.precision import PRECISIONS, embeddings_nbytes
+from swisscom_ai.research_keyphrase.model.input_representation import InputTextObj
+from swisscom_ai.research_keyphrase.model.method import _MMR
+from swisscom_ai.research_keyphrase.model.method_scalable import compare_rankings
+from swisscom_ai.research_keyphrase.model.methods_embeddings import extract_candidates_embedding_for_docs
+from swisscom_ai.research_keyphrase.util.fileIO import read_file
+from swisscom_ai.research_keyphrase.util.solr_fields import process_tagged_text
+
+
+def precision_report(embdistrib, text_objs, beta=0.55, N=10, alias_threshold=0.7, precisions=PRECISIONS):
+    """
+    Run MMR on the same candidate embeddings with each precision and compare the rankings with the float64 ones
+
+    :param embdistrib: embedding distributor see @EmbeddingDistributor
+    :param text_objs: list of input text representations see @InputTextObj
+    :param beta, N, alias_threshold: @see MMRPhrase
+    :param precisions: precisions to evaluate see @PRECISIONS
+    :return: list containing for each precision a dict with the memory needed by the candidate embeddings, the memory
+    saved compared to float64, the mean overlap and same_rank (see @compare_rankings), the fraction of identical
+    rankings, the maximum relevance difference of identical rankings and the MMR time
+    """
+    embeddings_per_doc = extract_candidates_embedding_for_docs(embdistrib, text_objs, True)
+    embeddings_per_doc = [embeddings for embeddings in embeddings_per_doc if len(embeddings[0]) > 0]
+    reference = [_MMR(embdistrib, None, candidates, np.asarray(X, dtype=np.float64), beta, N, True, alias_threshold,
+                      doc_embedd=np.asarray(doc_embedd, dtype=np.float64))
+                 for candidates, X, doc_embedd in embeddings_per_doc]
+    float64_memory = sum(embeddings_nbytes(X.shape, 'float64') for _, X, _ in embeddings_per_doc)
+
+    reports = []
+    for precision in precisions:
+        start = time.time()
+        results = [_MMR(embdistrib, None, candidates, X, beta, N, True, alias_threshold, doc_embedd=doc_embedd,
+                        precision=precision)
+                   for candidates, X, doc_embedd in embeddings_per_doc]
+        mmr_time = time.time() - start
+
+        comparisons = [compare_rankings(exact[0], result[0]) for exact, result in zip(reference, results)]
+        relevance_diffs = [np.max(np.abs(np.subtract(exact[1], result[1])))
+                           for exact, result in zip(reference, results) if exact[0] == result[0]]
+        memory = sum(embeddings_nbytes(X.shape, precision) for _, X, _ in embeddings_per_doc)
+        nb_docs = max(len(comparisons), 1)
+        reports.append({'precision': precision, 'memory': memory, 'memory_saved': float64_memory - memory,
+                        'overlap': sum(c['overlap'] for c in comparisons) / nb_docs,
+                        'same_rank': sum(c['same_rank'] for c in comparisons) / nb_docs,
+                        'identical': sum(c['first_difference'] is None for c in comparisons) / nb_docs,
+                        'max_relevance_diff': float(max(relevance_diffs)) if relevance_diffs else 0.0,
+                        'mmr_time': mmr_time})
+    return reports
+
+
+if __name__ == '__main__':
+    from swisscom_ai.research_keyphrase.embeddings.emb_distrib_local import EmbeddingDistributorLocal
+
+    parser = argparse.ArgumentParser(description='Memory and ranking drift of the embedding precisions')
+    parser.add_argument('model_path', help='path to the sent2vec model')
+    parser.add_argument('tagged_files', nargs='+', help='POS tagged files (word|tag ...[ENDSENT] format)')
+    parser.add_argument('-lang', help='language of the documents', default='en')
+    parser.add_argument('-N', help='number of keyphrases to extract', default=10, type=int)
+    args = parser.parse_args()
+
+    documents = [InputTextObj(process_tagged_text(read_file(path)), args.lang) for path in args.tagged_files]
+    for report in precision_report(EmbeddingDistributorLocal(args.model_path), documents, N=args.N):
+        print(report)
@@ -0,0 +1,85 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Compare the throughput of the spaCy POS tagging (nlp.pipe with several batch sizes and numbers of processes) with
+the CoreNLP one (spaCy and its model must be installed, a CoreNLP server must be running)"""
+
+import argparse
+import time
+
+from swisscom_ai.research_keyphrase.benchmark.corenlp_packing import synthetic_texts
+from swisscom_ai.research_keyphrase.model.extractor import extract_candidates
+from swisscom_ai.research_keyphrase.model.input_representation import InputTextObj
+from swisscom_ai.research_keyphrase.preprocessing.postagging import PosTaggingCoreNLP, PosTaggingSpacy
+from swisscom_ai.research_keyphrase.util.fileIO import read_file
+
+
+def candidates_overlap(tagged_texts, reference_tagged_texts, lang):
+    """
+    :return: mean over the documents of the fraction of the candidate phrases extracted from the reference tagging
+    that are also extracted from the other tagging
+    """
+    overlaps = []
+    for tagged_text, reference_tagged_text in zip(tagged_texts, reference_tagged_texts):
+        reference = set(extract_candidates(InputTextObj(reference_tagged_text, lang)))
+        if reference:
+            candidates = set(extract_candidates(InputTextObj(tagged_text, lang)))
+            overlaps.append(len(candidates & reference) / len(reference))
+    return sum(overlaps) / len(overlaps) if overlaps else 1.0
+
+
+def benchmark_spacy_tagging(spacy_tagger, texts, corenlp_tagger=None, batch_sizes=(1, 64), n_processes=(1,), lang='en'):
+    """
+    :param spacy_tagger: @PosTaggingSpacy object
+    :param texts: list of string to POS tag
+    :param corenlp_tagger: @PosTaggingCoreNLP object (the CoreNLP path is not measured if None)
+    :param batch_sizes: batch sizes of nlp.pipe to measure
+    :param n_processes: numbers of processes of nlp.pipe to measure
+    :param lang: language of the texts
+    :return: list of dict with the throughput (documents per second) of each configuration and, if CoreNLP is
+    measured, the overlap of the candidate phrases with the CoreNLP ones (see @candidates_overlap)
+    """
+    results = []
+    reference = None
+    if corenlp_tagger is not None:
+        start = time.time()
+        reference = corenlp_tagger.pos_tag_raw_texts(texts)
+        results.append({'tagger': 'corenlp', 'docs_per_sec': len(texts) / (time.time() - start)})
+
+    for n_process in n_processes:
+        for batch_size in batch_sizes:
+            start = time.time()
+            tagged_texts = spacy_tagger.pos_tag_many(texts, batch_size=batch_size, n_process=n_process)
+            result = {'tagger': 'spacy', 'batch_size': batch_size, 'n_process': n_process,
+                      'docs_per_sec': len(texts) / (time.time() - start)}
+            if reference is not None:
+                result['candidates_overlap'] = candidates_overlap(tagged_texts, reference, lang)
+            results.append(result)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the spaCy and CoreNLP POS tagging')
+    parser.add_argument('-lang', help='language', default='en')
+    parser.add_argument('-model', help='spaCy model (default : the small model of the language)')
+    parser.add_argument('-tagger_host', help='CoreNLP host', default='localhost')
+    parser.add_argument('-tagger_port', help='CoreNLP port', default=9000)
+    parser.add_argument('-no_corenlp', help='only measure spaCy', action='store_true')
+    parser.add_argument('-listing_file_path', help='file containing in each row a path to a file to POS tag '
+                                                   '(synthetic documents are used if not set)')
+    parser.add_argument('-nb_docs', help='number of synthetic documents', default=500, type=int)
+    parser.add_argument('-batch_sizes', help='batch sizes of nlp.pipe', nargs='+', type=int, default=[1, 64])
+    parser.add_argument('-n_processes', help='numbers of processes of nlp.pipe', nargs='+', type=int, default=[1])
+    args = parser.parse_args()
+
+    if args.listing_file_path:
+        docs = [read_file(path) for path in read_file(args.listing_file_path).splitlines()]
+    else:
+        docs = synthetic_texts(args.nb_docs)
+
+    corenlp = None if args.no_corenlp else PosTaggingCoreNLP(args.tagger_host, args.tagger_port)
+    for res in benchmark_spacy_tagging(PosTaggingSpacy(lang=args.lang, model=args.model), docs, corenlp,
+                                       args.batch_sizes, args.n_processes, args.lang):
+        print(res)
@@ -0,0 +1,79 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Cold start benchmark : time to import launch and time to the first keyphrases of a fresh python process, and the
+heavy dependencies the import pulled in. The model is either a sent2vec model or the fake embeddings of
+@HashEmbeddingDistributor (to measure the code alone)."""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ['sklearn', 'scipy', 'nltk', 'sent2vec', 'spacy']
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# Run in a fresh process (the time of the import of the benchmark itself is not counted)
+_STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import launch
+import_time = time.perf_counter() - start
+imported = [name for name in {heavy_modules!r} if name in sys.modules]
+
+from swisscom_ai.research_keyphrase.benchmark.suite import HashEmbeddingDistributor, synthetic_tagged_doc
+from swisscom_ai.research_keyphrase.embeddings.emb_distrib_local import EmbeddingDistributorLocal
+from swisscom_ai.research_keyphrase.embeddings.emb_distrib_preload import EmbeddingDistributorPreload
+from swisscom_ai.research_keyphrase.model.input_representation import InputTextObj
+from swisscom_ai.research_keyphrase.model.method import MMRPhrase
+tagged_text = synthetic_tagged_doc('en', 10)
+
+start = time.perf_counter()
+model_path = {model_path!r}
+if model_path is None:
+    embedding_distributor = HashEmbeddingDistributor()
+elif {preload!r}:
+    embedding_distributor = EmbeddingDistributorPreload(EmbeddingDistributorLocal, model_path)
+else:
+    embedding_distributor = EmbeddingDistributorLocal(model_path)
+load_time = time.perf_counter() - start
+keyphrases = MMRPhrase(embedding_distributor, InputTextObj(tagged_text, 'en'), N=10)[0]
+first_keyphrases_time = time.perf_counter() - start
+print(json.dumps({{'import_time': import_time, 'load_time': load_time,
+                  'first_keyphrases_time': import_time + first_keyphrases_time, 'imported_heavy_modules': imported,
+                  'nb_keyphrases': len(keyphrases)}}))
+"""
+
+
+def measure_startup(model_path=None, preload=False, repeat=5):
+    """
+    :param model_path: path to the sent2vec model (fake embeddings if None)
+    :param preload: if true load the model with @EmbeddingDistributorPreload
+    :param repeat: number of fresh processes, the best times are kept
+    :return: dict with import_time, load_time (time before the distributor is returned, only the start of the
+    loading with preload) and first_keyphrases_time (import included) in seconds, and the heavy modules (see
+    @HEAVY_MODULES) imported by launch
+    """
+    script = _STARTUP_SCRIPT.format(heavy_modules=HEAVY_MODULES, model_path=model_path, preload=preload)
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', script], cwd=ROOT_DIRECTORY)
+        runs.append(json.loads(output.decode('utf8').splitlines()[-1]))
+
+    report = {key: min(run[key] for run in runs) for key in ('import_time', 'load_time', 'first_keyphrases_time')}
+    report['imported_heavy_modules'] = runs[-1]['imported_heavy_modules']
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure the import time and the time to the first keyphrases')
+    parser.add_argument('-model_path', help='path to the sent2vec model (fake embeddings if not set)')
+    parser.add_argument('-preload', help='load the model in a background thread', action='store_true')
+    parser.add_argument('-repeat', help='number of fresh processes', default=5, type=int)
+    args = parser.parse_args()
+
+    print(measure_startup(args.model_path, args.preload, args.repeat))
@@ -0,0 +1,274 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Reproducible benchmark of each stage of the keyphrase extraction (input representation, candidate extraction,
+embedding, MMR) and of the whole extraction, on synthetic tagged documents in en, de and fr.
+
+The embeddings come from @HashEmbeddingDistributor (deterministic, no sent2vec model needed) and the documents are
+already tagged (no CoreNLP server needed). The timings and the peak memory of each stage can be saved to a JSON file
+and compared with a previous run:
+
+    python -m swisscom_ai.research_keyphrase.benchmark.suite -save baseline.json
+    ... change the code ...
+    python -m swisscom_ai.research_keyphrase.benchmark.suite -baseline baseline.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from swisscom_ai.research_keyphrase.embeddings.emb_distrib_interface import EmbeddingDistributor
+from swisscom_ai.research_keyphrase.model.extractor import extract_candidates
+from swisscom_ai.research_keyphrase.model.input_representation import InputTextObj
+from swisscom_ai.research_keyphrase.model.method import MMRPhrase, _MMR
+from swisscom_ai.research_keyphrase.model.method_batch import MMRBatchVectorized
+from swisscom_ai.research_keyphrase.model.methods_embeddings import extract_candidates_embedding_for_docs
+
+STAGES = ['input_representation', 'candidates', 'embedding', 'mmr', 'mmr_vectorized', 'end_to_end']
+
+# For each language : (tag, weight) of each kind of word, the noun and adjective tags are the ones matched by the
+# grammar of the language (see @get_grammar) s.t. the documents contain realistic noun phrases
+SYNTHETIC_GRAMMARS = {
+    'en': {'noun': [('NN', 6), ('NNS', 3), ('NNP', 2)], 'adj': [('JJ', 1)],
+           'other': [('DT', 4), ('IN', 4), ('VBZ', 2), ('VB', 1), ('PRP', 1), ('RB', 1), ('CC', 1)], 'end': '.'},
+    'de': {'noun': [('NN', 6), ('NE', 2)], 'adj': [('ADJA', 1)],
+           'other': [('ART', 4), ('APPR', 3), ('APPRART', 1), ('VVFIN', 2), ('PPOSAT', 1), ('ADV', 1), ('KON', 1)],
+           'end': '$.'},
+    'fr': {'noun': [('NC', 6), ('NPP', 2)], 'adj': [('ADJ', 1)],
+           'other': [('DET', 4), ('P', 4), ('V', 2), ('ADV', 1), ('CC', 1), ('CLS', 1)], 'end': 'PONCT'},
+}
+
+
+def _weighted_choice(rng, weighted):
+    values, weights = zip(*weighted)
+    return rng.choices(values, weights)[0]
+
+
+def synthetic_tagged_doc(lang, nb_sents, seed=0, vocabulary_size=5000, sent_length=18):
+    """
+    :param lang: en, de or fr (see @SYNTHETIC_GRAMMARS)
+    :param nb_sents: number of sentences of the document
+    :return: tagged text (list of list of tuple (word, tag)) alternating noun phrases (adjectives and nouns) and other
+    words, the words are drawn with a Zipf-like distribution s.t. frequent candidates appear several times
+    """
+    grammar = SYNTHETIC_GRAMMARS[lang]
+    rng = random.Random('{}-{}-{}'.format(lang, nb_sents, seed))
+    vocabulary = ['{}{}'.format(lang, i) for i in range(vocabulary_size)]
+    cum_weights = list(np.cumsum(1.0 / np.arange(1, vocabulary_size + 1)))
+
+    def word(kind):
+        return '{}{}'.format(rng.choices(vocabulary, cum_weights=cum_weights)[0], kind)
+
+    doc = []
+    for _ in range(nb_sents):
+        sent = []
+        while len(sent) < sent_length:
+            if rng.random() < 0.4:
+                sent.extend((word('adj'), _weighted_choice(rng, grammar['adj'])) for _ in range(rng.randint(0, 2)))
+                sent.extend((word('noun'), _weighted_choice(rng, grammar['noun'])) for _ in range(rng.randint(1, 3)))
+            else:
+                sent.append((word('w'), _weighted_choice(rng, grammar['other'])))
+        sent.append(('.', grammar['end']))
+        doc.append(sent)
+    return doc
+
+
+class HashEmbeddingDistributor(EmbeddingDistributor):
+    """
+    Deterministic fake embedding distributor : the embedding of a phrase is the mean of random vectors seeded by the
+    hash (md5, stable across processes and runs) of each of its tokens. The empty string has a zero (unknown)
+    embedding.
+    """
+
+    def __init__(self, dim=700):
+        self.dim = dim
+        self._token_vectors = {}
+
+    def _token_vector(self, token):
+        vector = self._token_vectors.get(token)
+        if vector is None:
+            seed = int.from_bytes(hashlib.md5(token.encode('utf-8')).digest()[:4], 'little')
+            vector = self._token_vectors[token] = np.random.RandomState(seed).randn(self.dim).astype(np.float32)
+        return vector
+
+    def get_tokenized_sents_embeddings(self, sents):
+        embeddings = np.zeros((len(sents), self.dim), dtype=np.float32)
+        for idx, sent in enumerate(sents):
+            tokens = sent.split()
+            if tokens:
+                embeddings[idx] = np.mean([self._token_vector(token) for token in tokens], axis=0)
+        return embeddings
+
+
+def _measure(fn, repeat, trace_memory):
+    """
+    :return: tuple (result of the last call, best time of repeat calls in seconds, peak memory in bytes of one call
+    traced with tracemalloc or None)
+    """
+    best_time = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best_time = min(best_time, time.perf_counter() - start)
+
+    peak_memory = None
+    if trace_memory:
+        # Traced separately : tracemalloc slows down allocations
+        tracemalloc.start()
+        try:
+            fn()
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, best_time, peak_memory
+
+
+def _fingerprint(results):
+    """
+    :return: short hash of the extracted keyphrases, s.t. a change of the results is noticed when comparing runs
+    """
+    return hashlib.sha1(json.dumps([keyphrases for keyphrases, _, _ in results]).encode('utf-8')).hexdigest()[:12]
+
+
+def run_suite(langs=('en', 'de', 'fr'), sizes=(5, 30, 150), nb_docs=20, N=10, beta=0.65, alias_threshold=0.8,
+              repeat=3, trace_memory=True, dim=700):
+    """
+    The candidates are extracted as sets of strings, the results are only reproducible with a fixed PYTHONHASHSEED
+    (set by the command line).
+
+    :param langs: languages of the synthetic documents
+    :param sizes: numbers of sentences per document, each size is benchmarked separately
+    :param nb_docs: number of documents per language and size
+    :param N, beta, alias_threshold: @see MMRPhrase
+    :param repeat: each stage is run repeat times and the best time is kept
+    :param trace_memory: if true measure the peak memory of each stage (in an additional traced run)
+    :param dim: dimension of the fake embeddings
+    :return: dict with the environment and, for each '<lang>/<size>/<stage>' (see @STAGES), a dict with the time in
+    seconds, the time per document, the peak memory in bytes (None if not traced) and, for the stages producing
+    keyphrases, the fingerprint of the results
+    """
+    embedding_distributor = HashEmbeddingDistributor(dim)
+    measurements = {}
+    for lang in langs:
+        for size in sizes:
+            tagged_docs = [synthetic_tagged_doc(lang, size, seed) for seed in range(nb_docs)]
+            # Warm up the caches (tag ids, chunker, token vectors) s.t. they are not counted in the first stage
+            for text_obj in [InputTextObj(tagged_doc, lang) for tagged_doc in tagged_docs]:
+                MMRPhrase(embedding_distributor, text_obj, beta, N, alias_threshold=alias_threshold)
+
+            text_objs = [InputTextObj(tagged_doc, lang) for tagged_doc in tagged_docs]
+            candidates_per_doc = [extract_candidates(text_obj) for text_obj in text_objs]
+            embeddings_per_doc = [embeddings for embeddings in
+                                  extract_candidates_embedding_for_docs(embedding_distributor, text_objs, True,
+                                                                        candidates_per_doc)
+                                  if len(embeddings[0]) > 0]
+
+            stages = {
+                'input_representation': lambda: [InputTextObj(tagged_doc, lang) for tagged_doc in tagged_docs],
+                'candidates': lambda: [extract_candidates(text_obj) for text_obj in text_objs],
+                'embedding': lambda: extract_candidates_embedding_for_docs(embedding_distributor, text_objs, True,
+                                                                           candidates_per_doc),
+                'mmr': lambda: [_MMR(embedding_distributor, None, candidates, X, beta, N, True, alias_threshold,
+                                     doc_embedd=doc_embedd)
+                                for candidates, X, doc_embedd in embeddings_per_doc],
+                # Same input as the mmr stage : the MMR step only
+                'mmr_vectorized': lambda: MMRBatchVectorized(embeddings_per_doc, beta, N, alias_threshold),
+                'end_to_end': lambda: [MMRPhrase(embedding_distributor, InputTextObj(tagged_doc, lang), beta, N,
+                                                 alias_threshold=alias_threshold)
+                                       for tagged_doc in tagged_docs],
+            }
+            for stage in STAGES:
+                result, stage_time, peak_memory = _measure(stages[stage], repeat, trace_memory)
+                measurement = {'time': stage_time, 'time_per_doc': stage_time / nb_docs, 'peak_memory': peak_memory}
+                if stage in ('mmr', 'end_to_end'):
+                    measurement['fingerprint'] = _fingerprint(result)
+                measurements['{}/{}/{}'.format(lang, size, stage)] = measurement
+
+    return {'environment': {'python': platform.python_version(), 'numpy': np.__version__,
+                            'machine': platform.machine(), 'nb_docs': nb_docs, 'repeat': repeat, 'dim': dim},
+            'measurements': measurements}
+
+
+def compare_to_baseline(report, baseline, tolerance=0.1):
+    """
+    :param report: dict returned by @run_suite
+    :param baseline: dict returned by @run_suite on the reference version
+    :param tolerance: relative slowdown (or memory increase) tolerated before reporting a regression
+    :return: list of dict (one per measurement present in both) with the time and memory ratios (current / baseline),
+    whether the results changed and whether it is a regression
+    """
+    comparisons = []
+    for key, measurement in sorted(report['measurements'].items()):
+        reference = baseline['measurements'].get(key)
+        if reference is None:
+            continue
+        time_ratio = measurement['time'] / reference['time'] if reference['time'] > 0 else float('inf')
+        memory_ratio = None
+        if measurement['peak_memory'] is not None and reference['peak_memory']:
+            memory_ratio = measurement['peak_memory'] / reference['peak_memory']
+        changed = measurement.get('fingerprint') != reference.get('fingerprint')
+        regression = time_ratio > 1 + tolerance or (memory_ratio is not None and memory_ratio > 1 + tolerance)
+        comparisons.append({'measurement': key, 'time_ratio': time_ratio, 'memory_ratio': memory_ratio,
+                            'results_changed': changed, 'regression': regression})
+    return comparisons
+
+
+def _format_comparison(comparison):
+    memory = '' if comparison['memory_ratio'] is None else ' memory x{:.2f}'.format(comparison['memory_ratio'])
+    flags = ('  REGRESSION' if comparison['regression'] else '') + \
+            ('  RESULTS CHANGED' if comparison['results_changed'] else '')
+    return '{:<40} time x{:.2f}{}{}'.format(comparison['measurement'], comparison['time_ratio'], memory, flags)
+
+
+if __name__ == '__main__':
+    if os.environ.get('PYTHONHASHSEED') != '0':
+        # The order of the candidates (extracted as a set) depends on the hash seed and changes the near-ties of MMR :
+        # run with a fixed seed s.t. the fingerprints of two runs can be compared
+        os.environ['PYTHONHASHSEED'] = '0'
+        module_args = ['-m', __spec__.name] if __spec__ is not None else [sys.argv[0]]
+        os.execv(sys.executable, [sys.executable] + module_args + sys.argv[1:])
+
+    parser = argparse.ArgumentParser(description='Benchmark of each stage of the keyphrase extraction on synthetic '
+                                                 'documents')
+    parser.add_argument('-langs', help='languages', nargs='+', default=['en', 'de', 'fr'])
+    parser.add_argument('-sizes', help='numbers of sentences per document', nargs='+', type=int, default=[5, 30, 150])
+    parser.add_argument('-nb_docs', help='number of documents per language and size', default=20, type=int)
+    parser.add_argument('-N', help='number of keyphrases to extract', default=10, type=int)
+    parser.add_argument('-repeat', help='number of runs of each stage (the best time is kept)', default=3, type=int)
+    parser.add_argument('-no_memory', help='do not measure the peak memory', action='store_true')
+    parser.add_argument('-save', help='path of the JSON file where to save the results')
+    parser.add_argument('-baseline', help='path of a JSON file saved with -save to compare with')
+    parser.add_argument('-tolerance', help='relative slowdown tolerated before reporting a regression', default=0.1,
+                        type=float)
+    args = parser.parse_args()
+
+    report = run_suite(args.langs, args.sizes, args.nb_docs, args.N, repeat=args.repeat,
+                       trace_memory=not args.no_memory)
+    for key, measurement in sorted(report['measurements'].items()):
+        memory = '' if measurement['peak_memory'] is None else '  peak {:.1f} KiB'.format(
+            measurement['peak_memory'] / 1024)
+        print('{:<40} {:.2f} ms/doc{}'.format(key, measurement['time_per_doc'] * 1000, memory))
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as json_file:
+            json.dump(report, json_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as json_file:
+            comparisons = compare_to_baseline(report, json.load(json_file), args.tolerance)
+        print()
+        for comparison in comparisons:
+            print(_format_comparison(comparison))
+        if any(comparison['regression'] for comparison in comparisons):
+            sys.exit(1)
@@ -0,0 +1,84 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Benchmark of the binary tagged corpus format (see @tagged_store) against the word|tag ...[ENDSENT] text format
+parsed with process_tagged_text, on synthetic tagged documents"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from swisscom_ai.research_keyphrase.model.input_representation import InputTextObj
+from swisscom_ai.research_keyphrase.preprocessing.postagging import tagged_text_to_string
+from swisscom_ai.research_keyphrase.util.fileIO import read_file, write_string
+from swisscom_ai.research_keyphrase.util.solr_fields import process_tagged_text
+from swisscom_ai.research_keyphrase.util.tagged_store import TaggedCorpusReader, write_tagged_corpus
+
+SYNTHETIC_TAGS = ['NN', 'NNS', 'NNP', 'JJ', 'VB', 'VBZ', 'DT', 'IN', 'PRP', 'RB', 'CC', '.']
+
+
+def synthetic_tagged_texts(nb_docs, nb_sents=20, sent_length=20, vocabulary_size=20000, seed=0):
+    """
+    :return: list of nb_docs tagged texts (list of list of tuple (word, tag))
+    """
+    rng = random.Random(seed)
+    vocabulary = ['Word{}'.format(i) if i % 7 == 0 else 'word{}'.format(i) for i in range(vocabulary_size)]
+    return [[[(rng.choice(vocabulary), rng.choice(SYNTHETIC_TAGS)) for _ in range(sent_length)]
+             for _ in range(nb_sents)]
+            for _ in range(nb_docs)]
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, filename)) for root, _, filenames in os.walk(path)
+               for filename in filenames)
+
+
+def benchmark_tagged_store(nb_docs, lang='en', shard_size=10000):
+    """
+    :return: dict with the size on disk and the time to load the corpus as @InputTextObj for both formats
+    """
+    tagged_texts = synthetic_tagged_texts(nb_docs)
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        text_dir = os.path.join(tmp_dir, 'text')
+        os.makedirs(text_dir)
+        paths = []
+        for idx, tagged_text in enumerate(tagged_texts):
+            paths.append(os.path.join(text_dir, '{}.txt'.format(idx)))
+            write_string(tagged_text_to_string(tagged_text), paths[-1])
+
+        binary_dir = os.path.join(tmp_dir, 'binary')
+        start = time.time()
+        write_tagged_corpus(binary_dir, ((str(idx), tagged_text) for idx, tagged_text in enumerate(tagged_texts)),
+                            shard_size)
+        write_time = time.time() - start
+
+        start = time.time()
+        text_objs = [InputTextObj(process_tagged_text(read_file(path)), lang) for path in paths]
+        text_time = time.time() - start
+
+        start = time.time()
+        binary_text_objs = [text_obj for _, text_obj in TaggedCorpusReader(binary_dir).text_objs(lang)]
+        binary_time = time.time() - start
+
+        identical = all(a.tokens == b.tokens and a.tag_ids == b.tag_ids and a.sent_offsets == b.sent_offsets
+                        for a, b in zip(text_objs, binary_text_objs))
+        return {'nb_docs': nb_docs, 'text_size': directory_size(text_dir), 'binary_size': directory_size(binary_dir),
+                'binary_write_time': write_time, 'text_load_time': text_time, 'binary_load_time': binary_time,
+                'identical': identical}
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark of the binary tagged corpus format')
+    parser.add_argument('-nb_docs', help='number of synthetic documents', default=2000, type=int)
+    parser.add_argument('-lang', help='language', default='en')
+    args = parser.parse_args()
+
+    print(benchmark_tagged_store(args.nb_docs, args.lang))
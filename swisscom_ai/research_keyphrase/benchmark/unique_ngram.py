@@ -0,0 +1,64 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Microbenchmark of unique_ngram_candidates (no_subset option of extract_candidates) on synthetic candidate lists"""
+
+import argparse
+import random
+import re
+import time
+
+from swisscom_ai.research_keyphrase.model.extractor import unique_ngram_candidates
+
+
+def unique_ngram_candidates_reference(strings):
+    """Previous quadratic implementation of @unique_ngram_candidates (one regex search per pair of strings)"""
+    results = []
+    for s in sorted(set(strings), key=len, reverse=True):
+        if not any(re.search(r'\b{}\b'.format(re.escape(s)), r) for r in results):
+            results.append(s)
+    return results
+
+
+def synthetic_candidates(nb_candidates, vocabulary_size=5000, max_words=5, seed=0):
+    """
+    :return: list of nb_candidates phrases of 1 to max_words words drawn from a synthetic vocabulary
+    """
+    rng = random.Random(seed)
+    vocabulary = ['w{}'.format(i) for i in range(vocabulary_size)]
+    return [' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, max_words))) for _ in range(nb_candidates)]
+
+
+def benchmark_unique_ngram(sizes, reference_max=2000):
+    """
+    :param sizes: list of numbers of candidates
+    :param reference_max: the reference implementation is only run (and compared) up to this number of candidates
+    :return: list of dict (one per size) with the timings in seconds
+    """
+    results = []
+    for size in sizes:
+        candidates = synthetic_candidates(size)
+        start = time.time()
+        unique = unique_ngram_candidates(candidates)
+        result = {'nb_candidates': size, 'nb_unique': len(unique), 'time': time.time() - start}
+
+        if size <= reference_max:
+            start = time.time()
+            reference = unique_ngram_candidates_reference(candidates)
+            result['reference_time'] = time.time() - start
+            result['identical'] = reference == unique
+        results.append(result)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Microbenchmark of unique_ngram_candidates')
+    parser.add_argument('-sizes', help='numbers of candidates', nargs='+', type=int, default=[1000, 10000, 100000])
+    parser.add_argument('-reference_max', help='maximum number of candidates for the reference implementation',
+                        default=2000, type=int)
+    args = parser.parse_args()
+
+    for res in benchmark_unique_ngram(args.sizes, args.reference_max):
+        print(res)
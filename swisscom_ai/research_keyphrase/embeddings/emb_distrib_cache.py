@@ -0,0 +1,165 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from swisscom_ai.research_keyphrase.embeddings.emb_distrib_interface import EmbeddingDistributor
+from swisscom_ai.research_keyphrase.embeddings.precision import check_precision, compute_dtype, dequantize_int8, \
+    embeddings_nbytes, quantize_int8
+
+
+class EmbeddingDistributorCache(EmbeddingDistributor):
+    """
+    Concrete class of @EmbeddingDistributor wrapping another @EmbeddingDistributor (e.g @EmbeddingDistributorLocal)
+    with a cross-document phrase -> embedding cache.
+
+    Embeddings are kept in a preallocated matrix (one row per cached phrase), the least recently used phrases are
+    evicted when the cache is full. Only the phrases missing from the cache are sent to the wrapped distributor.
+    With the int8 precision each row is stored quantized with its scale (see @quantize_int8) and returned in float32.
+    """
+
+    def __init__(self, embedding_distrib, max_entries=100000, max_memory=None, precision=None):
+        """
+        :param embedding_distrib: the wrapped embedding distributor see @EmbeddingDistributor
+        :param max_entries: maximum number of phrases kept in the cache
+        :param max_memory: maximum size in bytes of the embedding matrix (optional), the number of entries is reduced
+        accordingly once the dimension of the embeddings is known
+        :param precision: precision of the cached embeddings see @PRECISIONS (default : dtype of the embeddings
+        returned by the wrapped distributor)
+        """
+        if max_entries <= 0:
+            raise ValueError('max_entries must be strictly positive')
+        if precision is not None:
+            check_precision(precision)
+        self.precision = precision
+        self.embedding_distrib = embedding_distrib
+        self.max_entries = max_entries
+        self.max_memory = max_memory
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._slots = OrderedDict()  # phrase -> row in self._store, ordered from least to most recently used
+        self._free_slots = []
+        self._store = None
+        self._scales = None  # scale of each row of self._store with the int8 precision
+
+    @property
+    def capacity(self):
+        """Number of phrases that can be kept in the cache (0 if the cache is not allocated yet)"""
+        return 0 if self._store is None else self._store.shape[0]
+
+    def __len__(self):
+        return len(self._slots)
+
+    def get_tokenized_sents_embeddings(self, sents):
+        """
+        @see EmbeddingDistributor
+        The wrapped distributor is called without holding the lock of the cache, s.t. concurrent callers only wait
+        for each other while reading or updating the cache (a phrase missed by two concurrent calls is embedded twice).
+        """
+        with self._lock:
+            rows = [self._slots.get(sent) for sent in sents]
+            missing = OrderedDict()  # phrase -> positions in sents
+            for idx, (sent, row) in enumerate(zip(sents, rows)):
+                if row is None:
+                    missing.setdefault(sent, []).append(idx)
+                else:
+                    self._slots.move_to_end(sent)
+
+            # Counted per position in sents : a missing phrase repeated in the call is a miss each time
+            nb_missing = sum(len(positions) for positions in missing.values())
+            self.misses += nb_missing
+            self.hits += len(sents) - nb_missing
+
+            if len(missing) == 0:
+                if self._store is None:
+                    return self.embedding_distrib.get_tokenized_sents_embeddings(sents)
+                return self._read(rows)
+            hit_idx = [idx for idx, row in enumerate(rows) if row is not None]
+            # Copied while holding the lock : the rows may be reused by other calls once it is released
+            hit_embeddings = self._read([rows[idx] for idx in hit_idx]) if hit_idx else None
+
+        missing_embeddings = np.asarray(self.embedding_distrib.get_tokenized_sents_embeddings(list(missing)))
+
+        with self._lock:
+            if self._store is None:
+                self._allocate(missing_embeddings.shape[1], missing_embeddings.dtype)
+            if self._scales is not None:
+                missing_values, missing_scales = quantize_int8(missing_embeddings)
+                # Return the same (dequantized) values as the next hits of these phrases
+                missing_embeddings = dequantize_int8(missing_values, missing_scales)
+            else:
+                missing_embeddings = missing_embeddings.astype(self._store.dtype, copy=False)
+                missing_values, missing_scales = missing_embeddings, None
+
+            for missing_idx, sent in enumerate(missing):
+                row = self._insert(sent, missing_values[missing_idx])
+                if missing_scales is not None:
+                    self._scales[row] = missing_scales[missing_idx]
+
+        result = np.empty((len(sents), missing_embeddings.shape[1]), dtype=missing_embeddings.dtype)
+        if hit_idx:
+            result[hit_idx] = hit_embeddings
+        for missing_idx, positions in enumerate(missing.values()):
+            result[positions] = missing_embeddings[missing_idx]
+        return result
+
+    def cache_info(self):
+        """
+        :return: dict with the hits, misses (counted per requested sentence), evictions counters as well as the current
+        size and capacity of the cache
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self._slots), 'capacity': self.capacity,
+                'memory': 0 if self._store is None else self._store.nbytes + getattr(self._scales, 'nbytes', 0)}
+
+    def clear(self):
+        """Remove all the phrases from the cache and reset the counters"""
+        with self._lock:
+            self._slots.clear()
+            self._free_slots = [] if self._store is None else list(range(self._store.shape[0]))
+            self.hits = self.misses = self.evictions = 0
+
+    def _allocate(self, dim, dtype):
+        if self.precision is None:
+            row_nbytes = dim * np.dtype(dtype).itemsize
+        else:
+            row_nbytes = embeddings_nbytes((1, dim), self.precision)
+        capacity = self.max_entries
+        if self.max_memory is not None:
+            capacity = min(capacity, self.max_memory // row_nbytes)
+        if capacity <= 0:
+            raise ValueError('max_memory is too small to store a single embedding')
+        if self.precision == 'int8':
+            self._store = np.zeros((capacity, dim), dtype=np.int8)
+            self._scales = np.zeros(capacity, dtype=np.float32)
+        else:
+            self._store = np.zeros((capacity, dim), dtype=dtype if self.precision is None
+                                   else compute_dtype(self.precision))
+        self._free_slots = list(range(capacity - 1, -1, -1))
+
+    def _read(self, rows):
+        if self._scales is None:
+            return self._store[rows]
+        return dequantize_int8(self._store[rows], self._scales[rows])
+
+    def _insert(self, sent, embedding):
+        row = self._slots.get(sent)
+        if row is not None:  # Inserted by a concurrent call
+            self._slots.move_to_end(sent)
+        elif self._free_slots:
+            row = self._free_slots.pop()
+        else:
+            _, row = self._slots.popitem(last=False)  # Evict the least recently used phrase
+            self.evictions += 1
+        self._store[row] = embedding
+        self._slots[sent] = row
+        return row
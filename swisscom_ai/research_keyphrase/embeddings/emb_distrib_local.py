@@ -6,7 +6,7 @@
 import numpy as np
 
 from swisscom_ai.research_keyphrase.embeddings.emb_distrib_interface import EmbeddingDistributor
-import sent2vec
+from swisscom_ai.research_keyphrase.embeddings.precision import check_precision, to_precision
 
 
 class EmbeddingDistributorLocal(EmbeddingDistributor):
@@ -16,7 +16,15 @@ class EmbeddingDistributorLocal(EmbeddingDistributor):
     
     """
 
-    def __init__(self, fasttext_model):
+    def __init__(self, fasttext_model, precision=None):
+        """
+        :param fasttext_model: path to the sent2vec model
+        :param precision: precision of the returned embeddings see @PRECISIONS (default : as returned by sent2vec)
+        """
+        if precision is not None:
+            check_precision(precision)
+        self.precision = precision
+        import sent2vec  # Imported with the model s.t. importing this module stays cheap
         self.model = sent2vec.Sent2vecModel()
         self.model.load_model(fasttext_model)
 
@@ -28,4 +36,7 @@ class EmbeddingDistributorLocal(EmbeddingDistributor):
             if '\n' in sent:
                 raise RuntimeError('New line is not allowed inside a sentence')
 
-        return self.model.embed_sentences(sents)
+        embeddings = self.model.embed_sentences(sents)
+        if self.precision is None:
+            return embeddings
+        return to_precision(embeddings, self.precision)
@@ -0,0 +1,51 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+import threading
+
+from swisscom_ai.research_keyphrase.embeddings.emb_distrib_interface import EmbeddingDistributor
+from swisscom_ai.research_keyphrase.embeddings.emb_ngram_table import NgramVectorTable
+
+
+class EmbeddingDistributorNgram(EmbeddingDistributor):
+    """
+    Concrete class of @EmbeddingDistributor composing the sent2vec embeddings from the memory-mapped word and n-gram
+    vectors of a @NgramVectorTable : the embeddings of all the sentences of a call are computed with one sparse matrix
+    product, without calling the model.
+    Sentences with a word or n-gram missing from the table (typically the document itself) are sent to a fallback
+    embedding distributor (e.g @EmbeddingDistributorLocal), which is only created the first time it is needed.
+    """
+
+    def __init__(self, table_path, fallback=None, fallback_factory=None):
+        """
+        :param table_path: path of the table directory see @export_table
+        :param fallback: embedding distributor used for the sentences not covered by the table (optional)
+        :param fallback_factory: callable without argument creating the fallback embedding distributor when it is
+        needed for the first time (optional, ignored if fallback is set).
+        If there is no fallback, sentences not covered by the table get a zero embedding (i.e they are unknown).
+        """
+        self.table = NgramVectorTable(table_path)
+        self._fallback = fallback
+        self._fallback_factory = fallback_factory
+        self._fallback_lock = threading.Lock()
+
+    @property
+    def fallback(self):
+        if self._fallback is None and self._fallback_factory is not None:
+            # Concurrent callers wait for the same (possibly multi-GB) model instead of each loading it
+            with self._fallback_lock:
+                if self._fallback is None:
+                    self._fallback = self._fallback_factory()
+        return self._fallback
+
+    def get_tokenized_sents_embeddings(self, sents):
+        """
+        @see EmbeddingDistributor
+        """
+        result, missing_idx = self.table.embed(sents)
+        fallback = self.fallback if missing_idx else None
+        if fallback is not None:
+            result[missing_idx] = fallback.get_tokenized_sents_embeddings([sents[idx] for idx in missing_idx])
+        return result
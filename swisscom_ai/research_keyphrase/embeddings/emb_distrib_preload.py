@@ -0,0 +1,61 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+import threading
+
+from swisscom_ai.research_keyphrase.embeddings.emb_distrib_interface import EmbeddingDistributor
+
+
+class EmbeddingDistributorPreload(EmbeddingDistributor):
+    """
+    Concrete class of @EmbeddingDistributor creating the wrapped embedding distributor (e.g loading the sent2vec model)
+    in a background thread, s.t. the work not needing embeddings (imports, POS tagging, serving readiness probes...)
+    starts immediately. Asking for embeddings blocks until the distributor is loaded.
+    """
+
+    def __init__(self, factory, *args, **kwargs):
+        """
+        :param factory: callable returning the embedding distributor (e.g @EmbeddingDistributorLocal), called in the
+        background thread with args and kwargs
+        """
+        self._distributor = None
+        self._error = None
+        self._loaded = threading.Event()
+        self._thread = threading.Thread(target=self._load, args=(factory, args, kwargs), name='EmbeddingPreload',
+                                        daemon=True)
+        self._thread.start()
+
+    def _load(self, factory, args, kwargs):
+        try:
+            self._distributor = factory(*args, **kwargs)
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._loaded.set()
+
+    def is_ready(self):
+        """
+        :return: True once the distributor is loaded (False while loading or if the loading failed)
+        """
+        return self._loaded.is_set() and self._error is None
+
+    def wait(self, timeout=None):
+        """
+        Block until the distributor is loaded
+
+        :param timeout: maximum time to wait in seconds (None to wait until loaded)
+        :return: the wrapped embedding distributor
+        """
+        if not self._loaded.wait(timeout):
+            raise TimeoutError('The embedding distributor is still loading')
+        if self._error is not None:
+            raise RuntimeError('Loading the embedding distributor failed') from self._error
+        return self._distributor
+
+    def get_tokenized_sents_embeddings(self, sents):
+        """
+        @see EmbeddingDistributor
+        """
+        return self.wait().get_tokenized_sents_embeddings(sents)
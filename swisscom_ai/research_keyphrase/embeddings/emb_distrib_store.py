@@ -0,0 +1,64 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+import threading
+
+import numpy as np
+
+from swisscom_ai.research_keyphrase.embeddings.emb_distrib_interface import EmbeddingDistributor
+from swisscom_ai.research_keyphrase.embeddings.emb_store import PhraseEmbeddingStore
+
+
+class EmbeddingDistributorStore(EmbeddingDistributor):
+    """
+    Concrete class of @EmbeddingDistributor reading the embeddings from a memory-mapped @PhraseEmbeddingStore.
+    Phrases which are not in the store are sent to a fallback embedding distributor (e.g @EmbeddingDistributorLocal),
+    which is only created the first time an unknown phrase is requested.
+    """
+
+    def __init__(self, store_path, fallback=None, fallback_factory=None):
+        """
+        :param store_path: path of the store directory see @build_store
+        :param fallback: embedding distributor used for the phrases missing from the store (optional)
+        :param fallback_factory: callable without argument creating the fallback embedding distributor when it is
+        needed for the first time (optional, ignored if fallback is set).
+        If there is no fallback, phrases missing from the store get a zero embedding (i.e they are unknown).
+        """
+        self.store = PhraseEmbeddingStore(store_path)
+        self._fallback = fallback
+        self._fallback_factory = fallback_factory
+        self._fallback_lock = threading.Lock()
+
+    @property
+    def fallback(self):
+        if self._fallback is None and self._fallback_factory is not None:
+            # Concurrent callers wait for the same (possibly multi-GB) model instead of each loading it
+            with self._fallback_lock:
+                if self._fallback is None:
+                    self._fallback = self._fallback_factory()
+        return self._fallback
+
+    def get_tokenized_sents_embeddings(self, sents):
+        """
+        @see EmbeddingDistributor
+        """
+        for sent in sents:
+            if '\n' in sent:
+                raise RuntimeError('New line is not allowed inside a sentence')
+
+        rows = self.store.lookup(sents)
+        known_idx = [idx for idx, row in enumerate(rows) if row is not None]
+        if len(known_idx) == len(sents):
+            return self.store.vectors[rows]
+
+        result = np.zeros((len(sents), self.store.dim), dtype=np.float32)
+        if known_idx:
+            result[known_idx] = self.store.vectors[[rows[idx] for idx in known_idx]]
+
+        fallback = self.fallback
+        if fallback is not None:
+            unknown_idx = [idx for idx, row in enumerate(rows) if row is None]
+            result[unknown_idx] = fallback.get_tokenized_sents_embeddings([sents[idx] for idx in unknown_idx])
+        return result
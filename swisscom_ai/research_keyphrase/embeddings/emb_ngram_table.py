@@ -0,0 +1,266 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""On-disk n-gram vector table of a sent2vec model.
+
+sent2vec embeds a sentence as the mean of the vectors of its features : its words and its word n-grams (up to the
+wordNgrams parameter of the model, 2 for the published bigram models). A table exported from the model gives the
+embedding of any phrase whose features are all in the table without calling the model.
+
+A table is a directory containing :
+    - vectors.npy : float32 matrix (one row per n-gram) opened memory-mapped and read-only, s.t. several processes
+      share the same pages
+    - ngrams.txt : the n-grams (tokens separated by a space), one per line, the i-th line corresponds to the i-th row
+      of vectors.npy
+    - table.json : the parameters of the table (word_ngrams)
+
+sent2vec does not expose its n-gram vectors, they are recovered from the embeddings of the n-grams themselves : the
+embedding of a unigram is its vector, and the vector of a n-gram is (number of features * its embedding) minus the
+vectors of its sub-n-grams.
+"""
+
+import argparse
+import json
+import os
+import shutil
+from collections import OrderedDict
+
+import numpy as np
+
+VECTORS_FILE = 'vectors.npy'
+NGRAMS_FILE = 'ngrams.txt'
+INFO_FILE = 'table.json'
+
+
+def sub_ngrams(tokens, word_ngrams):
+    """
+    :param tokens: list of string
+    :param word_ngrams: maximum length of the n-grams
+    :return: list of the n-grams of tokens (strings) from length 1 to word_ngrams, i.e the features of sent2vec
+    """
+    ngrams = list(tokens)
+    for length in range(2, min(word_ngrams, len(tokens)) + 1):
+        ngrams.extend(' '.join(tokens[start:start + length]) for start in range(len(tokens) - length + 1))
+    return ngrams
+
+
+def compose(feature_rows, vectors):
+    """
+    Mean of the feature vectors of each sentence, computed with one sparse (sentences x features) matrix product
+
+    :param feature_rows: list containing for each sentence the list of the rows of its features in vectors
+    :param vectors: ndarray of shape (number of n-grams, dimension of embeddings)
+    :return: float32 ndarray of shape (number of sentences, dimension of embeddings), zero for sentences without feature
+    """
+    from scipy.sparse import csr_matrix  # Imported with the first composition s.t. importing this module stays cheap
+
+    indptr = np.zeros(len(feature_rows) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(rows) for rows in feature_rows])
+    if indptr[-1] == 0:
+        return np.zeros((len(feature_rows), vectors.shape[1]), dtype=np.float32)
+
+    columns = np.fromiter((row for rows in feature_rows for row in rows), dtype=np.int64, count=indptr[-1])
+    weights = np.repeat(1 / np.maximum(np.diff(indptr), 1), np.diff(indptr)).astype(np.float32)
+    # Only the rows used by the sentences are read from the (memory-mapped) table
+    used_rows, columns = np.unique(columns, return_inverse=True)
+    features = csr_matrix((weights, columns, indptr), shape=(len(feature_rows), len(used_rows)))
+    return np.asarray(features.dot(np.asarray(vectors[used_rows], dtype=np.float32)), dtype=np.float32)
+
+
+class NgramVectorTable:
+    """Read-only memory-mapped n-gram -> vector table"""
+
+    def __init__(self, table_path):
+        """
+        :param table_path: path of the table directory (see @export_table)
+        """
+        self.table_path = table_path
+        self.vectors = np.load(os.path.join(table_path, VECTORS_FILE), mmap_mode='r')
+        with open(os.path.join(table_path, NGRAMS_FILE), 'r', encoding='utf-8') as ngrams_file:
+            self.index = {ngram.rstrip('\n'): row for row, ngram in enumerate(ngrams_file)}
+        with open(os.path.join(table_path, INFO_FILE), 'r', encoding='utf-8') as info_file:
+            self.word_ngrams = json.load(info_file)['word_ngrams']
+
+        if len(self.index) != self.vectors.shape[0]:
+            raise RuntimeError('Corrupted n-gram table ' + table_path)
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, ngram):
+        return ngram in self.index
+
+    def feature_rows(self, tokens):
+        """
+        :param tokens: list of string
+        :return: list of the rows of the features of tokens, or None if one of them is not in the table
+        """
+        index = self.index
+        rows = []
+        for ngram in sub_ngrams(tokens, self.word_ngrams):
+            row = index.get(ngram)
+            if row is None:
+                return None
+            rows.append(row)
+        return rows
+
+    def embed(self, sents):
+        """
+        :param sents: list of tokenized sentences (tokens separated by a space)
+        :return: tuple (float32 ndarray of shape (number of sentences, dimension of embeddings), list of the indices of
+        the sentences having a feature missing from the table, their rows are zero)
+        """
+        feature_rows = []
+        missing_idx = []
+        for idx, sent in enumerate(sents):
+            if '\n' in sent:
+                raise RuntimeError('New line is not allowed inside a sentence')
+            rows = self.feature_rows(sent.split())
+            if rows is None:
+                missing_idx.append(idx)
+                rows = []
+            feature_rows.append(rows)
+        return compose(feature_rows, self.vectors), missing_idx
+
+
+def _embed(embedding_distrib, sents, batch_size):
+    embeddings = [np.asarray(embedding_distrib.get_tokenized_sents_embeddings(sents[start:start + batch_size]),
+                             dtype=np.float64) for start in range(0, len(sents), batch_size)]
+    return np.concatenate(embeddings) if embeddings else np.zeros((0, 0))
+
+
+def export_table(table_path, embedding_distrib, phrases, vocabulary=(), word_ngrams=2, batch_size=10000,
+                 nb_validation_phrases=1000, tolerance=1e-4):
+    """
+    Create a table containing the vectors of the words and n-grams of the phrases.
+    The table is first written in a temporary directory, validated (see @validate_table) on the first
+    nb_validation_phrases phrases and then moved to table_path.
+
+    :param table_path: path of the table directory to create
+    :param embedding_distrib: embedding distributor of the sent2vec model see @EmbeddingDistributorLocal
+    :param phrases: iterable of tokenized phrases (e.g candidate phrases), their words and n-grams are exported
+    :param vocabulary: iterable of words exported in addition to the words of the phrases (e.g the model vocabulary)
+    :param word_ngrams: wordNgrams parameter the model was trained with
+    :param batch_size: number of n-grams embedded at once
+    :param nb_validation_phrases: number of phrases used to validate the table
+    :param tolerance: maximum relative error (see @validate_table) accepted on the validation phrases
+    :return: number of n-grams in the table
+    """
+    unique_phrases = list(OrderedDict.fromkeys(phrase for phrase in phrases if phrase.strip()))
+    # n-grams of each length, the sub-n-grams of a n-gram are exported before it
+    ngrams_by_length = [OrderedDict.fromkeys(word for word in vocabulary if word)]
+    for phrase in unique_phrases:
+        tokens = phrase.split()
+        for ngram in sub_ngrams(tokens, word_ngrams):
+            length = ngram.count(' ') + 1
+            while len(ngrams_by_length) < length:
+                ngrams_by_length.append(OrderedDict())
+            ngrams_by_length[length - 1][ngram] = None
+    if not ngrams_by_length[0]:
+        raise ValueError('No n-gram to export')
+
+    index = {}
+    vectors = []
+    for length, ngrams in enumerate(ngrams_by_length, 1):
+        # Only the n-grams made of known words have a vector (sent2vec ignores unknown words)
+        ngrams = [ngram for ngram in ngrams if length == 1 or all(word in index for word in ngram.split())]
+        if not ngrams:
+            continue
+        embeddings = _embed(embedding_distrib, ngrams, batch_size)
+        if length == 1:
+            known = embeddings.any(axis=1)
+            ngrams = [ngram for ngram, is_known in zip(ngrams, known) if is_known]
+            ngram_vectors = embeddings[known]
+        else:
+            table = np.concatenate(vectors)
+            sub_rows = [[index[sub] for sub in sub_ngrams(ngram.split(), length - 1)] for ngram in ngrams]
+            nb_features = np.array([len(rows) + 1 for rows in sub_rows], dtype=np.float64)[:, None]
+            # embedding = (sum of the vectors of the sub-n-grams + vector) / number of features
+            ngram_vectors = nb_features * embeddings - compose(sub_rows, table) * (nb_features - 1)
+        for ngram in ngrams:
+            index[ngram] = len(index)
+        vectors.append(ngram_vectors.astype(np.float32))
+
+    tmp_path = table_path + '.tmp'
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, VECTORS_FILE), np.concatenate(vectors))
+    del vectors
+    with open(os.path.join(tmp_path, NGRAMS_FILE), 'w', encoding='utf-8') as ngrams_file:
+        for ngram in index:
+            ngrams_file.write(ngram + '\n')
+    with open(os.path.join(tmp_path, INFO_FILE), 'w', encoding='utf-8') as info_file:
+        json.dump({'word_ngrams': word_ngrams}, info_file)
+
+    validation = validate_table(NgramVectorTable(tmp_path), embedding_distrib, unique_phrases[:nb_validation_phrases])
+    if validation['max_relative_error'] > tolerance:
+        raise RuntimeError('The n-gram table does not reproduce the model embeddings (max relative error {}), check '
+                           'word_ngrams'.format(validation['max_relative_error']))
+
+    if os.path.exists(table_path):
+        shutil.rmtree(table_path)
+    os.rename(tmp_path, table_path)
+    return len(index)
+
+
+def validate_table(table, embedding_distrib, phrases):
+    """
+    Compare the embeddings composed from the table with the ones of the model
+
+    :param table: @NgramVectorTable object
+    :param embedding_distrib: embedding distributor of the sent2vec model see @EmbeddingDistributorLocal
+    :param phrases: list of tokenized phrases
+    :return: dict with the number of phrases, the number of phrases composed from the table (the others have a
+    feature missing from the table) and the maximum over the composed phrases of
+    norm(composed - model embedding) / norm(model embedding)
+    """
+    composed, missing_idx = table.embed(phrases)
+    covered = np.ones(len(phrases), dtype=bool)
+    covered[missing_idx] = False
+    max_relative_error = 0.0
+    if covered.any():
+        expected = np.asarray(embedding_distrib.get_tokenized_sents_embeddings(
+            [phrase for phrase, is_covered in zip(phrases, covered) if is_covered]), dtype=np.float64)
+        errors = np.linalg.norm(composed[covered] - expected, axis=1)
+        norms = np.linalg.norm(expected, axis=1)
+        max_relative_error = float(np.max(errors / np.maximum(norms, np.finfo(np.float32).tiny)))
+    return {'nb_phrases': len(phrases), 'nb_composed': int(covered.sum()), 'max_relative_error': max_relative_error}
+
+
+def read_phrases(list_of_path):
+    """
+    :param list_of_path: list of files containing one phrase per line
+    :return: generator over the (stripped) phrases
+    """
+    for path in list_of_path:
+        with open(path, 'r', encoding='utf-8', errors='replace') as phrases_file:
+            for line in phrases_file:
+                yield line.strip()
+
+
+if __name__ == '__main__':
+    from swisscom_ai.research_keyphrase.embeddings.emb_distrib_local import EmbeddingDistributorLocal
+
+    parser = argparse.ArgumentParser(description='Export the vectors of the words and n-grams of the phrases (e.g the '
+                                                 'candidate phrases of a corpus) from a sent2vec model')
+    parser.add_argument('model_path', help='path to the sent2vec model')
+    parser.add_argument('table_path', help='path of the table directory to create')
+    parser.add_argument('phrases_files', nargs='+', help='files containing one phrase per line')
+    parser.add_argument('-word_ngrams', help='wordNgrams parameter of the model', default=2, type=int)
+    parser.add_argument('-model_vocabulary', help='also export all the words of the model', action='store_true')
+    parser.add_argument('-batch_size', help='number of n-grams embedded at once', default=10000, type=int)
+    parser.add_argument('-tolerance', help='maximum relative error of the validation', default=1e-4, type=float)
+    args = parser.parse_args()
+
+    embedding_distributor = EmbeddingDistributorLocal(args.model_path)
+    vocabulary = embedding_distributor.model.get_vocabulary() if args.model_vocabulary else ()
+    nb_ngrams = export_table(args.table_path, embedding_distributor, read_phrases(args.phrases_files), vocabulary,
+                             args.word_ngrams, args.batch_size, tolerance=args.tolerance)
+    print('Exported', nb_ngrams, 'n-grams to', args.table_path)
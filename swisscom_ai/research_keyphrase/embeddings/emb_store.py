@@ -0,0 +1,127 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""On-disk phrase -> embedding store.
+
+A store is a directory containing :
+    - vectors.npy : float32 matrix (one row per phrase) opened memory-mapped and read-only, s.t. several processes
+      share the same pages
+    - phrases.txt : the phrases, one per line, the i-th line corresponds to the i-th row of vectors.npy
+"""
+
+import argparse
+import os
+import shutil
+from collections import OrderedDict
+
+import numpy as np
+
+VECTORS_FILE = 'vectors.npy'
+PHRASES_FILE = 'phrases.txt'
+
+
+class PhraseEmbeddingStore:
+    """Read-only memory-mapped phrase -> embedding store"""
+
+    def __init__(self, store_path):
+        """
+        :param store_path: path of the store directory (see @build_store)
+        """
+        self.store_path = store_path
+        self.vectors = np.load(os.path.join(store_path, VECTORS_FILE), mmap_mode='r')
+        with open(os.path.join(store_path, PHRASES_FILE), 'r', encoding='utf-8') as phrases_file:
+            self.index = {phrase.rstrip('\n'): row for row, phrase in enumerate(phrases_file)}
+
+        if len(self.index) != self.vectors.shape[0]:
+            raise RuntimeError('Corrupted phrase store ' + store_path)
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, phrase):
+        return phrase in self.index
+
+    def lookup(self, phrases):
+        """
+        :param phrases: list of string
+        :return: list containing for each phrase its row in the store (or None if the phrase is unknown)
+        """
+        return [self.index.get(phrase) for phrase in phrases]
+
+
+def build_store(store_path, phrases, embedding_distrib, batch_size=10000):
+    """
+    Create a store containing the embeddings of the phrases.
+    The store is first written in a temporary directory and then moved to store_path.
+
+    :param store_path: path of the store directory to create
+    :param phrases: iterable of string (duplicates and empty phrases are ignored), a phrase cannot contain a line break
+    :param embedding_distrib: embedding distributor used to compute the embeddings see @EmbeddingDistributor
+    :param batch_size: number of phrases embedded at once
+    :return: number of phrases in the store
+    """
+    unique_phrases = list(OrderedDict.fromkeys(phrase for phrase in phrases if phrase))
+    if len(unique_phrases) == 0:
+        raise ValueError('No phrase to store')
+    for phrase in unique_phrases:
+        # One phrase per line in the phrases file
+        if '\n' in phrase or '\r' in phrase:
+            raise ValueError('New line is not allowed inside a phrase : ' + repr(phrase))
+
+    tmp_path = store_path + '.tmp'
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    vectors = None
+    for start in range(0, len(unique_phrases), batch_size):
+        batch = unique_phrases[start:start + batch_size]
+        embeddings = np.asarray(embedding_distrib.get_tokenized_sents_embeddings(batch), dtype=np.float32)
+        if vectors is None:
+            vectors = np.lib.format.open_memmap(os.path.join(tmp_path, VECTORS_FILE), mode='w+',
+                                                dtype=np.float32, shape=(len(unique_phrases), embeddings.shape[1]))
+        vectors[start:start + len(batch)] = embeddings
+    vectors.flush()
+    del vectors
+
+    with open(os.path.join(tmp_path, PHRASES_FILE), 'w', encoding='utf-8') as phrases_file:
+        for phrase in unique_phrases:
+            phrases_file.write(phrase + '\n')
+
+    if os.path.exists(store_path):
+        shutil.rmtree(store_path)
+    os.rename(tmp_path, store_path)
+    return len(unique_phrases)
+
+
+def read_phrases(list_of_path):
+    """
+    :param list_of_path: list of files containing one phrase per line
+    :return: generator over the (stripped) phrases
+    """
+    for path in list_of_path:
+        with open(path, 'r', encoding='utf-8', errors='replace') as phrases_file:
+            for line in phrases_file:
+                yield line.strip()
+
+
+if __name__ == '__main__':
+    from swisscom_ai.research_keyphrase.embeddings.emb_distrib_local import EmbeddingDistributorLocal
+
+    parser = argparse.ArgumentParser(description='Build a memory-mapped phrase embedding store from files containing '
+                                                 'one candidate phrase per line')
+    parser.add_argument('model_path', help='path to the sent2vec model')
+    parser.add_argument('store_path', help='path of the store directory to create')
+    parser.add_argument('phrases_files', nargs='+', help='files containing one phrase per line')
+    parser.add_argument('-batch_size', help='number of phrases embedded at once', default=10000, type=int)
+    args = parser.parse_args()
+
+    nb_phrases = build_store(args.store_path, read_phrases(args.phrases_files),
+                             EmbeddingDistributorLocal(args.model_path), batch_size=args.batch_size)
+    print('Stored', nb_phrases, 'phrases in', args.store_path)
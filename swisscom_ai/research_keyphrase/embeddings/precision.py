@@ -0,0 +1,70 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Precision of the embeddings : float64, float32 or int8 (each row is stored as int8 values and a float32 scale,
+the row is approximately values * scale). The computations on int8 embeddings are done in float32."""
+
+import numpy as np
+
+PRECISIONS = ['float64', 'float32', 'int8']
+
+
+def check_precision(precision):
+    if precision not in PRECISIONS:
+        raise ValueError('Unknown precision {}, expected one of {}'.format(precision, PRECISIONS))
+
+
+def compute_dtype(precision):
+    """
+    :return: numpy dtype used to compute with embeddings of the given precision
+    """
+    check_precision(precision)
+    return np.float64 if precision == 'float64' else np.float32
+
+
+def quantize_int8(X):
+    """
+    :param X: ndarray of shape (n, dimension of embeddings)
+    :return: tuple (int8 ndarray of shape (n, dimension of embeddings), float32 ndarray of shape (n,)) : the values
+    and the scale of each row (the row is approximately values * scale, a zero row has a zero scale)
+    """
+    X = np.asarray(X, dtype=np.float32)
+    scale = np.abs(X).max(axis=1) / 127 if X.shape[1] > 0 else np.zeros(X.shape[0], dtype=np.float32)
+    safe_scale = np.where(scale == 0, 1, scale)
+    return np.rint(X / safe_scale[:, None]).astype(np.int8), scale.astype(np.float32)
+
+
+def dequantize_int8(values, scale, dtype=np.float32):
+    """
+    :param values, scale: int8 values and scale of each row see @quantize_int8
+    :return: ndarray of shape values.shape of the given dtype
+    """
+    X = values.astype(dtype)
+    X *= scale[:, None]
+    return X
+
+
+def to_precision(X, precision):
+    """
+    :param X: ndarray of shape (n, dimension of embeddings)
+    :param precision: one of @PRECISIONS
+    :return: X in the given precision (int8 embeddings are returned dequantized in float32), X itself if it already
+    has the right dtype
+    """
+    if precision == 'int8':
+        return dequantize_int8(*quantize_int8(X))
+    return np.asarray(X, dtype=compute_dtype(precision))
+
+
+def embeddings_nbytes(shape, precision):
+    """
+    :param shape: shape (n, dimension of embeddings) of a matrix of embeddings
+    :param precision: one of @PRECISIONS
+    :return: number of bytes needed to store the matrix in the given precision (scales included for int8)
+    """
+    nb_rows, dim = shape
+    if precision == 'int8':
+        return nb_rows * dim + nb_rows * np.dtype(np.float32).itemsize
+    return nb_rows * dim * np.dtype(compute_dtype(precision)).itemsize
@@ -0,0 +1,95 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Compiled chunker : apply a cascade of chunk rules (same grammar syntax and semantics as nltk.RegexpParser, limited
+to {...} chunk rules) directly on the tag sequence of a sentence, without building nltk Tree objects"""
+
+import re
+
+# Same conventions as nltk.chunk.regexp.ChunkString
+CHUNK_TAG_CHAR = r'[^\{\}<>]'
+IN_STRIP_PATTERN = r'(?=[^\}]*(\{|$))'
+
+_STAGE_PATTERN = re.compile(r'(?P<nonterminal>(\.|[^:])*)(:(?P<rule>.*))')
+_RULE_PATTERN = re.compile(r'(?P<rule>(\\.|[^#])*)(?P<comment>#.*)?')
+_UNESCAPED_DOT = re.compile(r'(?<!\\)((?:\\\\)*)\.')
+
+
+def tag_pattern2re_pattern(tag_pattern):
+    """
+    Convert a tag pattern (e.g <NN.*|JJ>*<NN.*>) to a regular expression over the string <tag1><tag2>...
+    see nltk.chunk.regexp.tag_pattern2re_pattern
+    """
+    tag_pattern = re.sub(r'\s', '', tag_pattern)
+    tag_pattern = tag_pattern.replace('<', '(<(').replace('>', ')>)')
+    return _UNESCAPED_DOT.sub(lambda m: m.group(1) + CHUNK_TAG_CHAR, tag_pattern)
+
+
+class CompiledChunker:
+    """Cascade of stages, each stage applying its chunk rules in order and labelling the resulting chunks"""
+
+    def __init__(self, grammar):
+        """
+        :param grammar: grammar in the nltk.RegexpParser format containing only chunk rules ({...})
+        """
+        self.stages = []  # list of tuple (label, list of compiled regexp)
+        label = None
+        rules = []
+        for line in grammar.split('\n'):
+            line = line.strip()
+            m = _STAGE_PATTERN.match(line)
+            if m:
+                if rules:
+                    self.stages.append((label, rules))
+                label = m.group('nonterminal').strip()
+                rules = []
+                line = m.group('rule').strip()
+            if line == '' or line.startswith('#'):
+                continue
+
+            rule = _RULE_PATTERN.match(line).group('rule').strip()
+            if not (rule.startswith('{') and rule.endswith('}')):
+                raise ValueError('Only chunk rules are supported : ' + line)
+            if label is None:
+                raise ValueError('Rule without label : ' + line)
+            rules.append(re.compile('(?P<chunk>{}){}'.format(tag_pattern2re_pattern(rule[1:-1]), IN_STRIP_PATTERN)))
+        if rules:
+            self.stages.append((label, rules))
+
+    def chunk(self, tags):
+        """
+        :param tags: list of the POS tags of a sentence
+        :return: list of tuple (label, start, end) : each chunk created by any stage, containing the tokens
+        start to end (excluded) of the sentence
+        """
+        chunks = []
+        pieces = [(tag, i, i + 1) for i, tag in enumerate(tags)]  # (tag or chunk label, start, end)
+        if not pieces:
+            return chunks
+
+        for label, rules in self.stages:
+            chunk_string = '<' + '><'.join(piece[0] for piece in pieces) + '>'
+            for rule in rules:
+                chunk_string = rule.sub(r'{\g<chunk>}', chunk_string).replace('{}', '')
+
+            if '{' not in chunk_string:
+                continue
+
+            new_pieces = []
+            index = 0
+            in_chunk = False
+            for part in re.split('[{}]', chunk_string):
+                length = part.count('<')
+                if in_chunk:
+                    chunk = (label, pieces[index][1], pieces[index + length - 1][2])
+                    chunks.append(chunk)
+                    new_pieces.append(chunk)
+                else:
+                    new_pieces.extend(pieces[index:index + length])
+                index += length
+                in_chunk = not in_chunk
+            pieces = new_pieces
+
+        return chunks
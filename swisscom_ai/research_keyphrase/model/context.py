@@ -0,0 +1,79 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+from swisscom_ai.research_keyphrase.model.methods_embeddings import extract_candidates_embedding_for_doc, \
+    extract_doc_embedding, extract_sent_candidates_embedding_for_doc
+from swisscom_ai.research_keyphrase.model.similarity import candidate_similarities
+
+PHRASES = 'phrases'
+SENTENCES = 'sentences'
+
+
+class ExtractionContext:
+    """
+    Per-document memoization of the artifacts shared by several extractions on the same document (e.g @MMRPhrase and
+    @MMRSent) : the document embedding, the candidate phrases and sentences with their embeddings and their
+    similarities. Each artifact is computed (with one call to the embedding distributor) the first time it is needed.
+
+        context = ExtractionContext(embedding_distributor, text_obj)
+        keyphrases = MMRPhrase(embedding_distributor, text_obj, context=context)
+        key_sentences = MMRSent(embedding_distributor, text_obj, context=context)
+    """
+
+    def __init__(self, embdistrib, text_obj):
+        """
+        :param embdistrib: embedding distributor see @EmbeddingDistributor
+        :param text_obj: Input text representation see @InputTextObj
+        """
+        self.embdistrib = embdistrib
+        self.text_obj = text_obj
+        self._doc_embeddings = {}  # use_filtered -> document embedding
+        self._candidates = {}  # PHRASES or SENTENCES -> tuple (candidates, embeddings)
+        self._similarities = {}  # (kind, use_filtered, precision) -> tuple (doc_sim, sim_between)
+
+    @property
+    def pos_tagged(self):
+        return self.text_obj.pos_tagged
+
+    @property
+    def filtered_pos_tagged(self):
+        return self.text_obj.filtered_pos_tagged
+
+    def doc_embedding(self, use_filtered=True):
+        """
+        :param use_filtered: if true keep only candidate words in the raw text before computing the embedding
+        :return: numpy array of shape (1, dimension of embeddings) see @extract_doc_embedding
+        """
+        if use_filtered not in self._doc_embeddings:
+            self._doc_embeddings[use_filtered] = extract_doc_embedding(self.embdistrib, self.text_obj, use_filtered)
+        return self._doc_embeddings[use_filtered]
+
+    def candidates(self, kind=PHRASES):
+        """
+        :param kind: PHRASES or SENTENCES
+        :return: tuple (candidates, embeddings) see @extract_candidates_embedding_for_doc and
+        @extract_sent_candidates_embedding_for_doc
+        """
+        if kind not in self._candidates:
+            if kind == PHRASES:
+                self._candidates[kind] = extract_candidates_embedding_for_doc(self.embdistrib, self.text_obj)
+            elif kind == SENTENCES:
+                self._candidates[kind] = extract_sent_candidates_embedding_for_doc(self.embdistrib, self.text_obj)
+            else:
+                raise ValueError('Unknown kind of candidates ' + str(kind))
+        return self._candidates[kind]
+
+    def similarities(self, kind=PHRASES, use_filtered=True, precision=None):
+        """
+        :param kind: PHRASES or SENTENCES
+        :param use_filtered: see @doc_embedding
+        :param precision: precision of the similarities see @_MMR
+        :return: tuple (doc_sim, sim_between) see @candidate_similarities (the arrays must not be modified)
+        """
+        key = (kind, use_filtered, precision)
+        if key not in self._similarities:
+            _, X = self.candidates(kind)
+            self._similarities[key] = candidate_similarities(X, self.doc_embedding(use_filtered), precision)
+        return self._similarities[key]
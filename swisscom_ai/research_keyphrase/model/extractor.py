@@ -6,8 +6,11 @@
 """Contain method that return list of candidate"""
 
 import re
+from functools import lru_cache
 
-import nltk
+from swisscom_ai.research_keyphrase.model.chunker import CompiledChunker
+
+WORD_BOUNDARY = re.compile(r'\b')
 
 GRAMMAR_EN = """  NP:
         {<NN.*|JJ>*<NN.*>}  # Adjective(s)(optional) + Noun(s)"""
@@ -38,6 +41,15 @@ def get_grammar(lang):
     return grammar
 
 
+@lru_cache(maxsize=None)
+def get_chunker(lang):
+    """
+    :param lang: language (currently en, fr and de are supported)
+    :return: the @CompiledChunker of the grammar of the language (created once per language)
+    """
+    return CompiledChunker(get_grammar(lang))
+
+
 def extract_candidates(text_obj, no_subset=False):
     """
     Based on part of speech return a list of candidate phrases
@@ -49,13 +61,14 @@ def extract_candidates(text_obj, no_subset=False):
 
     keyphrase_candidate = set()
 
-    np_parser = nltk.RegexpParser(get_grammar(text_obj.lang))  # Noun phrase parser
-    trees = np_parser.parse_sents(text_obj.pos_tagged)  # Generator with one tree per sentence
+    np_chunker = get_chunker(text_obj.lang)  # Noun phrase chunker
 
-    for tree in trees:
-        for subtree in tree.subtrees(filter=lambda t: t.label() == 'NP'):  # For each nounphrase
-            # Concatenate the token with a space
-            keyphrase_candidate.add(' '.join(word for word, tag in subtree.leaves()))
+    tokens = text_obj.tokens
+    for sent_start, sent_end in text_obj.sentence_spans():
+        for label, start, end in np_chunker.chunk(text_obj.sentence_tags(sent_start, sent_end)):
+            if label == 'NP':  # For each nounphrase
+                # Concatenate the token with a space
+                keyphrase_candidate.add(' '.join(tokens[sent_start + start:sent_start + end]))
 
     keyphrase_candidate = {kp for kp in keyphrase_candidate if len(kp.split()) <= 5}
 
@@ -73,7 +86,7 @@ def extract_sent_candidates(text_obj):
     :param text_obj: input Text Representation see @InputTextObj
     :return: list of tokenized sentence (string) , each token is separated by a space in the string
     """
-    return [(' '.join(word for word, tag in sent)) for sent in text_obj.pos_tagged]
+    return [' '.join(text_obj.tokens[start:end]) for start, end in text_obj.sentence_spans()]
 
 
 def unique_ngram_candidates(strings):
@@ -84,7 +97,12 @@ def unique_ngram_candidates(strings):
     :return: List of string where no string is fully contained inside another string
     """
     results = []
+    # Every substring of the kept strings which starts and ends on a word boundary, i.e s is in contained iff
+    # re.search(r'\b{}\b'.format(re.escape(s)), r) for one of the kept strings r
+    contained = set()
     for s in sorted(set(strings), key=len, reverse=True):
-        if not any(re.search(r'\b{}\b'.format(re.escape(s)), r) for r in results):
+        if s not in contained:
             results.append(s)
+            boundaries = [m.start() for m in WORD_BOUNDARY.finditer(s)]
+            contained.update(s[start:end] for idx, start in enumerate(boundaries) for end in boundaries[idx:])
     return results
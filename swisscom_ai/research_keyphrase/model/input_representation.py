@@ -3,11 +3,44 @@
 #
 #Authors: Kamil Bennani-Smires, Yann Savary
 
-from nltk.stem import PorterStemmer
+import sys
+import threading
+from array import array
+
+# Tags are stored as small integers, TAGS[tag_id] is the tag and TAG_IDS[tag] its id (shared by all the documents)
+TAGS = []
+TAG_IDS = {}
+_tags_lock = threading.Lock()
+
+
+def get_tag_id(tag):
+    """
+    :param tag: POS tag (string)
+    :return: integer id of the tag (a new id is created for an unseen tag)
+    """
+    tag_id = TAG_IDS.get(tag)
+    if tag_id is None:
+        with _tags_lock:
+            tag_id = TAG_IDS.get(tag)
+            if tag_id is None:
+                tag_id = len(TAGS)
+                TAGS.append(tag)
+                TAG_IDS[tag] = tag_id
+    return tag_id
 
 
 class InputTextObj:
-    """Represent the input text in which we want to extract keyphrases"""
+    """Represent the input text in which we want to extract keyphrases
+
+    The text is stored in flat arrays built in a single pass : tokens (interned strings), tag_ids (integer codes see
+    @TAGS) and sent_offsets (the i-th sentence contains the tokens sent_offsets[i] to sent_offsets[i + 1]).
+    The list of list of tuple views (pos_tagged and filtered_pos_tagged) are only materialized when accessed.
+    Assigning a new pos_tagged rebuilds the flat arrays and assigning a new filtered_pos_tagged replaces the tokens
+    used by lowercased_tokens(use_filtered=True) ; modifying the returned lists in place has no effect.
+    """
+
+    __slots__ = ['min_word_len', 'considered_tags', 'isStemmed', 'lang', 'tokens', 'tag_ids', 'sent_offsets',
+                 '_lowercase', '_pos_tagged', '_filtered_pos_tagged', '_filtered_assigned', '__weakref__']
 
     def __init__(self, pos_tagged, lang, stem=False, min_word_len=3):
         """
@@ -17,35 +50,153 @@ class InputTextObj:
         """
         self.min_word_len = min_word_len
         self.considered_tags = {'NN', 'NNS', 'NNP', 'NNPS', 'JJ'}
-        self.pos_tagged = []
-        self.filtered_pos_tagged = []
         self.isStemmed = stem
         self.lang = lang
+        self._lowercase = not stem  # stemmed tokens are not lowercased
+        self._pos_tagged = None
+        self._filtered_pos_tagged = None
+        self._filtered_assigned = False
 
+        stemmer = None
         if stem:
+            from nltk.stem import PorterStemmer
             stemmer = PorterStemmer()
-            self.pos_tagged = [[(stemmer.stem(t[0]), t[1]) for t in sent] for sent in pos_tagged]
-        else:
-            self.pos_tagged = [[(t[0].lower(), t[1]) for t in sent] for sent in pos_tagged]
-
-        temp = []
-        for sent in self.pos_tagged:
-            s = []
-            for elem in sent:
-                if len(elem[0]) < min_word_len:
-                    s.append((elem[0], 'LESS'))
+        # Convert some language-specific tag (NC, NE to NN) or ADJA ->JJ see convert method.
+        convert_tags = lang in ['fr', 'de']
+        less_id = get_tag_id('LESS')
+        tag_id_cache = {}  # original tag -> tag id
+
+        tokens = []
+        tag_ids = array('H')
+        sent_offsets = array('L', [0])
+        for sent in pos_tagged:
+            for word, tag in sent:
+                word = stemmer.stem(word) if stem else word.lower()
+                tokens.append(sys.intern(word))
+                if len(word) < min_word_len:
+                    tag_ids.append(less_id)
                 else:
-                    s.append(elem)
-            temp.append(s)
+                    tag_id = tag_id_cache.get(tag)
+                    if tag_id is None:
+                        tag_id = tag_id_cache[tag] = get_tag_id(convert(tag) if convert_tags else tag)
+                    tag_ids.append(tag_id)
+            sent_offsets.append(len(tokens))
 
-        self.pos_tagged = temp
-        # Convert some language-specific tag (NC, NE to NN) or ADJA ->JJ see convert method.
-        if lang in ['fr', 'de']:
-            self.pos_tagged = [[(tagged_token[0], convert(tagged_token[1])) for tagged_token in sentence] for sentence
-                               in
-                               self.pos_tagged]
-        self.filtered_pos_tagged = [[(t[0].lower(), t[1]) for t in sent if self.is_candidate(t)] for sent in
-                                    self.pos_tagged]
+        self.tokens = tokens
+        self.tag_ids = tag_ids
+        self.sent_offsets = sent_offsets
+
+    @classmethod
+    def from_flat(cls, tokens, tag_ids, sent_offsets, lang, min_word_len=3):
+        """
+        Build an InputTextObj directly from flat arrays (e.g read from a binary tagged corpus see @TaggedCorpusReader)
+        without going through the list of list of tuple representation.
+
+        :param tokens: list of the lowercased (interned) tokens of the document
+        :param tag_ids: array('H') containing for each token the id of its tag (see @TAGS) : language-specific tags
+        already converted (see @convert) and 'LESS' for the tokens shorter than min_word_len
+        :param sent_offsets: array('L') the i-th sentence contains the tokens sent_offsets[i] to sent_offsets[i + 1]
+        :param lang: language
+        :param min_word_len: minimum length of the words used to build tag_ids
+        """
+        text_obj = cls.__new__(cls)
+        text_obj.min_word_len = min_word_len
+        text_obj.considered_tags = {'NN', 'NNS', 'NNP', 'NNPS', 'JJ'}
+        text_obj.isStemmed = False
+        text_obj.lang = lang
+        text_obj.tokens = tokens
+        text_obj.tag_ids = tag_ids
+        text_obj.sent_offsets = sent_offsets
+        text_obj._lowercase = True
+        text_obj._pos_tagged = None
+        text_obj._filtered_pos_tagged = None
+        text_obj._filtered_assigned = False
+        return text_obj
+
+    @property
+    def pos_tagged(self):
+        """
+        :return: list of sentences where each sentence is a list of tuple (word, tag)
+        """
+        if self._pos_tagged is None:
+            tokens, tag_ids = self.tokens, self.tag_ids
+            self._pos_tagged = [[(tokens[i], TAGS[tag_ids[i]]) for i in range(start, end)]
+                                for start, end in self.sentence_spans()]
+        return self._pos_tagged
+
+    @pos_tagged.setter
+    def pos_tagged(self, pos_tagged):
+        """
+        :param pos_tagged: list of sentences where each sentence is a list of tuple (word, tag), the words and tags are
+        stored as they are (no lowercasing, stemming or tag conversion). filtered_pos_tagged is derived from it again.
+        """
+        tokens = []
+        tag_ids = array('H')
+        sent_offsets = array('L', [0])
+        for sent in pos_tagged:
+            for word, tag in sent:
+                tokens.append(sys.intern(word))
+                tag_ids.append(get_tag_id(tag))
+            sent_offsets.append(len(tokens))
+
+        self.tokens = tokens
+        self.tag_ids = tag_ids
+        self.sent_offsets = sent_offsets
+        self._lowercase = all(token == token.lower() for token in tokens)
+        self._pos_tagged = None
+        self._filtered_pos_tagged = None
+        self._filtered_assigned = False
+
+    @property
+    def filtered_pos_tagged(self):
+        """
+        :return: list of sentences where each sentence is a list of tuple (lowercased word, tag) containing only the
+        candidate words (see @is_candidate)
+        """
+        if self._filtered_pos_tagged is None:
+            tokens, tag_ids = self.lowercased_tokens(), self.tag_ids
+            considered_ids = self._considered_tag_ids()
+            self._filtered_pos_tagged = [[(tokens[i], TAGS[tag_ids[i]]) for i in range(start, end)
+                                          if tag_ids[i] in considered_ids]
+                                         for start, end in self.sentence_spans()]
+        return self._filtered_pos_tagged
+
+    @filtered_pos_tagged.setter
+    def filtered_pos_tagged(self, filtered_pos_tagged):
+        """
+        :param filtered_pos_tagged: list of sentences where each sentence is a list of tuple (word, tag), its words are
+        returned by lowercased_tokens(use_filtered=True) until pos_tagged is assigned
+        """
+        self._filtered_pos_tagged = filtered_pos_tagged
+        self._filtered_assigned = True
+
+    def sentence_spans(self):
+        """
+        :return: generator over tuple (start, end) : the tokens of each sentence are tokens[start:end]
+        """
+        offsets = self.sent_offsets
+        return zip(offsets[:-1], offsets[1:])
+
+    def sentence_tags(self, start, end):
+        """
+        :return: list of the tags (string) of the tokens start to end (excluded)
+        """
+        return [TAGS[tag_id] for tag_id in self.tag_ids[start:end]]
+
+    def lowercased_tokens(self, use_filtered=False):
+        """
+        :param use_filtered: if true keep only candidate words (see @is_candidate)
+        :return: list of the lowercased tokens of the whole document
+        """
+        if use_filtered and self._filtered_assigned:
+            return [word.lower() for sent in self._filtered_pos_tagged for word, tag in sent]
+        tokens = self.tokens
+        if not self._lowercase:
+            tokens = [token.lower() for token in tokens]
+        if use_filtered:
+            considered_ids = self._considered_tag_ids()
+            tokens = [token for token, tag_id in zip(tokens, self.tag_ids) if tag_id in considered_ids]
+        return tokens
 
     def is_candidate(self, tagged_token):
         """
@@ -59,12 +210,40 @@ class InputTextObj:
         """
         :return: set of all candidates word
         """
-        return {tagged_token[0].lower()
-                for sentence in self.pos_tagged
-                for tagged_token in sentence
-                if self.is_candidate(tagged_token) and len(tagged_token[0]) >= self.min_word_len
+        considered_ids = self._considered_tag_ids()
+        return {token.lower()
+                for token, tag_id in zip(self.tokens, self.tag_ids)
+                if tag_id in considered_ids and len(token) >= self.min_word_len
                 }
 
+    def __getstate__(self):
+        # Tag ids are only valid in the current process (see @TAGS) : pickle the tags used by the document and the
+        # position of each token's tag in that list
+        state = {slot: getattr(self, slot) for slot in self.__slots__ if not slot.startswith('_')}
+        used_tag_ids = sorted(set(self.tag_ids))
+        local_ids = {tag_id: local_id for local_id, tag_id in enumerate(used_tag_ids)}
+        state['tags'] = [TAGS[tag_id] for tag_id in used_tag_ids]
+        state['tag_ids'] = array('H', (local_ids[tag_id] for tag_id in self.tag_ids))
+        state['lowercase'] = self._lowercase
+        if self._filtered_assigned:
+            state['filtered_pos_tagged'] = self._filtered_pos_tagged
+        return state
+
+    def __setstate__(self, state):
+        tag_ids = [get_tag_id(tag) for tag in state.pop('tags')]
+        state['tag_ids'] = array('H', (tag_ids[local_id] for local_id in state['tag_ids']))
+        lowercase = state.pop('lowercase')
+        filtered_pos_tagged = state.pop('filtered_pos_tagged', None)
+        for slot, value in state.items():
+            setattr(self, slot, value)
+        self._lowercase = lowercase
+        self._pos_tagged = None
+        self._filtered_pos_tagged = filtered_pos_tagged
+        self._filtered_assigned = filtered_pos_tagged is not None
+
+    def _considered_tag_ids(self):
+        return {TAG_IDS[tag] for tag in self.considered_tags if tag in TAG_IDS}
+
 
 def convert(fr_or_de_tag):
     if fr_or_de_tag in {'NN', 'NNE', 'NE', 'N', 'NPP', 'NC', 'NOUN'}:
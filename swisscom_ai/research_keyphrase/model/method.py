@@ -6,13 +6,16 @@
 import warnings
 
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 
+from swisscom_ai.research_keyphrase.model.context import PHRASES, SENTENCES
 from swisscom_ai.research_keyphrase.model.methods_embeddings import extract_candidates_embedding_for_doc, \
-    extract_doc_embedding, extract_sent_candidates_embedding_for_doc
+    extract_candidates_embedding_for_docs, extract_doc_embedding, extract_sent_candidates_embedding_for_doc
+from swisscom_ai.research_keyphrase.model.similarity import candidate_similarities
+from swisscom_ai.research_keyphrase.util.instrumentation import stage
 
 
-def _MMR(embdistrib, text_obj, candidates, X, beta, N, use_filtered, alias_threshold):
+def _MMR(embdistrib, text_obj, candidates, X, beta, N, use_filtered, alias_threshold, doc_embedd=None,
+         precision=None, similarities=None, max_aliases=None):
     """
     Core method using Maximal Marginal Relevance in charge to return the top-N candidates
 
@@ -23,6 +26,12 @@ def _MMR(embdistrib, text_obj, candidates, X, beta, N, use_filtered, alias_thres
     :param beta: hyperparameter beta for MMR (control tradeoff between informativeness and diversity)
     :param N: number of candidates to extract
     :param use_filtered: if true filter the text by keeping only candidate word before computing the doc embedding
+    :param doc_embedd: precomputed document embedding of shape (1, dimension of embeddings), computed if None
+    :param precision: precision of the candidate embeddings and of the similarities see @PRECISIONS (default : dtype
+    of the embeddings)
+    :param similarities: precomputed tuple (doc_sim, sim_between) see @candidate_similarities (doc_embedd and precision
+    are then ignored)
+    :param max_aliases: maximum number of aliases per keyphrase see @get_aliases
     :return: A tuple with 3 elements :
     1)list of the top-N candidates (or less if there are not enough candidates) (list of string)
     2)list of associated relevance scores (list of float)
@@ -30,47 +39,68 @@ def _MMR(embdistrib, text_obj, candidates, X, beta, N, use_filtered, alias_thres
     """
 
     N = min(N, len(candidates))
-    doc_embedd = extract_doc_embedding(embdistrib, text_obj, use_filtered)  # Extract doc embedding
-    doc_sim = cosine_similarity(X, doc_embedd.reshape(1, -1))
+    if similarities is None:
+        if doc_embedd is None:
+            doc_embedd = extract_doc_embedding(embdistrib, text_obj, use_filtered)  # Extract doc embedding
+        with stage('similarities', nb_candidates=len(candidates), matrix_size=len(candidates) ** 2):
+            similarities = candidate_similarities(X, doc_embedd, precision)
+    doc_sim, sim_between = similarities
 
-    doc_sim_norm = doc_sim/np.max(doc_sim)
-    doc_sim_norm = 0.5 + (doc_sim_norm - np.average(doc_sim_norm)) / np.std(doc_sim_norm)
+    with stage('mmr', nb_candidates=len(candidates), N=N):
+        doc_sim_norm = doc_sim/np.max(doc_sim)
+        doc_sim_norm = 0.5 + (doc_sim_norm - np.average(doc_sim_norm)) / np.std(doc_sim_norm)
 
-    sim_between = cosine_similarity(X)
-    np.fill_diagonal(sim_between, np.NaN)
+        sim_between_norm = sim_between/np.nanmax(sim_between, axis=0)
+        sim_between_norm = \
+            0.5 + (sim_between_norm - np.nanmean(sim_between_norm, axis=0)) / np.nanstd(sim_between_norm, axis=0)
 
-    sim_between_norm = sim_between/np.nanmax(sim_between, axis=0)
-    sim_between_norm = \
-        0.5 + (sim_between_norm - np.nanmean(sim_between_norm, axis=0)) / np.nanstd(sim_between_norm, axis=0)
+        selected_candidates = _MMR_selection(doc_sim, doc_sim_norm, lambda j: sim_between_norm[:, j], beta, N)
 
-    selected_candidates = []
-    unselected_candidates = [c for c in range(len(candidates))]
+        # Not using normalized version of doc_sim for computing relevance
+        relevance_list = max_normalization(doc_sim[selected_candidates]).tolist()
+
+    with stage('aliases', nb_candidates=len(candidates), N=N):
+        aliases_list = get_aliases(sim_between[selected_candidates, :], candidates, alias_threshold,
+                                   max_aliases=max_aliases)
+
+    return candidates[selected_candidates].tolist(), relevance_list, aliases_list
+
+
+def _MMR_selection(doc_sim, doc_sim_norm, sim_between_norm_column, beta, N):
+    """
+    Incremental MMR selection : keep for each candidate its maximum similarity to the already selected candidates and
+    update it with a single column of the normalized similarity matrix after each pick, s.t. each step costs
+    O(nb candidates).
+
+    :param doc_sim: ndarray of shape (nb candidates, 1) similarity between each candidate and the document
+    :param doc_sim_norm: ndarray of shape (nb candidates, 1) normalized version of doc_sim
+    :param sim_between_norm_column: function returning for a candidate index j the column j of the normalized
+    similarity matrix between candidates (ndarray of shape (nb candidates,))
+    :param beta: hyperparameter beta for MMR (control tradeoff between informativeness and diversity)
+    :param N: number of candidates to select (should be <= nb candidates)
+    :return: list of the indices of the selected candidates (in order of selection)
+    """
+    relevance = beta * doc_sim_norm[:, 0]
+    unselected_mask = np.ones(doc_sim.shape[0], dtype=bool)
 
     j = np.argmax(doc_sim)
-    selected_candidates.append(j)
-    unselected_candidates.remove(j)
+    selected_candidates = [j]
+    unselected_mask[j] = False
+    max_sim_to_selected = np.array(sim_between_norm_column(j))
 
     for _ in range(N - 1):
-        selec_array = np.array(selected_candidates)
-        unselec_array = np.array(unselected_candidates)
-
-        distance_to_doc = doc_sim_norm[unselec_array, :]
-        dist_between = sim_between_norm[unselec_array][:, selec_array]
-        if dist_between.ndim == 1:
-            dist_between = dist_between[:, np.newaxis]
-        j = np.argmax(beta * distance_to_doc - (1 - beta) * np.max(dist_between, axis=1).reshape(-1, 1))
-        item_idx = unselected_candidates[j]
-        selected_candidates.append(item_idx)
-        unselected_candidates.remove(item_idx)
-
-    # Not using normalized version of doc_sim for computing relevance
-    relevance_list = max_normalization(doc_sim[selected_candidates]).tolist()
-    aliases_list = get_aliases(sim_between[selected_candidates, :], candidates, alias_threshold)
+        unselected_candidates = np.flatnonzero(unselected_mask)
+        mmr_score = relevance[unselected_candidates] - (1 - beta) * max_sim_to_selected[unselected_candidates]
+        j = unselected_candidates[np.argmax(mmr_score)]
+        selected_candidates.append(j)
+        unselected_mask[j] = False
+        np.maximum(max_sim_to_selected, sim_between_norm_column(j), out=max_sim_to_selected)
 
-    return candidates[selected_candidates].tolist(), relevance_list, aliases_list
+    return selected_candidates
 
 
-def MMRPhrase(embdistrib, text_obj, beta=0.65, N=10, use_filtered=True, alias_threshold=0.8):
+def MMRPhrase(embdistrib, text_obj, beta=0.65, N=10, use_filtered=True, alias_threshold=0.8, precision=None,
+              context=None, max_aliases=None):
     """
     Extract N keyphrases
 
@@ -79,21 +109,57 @@ def MMRPhrase(embdistrib, text_obj, beta=0.65, N=10, use_filtered=True, alias_th
     :param beta: hyperparameter beta for MMR (control tradeoff between informativeness and diversity)
     :param N: number of keyphrases to extract
     :param use_filtered: if true filter the text by keeping only candidate word before computing the doc embedding
+    :param precision: precision of the similarity computations see @_MMR
+    :param context: @ExtractionContext of the document (optional) : the document embedding, the candidates and their
+    similarities are taken from it (and computed only once for all the extractions using the same context)
+    :param max_aliases: maximum number of aliases per keyphrase see @get_aliases
     :return: A tuple with 3 elements :
     1)list of the top-N candidates (or less if there are not enough candidates) (list of string)
     2)list of associated relevance scores (list of float)
     3)list containing for each keyphrase a list of alias (list of list of string)
     """
-    candidates, X = extract_candidates_embedding_for_doc(embdistrib, text_obj)
+    if context is not None:
+        candidates, X = context.candidates(PHRASES)
+    else:
+        candidates, X = extract_candidates_embedding_for_doc(embdistrib, text_obj)
 
     if len(candidates) == 0:
         warnings.warn('No keyphrase extracted for this document')
         return None, None, None
 
-    return _MMR(embdistrib, text_obj, candidates, X, beta, N, use_filtered, alias_threshold)
+    similarities = None if context is None else context.similarities(PHRASES, use_filtered, precision)
+    return _MMR(embdistrib, text_obj, candidates, X, beta, N, use_filtered, alias_threshold, precision=precision,
+                similarities=similarities, max_aliases=max_aliases)
+
 
+def MMRPhraseBatch(embdistrib, text_objs, beta=0.65, N=10, use_filtered=True, alias_threshold=0.8, precision=None):
+    """
+    Extract N keyphrases for each document of a batch.
+    All candidates and document embeddings of the batch are computed with a single call to the embedding distributor,
+    the result is the same as calling @MMRPhrase on each document.
 
-def MMRSent(embdistrib, text_obj, beta=0.5, N=10, use_filtered=True):
+    :param embdistrib: embedding distributor see @EmbeddingDistributor
+    :param text_objs: list of input text representations see @InputTextObj
+    :param beta: hyperparameter beta for MMR (control tradeoff between informativeness and diversity)
+    :param N: number of keyphrases to extract per document
+    :param use_filtered: if true filter the text by keeping only candidate word before computing the doc embedding
+    :param precision: precision of the similarity computations see @_MMR
+    :return: list containing for each document the tuple returned by @MMRPhrase
+    """
+    results = []
+    embeddings_per_doc = extract_candidates_embedding_for_docs(embdistrib, text_objs, use_filtered)
+    for text_obj, (candidates, X, doc_embedd) in zip(text_objs, embeddings_per_doc):
+        if len(candidates) == 0:
+            warnings.warn('No keyphrase extracted for this document')
+            results.append((None, None, None))
+        else:
+            results.append(_MMR(embdistrib, text_obj, candidates, X, beta, N, use_filtered, alias_threshold,
+                                doc_embedd=doc_embedd, precision=precision))
+    return results
+
+
+def MMRSent(embdistrib, text_obj, beta=0.5, N=10, use_filtered=True, alias_threshold=0.8, precision=None,
+            context=None):
     """
 
     Extract N key sentences
@@ -103,15 +169,24 @@ def MMRSent(embdistrib, text_obj, beta=0.5, N=10, use_filtered=True):
     :param beta: hyperparameter beta for MMR (control tradeoff between informativeness and diversity)
     :param N: number of key sentences to extract
     :param use_filtered: if true filter the text by keeping only candidate word before computing the doc embedding
-    :return: list of N key sentences (or less if there are not enough candidates)
+    :param alias_threshold: threshold to group sentences as aliases
+    :param precision: precision of the similarity computations see @_MMR
+    :param context: @ExtractionContext of the document (optional) see @MMRPhrase
+    :return: the tuple returned by @_MMR for the N key sentences (or less if there are not enough candidates),
+    an empty list if the document has no sentence
     """
-    candidates, X = extract_sent_candidates_embedding_for_doc(embdistrib, text_obj)
+    if context is not None:
+        candidates, X = context.candidates(SENTENCES)
+    else:
+        candidates, X = extract_sent_candidates_embedding_for_doc(embdistrib, text_obj)
 
     if len(candidates) == 0:
         warnings.warn('No keysentence extracted for this document')
         return []
 
-    return _MMR(embdistrib, text_obj, candidates, X, beta, N, use_filtered)
+    similarities = None if context is None else context.similarities(SENTENCES, use_filtered, precision)
+    return _MMR(embdistrib, text_obj, candidates, X, beta, N, use_filtered, alias_threshold, precision=precision,
+                similarities=similarities)
 
 
 def max_normalization(array):
@@ -123,27 +198,51 @@ def max_normalization(array):
     return 1/np.max(array) * array.squeeze(axis=1)
 
 
-def get_aliases(kp_sim_between, candidates, threshold):
+def get_aliases(kp_sim_between, candidates, threshold, context=None, keyphrases=None, kind=PHRASES, max_aliases=None,
+                use_filtered=True, precision=None):
     """
     Find candidates which are very similar to the keyphrases (aliases)
     :param kp_sim_between: ndarray of shape (nb_kp , nb candidates) containing the similarity
     of each kp with all the candidates. Note that the similarity between the keyphrase and itself should be set to
     NaN or 0
     :param candidates: array of candidates (array of string)
+    :param context: @ExtractionContext of the document (optional) : if set with keyphrases, the candidates and their
+    similarities are taken from the context (kp_sim_between and candidates are ignored and can be None)
+    :param keyphrases: list of keyphrases, candidates of the context (used with context)
+    :param kind: kind of the keyphrases in the context (PHRASES or SENTENCES)
+    :param max_aliases: maximum number of aliases per keyphrase (optional, >= 0), the most similar ones are kept
+    :param use_filtered: use_filtered of the extraction of the keyphrases (used with context, s.t. its similarities
+    are reused)
+    :param precision: precision of the extraction of the keyphrases (used with context)
     :return: list containing for each keyphrase a list that contain candidates which are aliases
-    (very similar) (list of list of string)
+    (very similar) (list of list of string), sorted by decreasing similarity (ties by decreasing candidate index).
+    Note : the implementation before max_aliases used an unstable sort, the aliases are the same but their order among
+    equal similarities may differ from it.
     """
-
-    kp_sim_between = np.nan_to_num(kp_sim_between, 0)
-    idx_sorted = np.flip(np.argsort(kp_sim_between), 1)
+    if max_aliases is not None and max_aliases < 0:
+        raise ValueError('max_aliases must be >= 0')
+    if context is not None and keyphrases is not None:
+        candidates, _ = context.candidates(kind)
+        _, sim_between = context.similarities(kind, use_filtered, precision)
+        candidate_idx = {candidate: idx for idx, candidate in enumerate(candidates)}
+        kp_sim_between = sim_between[[candidate_idx[keyphrase] for keyphrase in keyphrases], :]
+
+    kp_sim_between = np.nan_to_num(kp_sim_between)
+    # Only the candidates above the threshold are sorted
+    above_threshold = kp_sim_between >= threshold
     aliases = []
-    for kp_idx, item in enumerate(idx_sorted):
-        alias_for_item = []
-        for i in item:
-            if kp_sim_between[kp_idx, i] >= threshold:
-                alias_for_item.append(candidates[i])
-            else:
-                break
-        aliases.append(alias_for_item)
+    for kp_idx in range(kp_sim_between.shape[0]):
+        if max_aliases == 0:
+            aliases.append([])
+            continue
+        alias_idx = np.flatnonzero(above_threshold[kp_idx])
+        alias_sim = kp_sim_between[kp_idx, alias_idx]
+        if max_aliases is not None and max_aliases < len(alias_idx):
+            # Keep every candidate tied with the max_aliases-th similarity, the sort below chooses among them
+            kth_sim = np.partition(alias_sim, len(alias_sim) - max_aliases)[len(alias_sim) - max_aliases]
+            kept = alias_sim >= kth_sim
+            alias_idx, alias_sim = alias_idx[kept], alias_sim[kept]
+        order = np.lexsort((-alias_idx, -alias_sim))[:max_aliases]
+        aliases.append([candidates[i] for i in alias_idx[order]])
 
     return aliases
@@ -0,0 +1,254 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Vectorized MMR for batches of documents.
+
+The embeddings are L2 normalized once in float32 and the similarities are plain dot products. The candidates of the
+documents of a bucket are padded to the same number of candidates (the padding is masked), s.t. the similarity
+matrices, their normalization and each step of the MMR selection are computed for all the documents of the bucket at
+once. Documents are grouped in buckets of similar numbers of candidates to limit the padding.
+
+The gain comes from replacing many small numpy calls by a few large ones : on batches of documents with up to about
+a hundred candidates the MMR step is 1.5 to 2 times faster than @_MMR on each document, for documents with several
+hundred candidates the similarity matrix products dominate and the gain is about 10% (see the mmr and mmr_vectorized
+stages of benchmark/suite.py). In exchange the peak memory is higher : a few float32 arrays of max_elements elements
+per bucket (a few MB with the default) instead of the matrices of a single document.
+"""
+
+import time
+import warnings
+
+import numpy as np
+
+from swisscom_ai.research_keyphrase.model.method import MMRPhraseBatch, get_aliases, max_normalization
+from swisscom_ai.research_keyphrase.model.method_scalable import compare_rankings
+from swisscom_ai.research_keyphrase.model.methods_embeddings import extract_candidates_embedding_for_docs
+from swisscom_ai.research_keyphrase.model.similarity import normalize_rows
+
+
+def _MMR_batch(candidates_per_doc, X_per_doc, doc_embedds, beta, N, alias_threshold, dtype=np.float32):
+    """
+    MMR for a bucket of documents (see module documentation), the result is the same as calling @_MMR on each
+    document up to the float32 precision
+
+    :param candidates_per_doc: list containing for each document the array of its candidates (at least one)
+    :param X_per_doc: list containing for each document the embeddings of its candidates
+    :param doc_embedds: list containing for each document its embedding
+    :param beta: hyperparameter beta for MMR (control tradeoff between informativeness and diversity)
+    :param N: number of candidates to extract per document
+    :param alias_threshold: threshold to group candidates as aliases
+    :param dtype: dtype used to compute the similarities
+    :return: list containing for each document the tuple returned by @_MMR
+    """
+    nb_docs = len(candidates_per_doc)
+    sizes = np.array([len(candidates) for candidates in candidates_per_doc])
+    max_size = sizes.max()
+    dim = X_per_doc[0].shape[1]
+
+    X = np.zeros((nb_docs, max_size, dim), dtype=dtype)
+    for doc_idx, X_doc in enumerate(X_per_doc):
+        X[doc_idx, :sizes[doc_idx]] = normalize_rows(X_doc, dtype)
+    valid = np.arange(max_size) < sizes[:, None]  # (nb docs, max size) mask of the real candidates
+    docs = normalize_rows(np.vstack([np.reshape(doc_embedd, (1, -1)) for doc_embedd in doc_embedds]), dtype)
+
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        # Documents with one or two candidates have undefined (NaN) normalized similarities, as in @_MMR
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+        doc_sim = np.einsum('bnd,bd->bn', X, docs)
+        doc_sim[~valid] = np.nan
+        doc_sim_norm = doc_sim / np.nanmax(doc_sim, axis=1, keepdims=True)
+        doc_sim_norm = 0.5 + (doc_sim_norm - np.nanmean(doc_sim_norm, axis=1, keepdims=True)) / \
+            np.nanstd(doc_sim_norm, axis=1, keepdims=True)
+
+        sim_between = np.matmul(X, X.transpose(0, 2, 1))
+        pairs = valid[:, :, None] & valid[:, None, :]
+        pairs[:, np.arange(max_size), np.arange(max_size)] = False
+        sim_between_norm = _column_normalization(sim_between, pairs, sizes - 1)
+        np.copyto(sim_between, np.nan, where=~pairs)
+
+    selected = _MMR_batch_selection(doc_sim, doc_sim_norm, sim_between_norm, valid, beta, np.minimum(sizes, N))
+
+    results = []
+    for doc_idx, selected_candidates in enumerate(selected):
+        size = sizes[doc_idx]
+        relevance_list = max_normalization(doc_sim[doc_idx, selected_candidates, None].astype(np.float64)).tolist()
+        aliases_list = get_aliases(sim_between[doc_idx, selected_candidates, :size], candidates_per_doc[doc_idx],
+                                   alias_threshold)
+        results.append((candidates_per_doc[doc_idx][selected_candidates].tolist(), relevance_list, aliases_list))
+    return results
+
+
+def _column_normalization(sim_between, pairs, counts):
+    """
+    Normalization of each column of the similarity matrices of @_MMR (division by the maximum of the column, then
+    0.5 + standardization) restricted to the pairs of candidates, computed with masked sums instead of the NaN aware
+    reductions (which copy the (nb docs, max size, max size) array several times)
+
+    :param sim_between: ndarray of shape (nb docs, max size, max size) similarity between candidates
+    :param pairs: boolean ndarray of the same shape, True for the pairs of distinct (non padding) candidates
+    :param counts: ndarray of shape (nb docs,) number of pairs in each column of a (non padding) candidate
+    :return: ndarray of the same shape as sim_between, NaN outside of pairs
+    """
+    counts = counts[:, None, None].astype(sim_between.dtype)
+    col_max = np.max(np.where(pairs, sim_between, -np.inf), axis=1, keepdims=True)
+    masked = np.where(pairs, sim_between, 0)
+    col_mean = masked.sum(axis=1, keepdims=True) / counts
+    np.subtract(masked, col_mean, out=masked, where=pairs)
+    col_std = np.sqrt(np.einsum('bij,bij->bj', masked, masked)[:, None, :] / counts)
+    # (x / max - mean / max) / (std / |max|) : dividing by the maximum only changes the sign
+    masked /= col_std * (col_max / np.abs(col_max))
+    masked += 0.5
+    np.copyto(masked, np.nan, where=~pairs)
+    return masked
+
+
+def _MMR_batch_selection(doc_sim, doc_sim_norm, sim_between_norm, valid, beta, nb_selected):
+    """
+    @_MMR_selection for several documents at once
+
+    :param doc_sim: ndarray of shape (nb docs, max size) similarity between each candidate and its document
+    :param doc_sim_norm: ndarray of shape (nb docs, max size) normalized version of doc_sim
+    :param sim_between_norm: ndarray of shape (nb docs, max size, max size) normalized similarity between candidates
+    :param valid: boolean ndarray of shape (nb docs, max size) False for the padding
+    :param beta: hyperparameter beta for MMR
+    :param nb_selected: ndarray of shape (nb docs,) number of candidates to select for each document
+    :return: list containing for each document the list of the indices of its selected candidates
+    """
+    nb_docs = doc_sim.shape[0]
+    doc_range = np.arange(nb_docs)
+    relevance = beta * doc_sim_norm
+    available = valid.copy()
+
+    j = np.nanargmax(doc_sim, axis=1)
+    selected = [j]
+    available[doc_range, j] = False
+    max_sim_to_selected = sim_between_norm[doc_range, :, j]
+
+    for _ in range(nb_selected.max() - 1):
+        mmr_score = relevance - (1 - beta) * max_sim_to_selected
+        # As in @_MMR_selection a NaN score of an available candidate is picked first by argmax
+        mmr_score[~available] = -np.inf
+        j = np.argmax(mmr_score, axis=1)
+        selected.append(j)
+        available[doc_range, j] = False
+        np.maximum(max_sim_to_selected, sim_between_norm[doc_range, :, j], out=max_sim_to_selected)
+
+    selected = np.stack(selected, axis=1)
+    return [selected[doc_idx, :nb_selected[doc_idx]].tolist() for doc_idx in range(nb_docs)]
+
+
+def _size_buckets(sizes, max_elements):
+    """
+    Group documents of similar sizes s.t. the padded similarity matrices of a bucket contain at most max_elements
+    elements (a document larger than that is alone in its bucket)
+
+    :param sizes: list of the number of candidates of each document
+    :return: list of lists of document indices
+    """
+    buckets = []
+    bucket = []
+    for doc_idx in sorted(range(len(sizes)), key=lambda idx: sizes[idx]):
+        # Documents are sorted by size, the last one added is the largest of the bucket
+        if bucket and (len(bucket) + 1) * sizes[doc_idx] ** 2 > max_elements:
+            buckets.append(bucket)
+            bucket = []
+        bucket.append(doc_idx)
+    if bucket:
+        buckets.append(bucket)
+    return buckets
+
+
+def MMRPhraseBatchVectorized(embdistrib, text_objs, beta=0.65, N=10, use_filtered=True, alias_threshold=0.8,
+                             max_elements=2 ** 18, dtype=np.float32):
+    """
+    Extract N keyphrases for each document of a batch with the vectorized MMR (see module documentation).
+    All candidates and document embeddings are computed with a single call to the embedding distributor.
+
+    :param embdistrib: embedding distributor see @EmbeddingDistributor
+    :param text_objs: list of input text representations see @InputTextObj
+    :param beta: hyperparameter beta for MMR (control tradeoff between informativeness and diversity)
+    :param N: number of keyphrases to extract per document
+    :param use_filtered: if true filter the text by keeping only candidate word before computing the doc embedding
+    :param alias_threshold: threshold to group candidates as aliases
+    :param max_elements: maximum number of elements of the padded similarity matrices of a bucket of documents (small
+    buckets whose matrices stay in the CPU cache are faster than a single large one)
+    :param dtype: dtype used to compute the similarities
+    :return: list containing for each document the tuple returned by @MMRPhrase
+    """
+    embeddings_per_doc = extract_candidates_embedding_for_docs(embdistrib, text_objs, use_filtered)
+    nb_empty = sum(1 for candidates, _, _ in embeddings_per_doc if len(candidates) == 0)
+    if nb_empty > 0:
+        warnings.warn('No keyphrase extracted for {} documents'.format(nb_empty))
+    return MMRBatchVectorized(embeddings_per_doc, beta, N, alias_threshold, max_elements, dtype)
+
+
+def MMRBatchVectorized(embeddings_per_doc, beta=0.65, N=10, alias_threshold=0.8, max_elements=2 ** 18,
+                       dtype=np.float32):
+    """
+    MMR step of @MMRPhraseBatchVectorized on already embedded documents
+
+    :param embeddings_per_doc: list containing for each document the tuple returned by
+    @extract_candidates_embedding_for_docs (candidates, their embeddings and the document embedding)
+    :param beta, N, alias_threshold, max_elements, dtype: @see MMRPhraseBatchVectorized
+    :return: list containing for each document the tuple returned by @MMRPhrase ((None, None, None) for the documents
+    without candidate)
+    """
+    results = [(None, None, None)] * len(embeddings_per_doc)
+    non_empty = [doc_idx for doc_idx, (candidates, _, _) in enumerate(embeddings_per_doc) if len(candidates) > 0]
+    sizes = [len(embeddings_per_doc[doc_idx][0]) for doc_idx in non_empty]
+    for bucket in _size_buckets(sizes, max_elements):
+        doc_indices = [non_empty[idx] for idx in bucket]
+        bucket_results = _MMR_batch([embeddings_per_doc[doc_idx][0] for doc_idx in doc_indices],
+                                    [embeddings_per_doc[doc_idx][1] for doc_idx in doc_indices],
+                                    [embeddings_per_doc[doc_idx][2] for doc_idx in doc_indices],
+                                    beta, N, alias_threshold, dtype)
+        for doc_idx, result in zip(doc_indices, bucket_results):
+            results[doc_idx] = result
+    return results
+
+
+def vectorized_mmr_report(embdistrib, text_objs, beta=0.65, N=10, alias_threshold=0.8, tolerance=1e-5):
+    """
+    Run @MMRPhraseBatch and @MMRPhraseBatchVectorized on the same documents and check that they agree
+
+    :param embdistrib: embedding distributor see @EmbeddingDistributor
+    :param text_objs: list of input text representations see @InputTextObj
+    :param beta, N, alias_threshold: @see MMRPhraseBatch
+    :param tolerance: maximum absolute difference allowed between the relevance scores
+    :return: dict with
+    identical : fraction of the documents for which both methods select the same keyphrases in the same order
+    max_relevance_diff : maximum absolute difference between the relevance scores of identical selections
+    same_aliases : fraction of the documents with identical selections for which the aliases are the same
+    within_tolerance : True if all the selections are identical and max_relevance_diff <= tolerance
+    exact_time and vectorized_time (in seconds), first_differences : compare_rankings of the differing documents
+    """
+    start = time.time()
+    exact = MMRPhraseBatch(embdistrib, text_objs, beta=beta, N=N, alias_threshold=alias_threshold)
+    exact_time = time.time() - start
+
+    start = time.time()
+    vectorized = MMRPhraseBatchVectorized(embdistrib, text_objs, beta=beta, N=N, alias_threshold=alias_threshold)
+    vectorized_time = time.time() - start
+
+    nb_identical = 0
+    nb_same_aliases = 0
+    max_relevance_diff = 0.0
+    first_differences = []
+    for (exact_kp, exact_relevance, exact_aliases), (kp, relevance, aliases) in zip(exact, vectorized):
+        if exact_kp != kp:
+            first_differences.append(compare_rankings(exact_kp, kp))
+            continue
+        nb_identical += 1
+        nb_same_aliases += exact_aliases == aliases
+        if exact_relevance:
+            max_relevance_diff = max(max_relevance_diff,
+                                     float(np.max(np.abs(np.subtract(exact_relevance, relevance)))))
+
+    nb_docs = max(len(text_objs), 1)
+    return {'identical': nb_identical / nb_docs, 'max_relevance_diff': max_relevance_diff,
+            'same_aliases': nb_same_aliases / max(nb_identical, 1),
+            'within_tolerance': nb_identical == len(text_objs) and max_relevance_diff <= tolerance,
+            'exact_time': exact_time, 'vectorized_time': vectorized_time, 'first_differences': first_differences}
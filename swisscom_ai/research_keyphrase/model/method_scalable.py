@@ -0,0 +1,150 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Scalable (approximate) version of MMR for documents with a very large number of candidates.
+
+The (nb candidates, nb candidates) similarity matrix is never created : its normalization statistics are computed
+by blocks of columns and the columns needed by the MMR selection are recomputed on demand in float32.
+Optionally the candidates are first pruned to the max_candidates most similar to the document, which is the
+accuracy/speed knob of this method (max_candidates=None keeps every candidate and only differs from @MMRPhrase by
+the float32 precision).
+"""
+
+import time
+import warnings
+
+import numpy as np
+
+from swisscom_ai.research_keyphrase.model.method import _MMR, _MMR_selection, get_aliases, max_normalization
+from swisscom_ai.research_keyphrase.model.methods_embeddings import extract_candidates_embedding_for_doc, \
+    extract_doc_embedding
+from swisscom_ai.research_keyphrase.model.similarity import blocked_column_stats, normalize_rows, \
+    normalized_similarity_column
+
+
+def _MMR_scalable(embdistrib, text_obj, candidates, X, beta, N, use_filtered, alias_threshold, doc_embedd=None,
+                  max_candidates=None, block_size=1024, dtype=np.float32):
+    """
+    Scalable version of @_MMR (see module documentation)
+
+    :param max_candidates: if set only the max_candidates candidates the most similar to the document are considered
+    for the selection (aliases are still searched among all the candidates)
+    :param block_size: number of columns of the similarity matrix between candidates computed at once
+    :param dtype: dtype used to compute the similarities
+    @see _MMR for the other parameters and the returned value
+    """
+    if doc_embedd is None:
+        doc_embedd = extract_doc_embedding(embdistrib, text_obj, use_filtered)  # Extract doc embedding
+
+    X_normalized = normalize_rows(X, dtype)
+    doc_sim_all = np.dot(X_normalized, normalize_rows(doc_embedd.reshape(1, -1), dtype)[0])
+
+    if max_candidates is not None and max_candidates < len(candidates):
+        # Keep the original order of the candidates s.t. ties are broken as in @_MMR
+        considered = np.sort(np.argpartition(-doc_sim_all, max_candidates - 1)[:max_candidates])
+    else:
+        considered = np.arange(len(candidates))
+
+    N = min(N, len(considered))
+    X_considered = X_normalized[considered]
+    doc_sim = doc_sim_all[considered].reshape(-1, 1)
+
+    doc_sim_norm = doc_sim / np.max(doc_sim)
+    doc_sim_norm = 0.5 + (doc_sim_norm - np.average(doc_sim_norm)) / np.std(doc_sim_norm)
+
+    col_max, col_mean, col_std = blocked_column_stats(X_considered, block_size)
+    selected = _MMR_selection(doc_sim, doc_sim_norm,
+                              lambda j: normalized_similarity_column(X_considered, j, col_max, col_mean, col_std),
+                              beta, N)
+    selected_candidates = considered[selected]
+
+    kp_sim_between = np.dot(X_normalized[selected_candidates], X_normalized.T)
+    kp_sim_between[np.arange(len(selected_candidates)), selected_candidates] = np.nan
+
+    relevance_list = max_normalization(doc_sim[selected].astype(np.float64)).tolist()
+    aliases_list = get_aliases(kp_sim_between, candidates, alias_threshold)
+
+    return candidates[selected_candidates].tolist(), relevance_list, aliases_list
+
+
+def MMRPhraseScalable(embdistrib, text_obj, beta=0.65, N=10, use_filtered=True, alias_threshold=0.8,
+                      max_candidates=None, block_size=1024):
+    """
+    Extract N keyphrases with the scalable version of MMR, memory usage is O(nb candidates * block_size) instead of
+    O(nb candidates ^ 2)
+
+    :param embdistrib: embedding distributor see @EmbeddingDistributor
+    :param text_obj: Input text representation see @InputTextObj
+    :param beta: hyperparameter beta for MMR (control tradeoff between informativeness and diversity)
+    :param N: number of keyphrases to extract
+    :param use_filtered: if true filter the text by keeping only candidate word before computing the doc embedding
+    :param max_candidates: if set only the max_candidates candidates the most similar to the document are considered
+    (lower is faster but further from @MMRPhrase)
+    :param block_size: number of columns of the similarity matrix between candidates computed at once
+    :return: @see MMRPhrase
+    """
+    candidates, X = extract_candidates_embedding_for_doc(embdistrib, text_obj)
+
+    if len(candidates) == 0:
+        warnings.warn('No keyphrase extracted for this document')
+        return None, None, None
+
+    return _MMR_scalable(embdistrib, text_obj, candidates, X, beta, N, use_filtered, alias_threshold,
+                         max_candidates=max_candidates, block_size=block_size)
+
+
+def compare_rankings(exact_keyphrases, approx_keyphrases):
+    """
+    Measure how much a ranking of keyphrases differs from the exact one
+
+    :param exact_keyphrases: list of keyphrases returned by @MMRPhrase
+    :param approx_keyphrases: list of keyphrases returned by @MMRPhraseScalable
+    :return: dict with
+    overlap : fraction of the exact keyphrases which are also extracted by the approximation
+    same_rank : fraction of the positions where both rankings contain the same keyphrase
+    first_difference : first position where the rankings differ (None if they are identical)
+    """
+    exact_keyphrases = exact_keyphrases or []
+    approx_keyphrases = approx_keyphrases or []
+    nb_exact = max(len(exact_keyphrases), 1)
+
+    same_positions = [exact == approx for exact, approx in zip(exact_keyphrases, approx_keyphrases)]
+    if len(exact_keyphrases) != len(approx_keyphrases):
+        same_positions += [False] * abs(len(exact_keyphrases) - len(approx_keyphrases))
+    first_difference = same_positions.index(False) if False in same_positions else None
+
+    return {'overlap': len(set(exact_keyphrases) & set(approx_keyphrases)) / nb_exact,
+            'same_rank': sum(same_positions) / max(len(same_positions), 1),
+            'first_difference': first_difference}
+
+
+def scalable_mmr_report(embdistrib, text_obj, beta=0.65, N=10, max_candidates=None, block_size=1024):
+    """
+    Run the exact and the scalable MMR on the same candidates of a document and report their difference
+
+    :param embdistrib: embedding distributor see @EmbeddingDistributor
+    :param text_obj: Input text representation see @InputTextObj
+    :param beta, N, max_candidates, block_size: @see MMRPhraseScalable
+    :return: dict with the keys of @compare_rankings plus exact_time and scalable_time (in seconds)
+    and nb_candidates
+    """
+    candidates, X = extract_candidates_embedding_for_doc(embdistrib, text_obj)
+    if len(candidates) == 0:
+        return None
+
+    doc_embedd = extract_doc_embedding(embdistrib, text_obj, True)
+
+    start = time.time()
+    exact_keyphrases = _MMR(embdistrib, text_obj, candidates, X, beta, N, True, 1, doc_embedd=doc_embedd)[0]
+    exact_time = time.time() - start
+
+    start = time.time()
+    approx_keyphrases = _MMR_scalable(embdistrib, text_obj, candidates, X, beta, N, True, 1, doc_embedd=doc_embedd,
+                                      max_candidates=max_candidates, block_size=block_size)[0]
+    scalable_time = time.time() - start
+
+    report = compare_rankings(exact_keyphrases, approx_keyphrases)
+    report.update({'exact_time': exact_time, 'scalable_time': scalable_time, 'nb_candidates': len(candidates)})
+    return report
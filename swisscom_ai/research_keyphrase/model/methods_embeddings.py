@@ -6,6 +6,7 @@
 import numpy as np
 
 from swisscom_ai.research_keyphrase.model.extractor import extract_candidates, extract_sent_candidates
+from swisscom_ai.research_keyphrase.util.instrumentation import stage
 
 
 def extract_doc_embedding(embedding_distrib, inp_rpr, use_filtered=False):
@@ -17,13 +18,21 @@ def extract_doc_embedding(embedding_distrib, inp_rpr, use_filtered=False):
     :param use_filtered: if true keep only candidate words in the raw text before computing the embedding
     :return: numpy array of shape (1, dimension of embeddings) that contains the document embedding
     """
-    if use_filtered:
-        tagged = inp_rpr.filtered_pos_tagged
-    else:
-        tagged = inp_rpr.pos_tagged
+    with stage('doc_embedding') as s:
+        tokenized_doc_text = extract_tokenized_doc_text(inp_rpr, use_filtered)
+        s.record(nb_chars=len(tokenized_doc_text))
+        return embedding_distrib.get_tokenized_sents_embeddings([tokenized_doc_text])
+
 
-    tokenized_doc_text = ' '.join(token[0].lower() for sent in tagged for token in sent)
-    return embedding_distrib.get_tokenized_sents_embeddings([tokenized_doc_text])
+def extract_tokenized_doc_text(inp_rpr, use_filtered=False):
+    """
+    Return the full document as a single tokenized string (tokens separated by a space)
+
+    :param inp_rpr: input text representation see @InputTextObj
+    :param use_filtered: if true keep only candidate words in the raw text
+    :return: string containing the lowercased tokens of the document
+    """
+    return ' '.join(inp_rpr.lowercased_tokens(use_filtered))
 
 
 def extract_candidates_embedding_for_doc(embedding_distrib, inp_rpr):
@@ -39,11 +48,13 @@ def extract_candidates_embedding_for_doc(embedding_distrib, inp_rpr):
     2) a numpy array of shape (number of candidate phrases, dimension of embeddings :
     each row is the embedding of one candidate phrase
     """
-    candidates = np.array(extract_candidates(inp_rpr))  # List of candidates based on PosTag rules
+    with stage('candidates') as s:
+        candidates = np.array(extract_candidates(inp_rpr))  # List of candidates based on PosTag rules
+        s.record(nb_candidates=len(candidates))
     if len(candidates) > 0:
-        embeddings = np.array(embedding_distrib.get_tokenized_sents_embeddings(candidates))  # Associated embeddings
-        valid_candidates_mask = ~np.all(embeddings == 0, axis=1)  # Only candidates which are not unknown.
-        return candidates[valid_candidates_mask], embeddings[valid_candidates_mask, :]
+        with stage('candidate_embedding', nb_candidates=len(candidates)):  # Associated embeddings
+            embeddings = np.asarray(embedding_distrib.get_tokenized_sents_embeddings(candidates))
+        return remove_unknown_candidates(candidates, embeddings)  # Only candidates which are not unknown.
     else:
         return np.array([]), np.array([])
 
@@ -59,8 +70,68 @@ def extract_sent_candidates_embedding_for_doc(embedding_distrib, inp_rpr):
     2) a numpy array of shape (number of candidate sentences, dimension of embeddings :
     each row is the embedding of one candidate sentence
     """
-    candidates = np.array(extract_sent_candidates(inp_rpr))
-    embeddings = np.array(embedding_distrib.get_tokenized_sents_embeddings(candidates))
+    with stage('sentence_candidates') as s:
+        candidates = np.array(extract_sent_candidates(inp_rpr))
+        s.record(nb_candidates=len(candidates))
+    with stage('sentence_embedding', nb_candidates=len(candidates)):
+        embeddings = np.asarray(embedding_distrib.get_tokenized_sents_embeddings(candidates))
+    return remove_unknown_candidates(candidates, embeddings)
+
+
+def remove_unknown_candidates(candidates, embeddings):
+    """
+    Remove the candidates which are unknown (zero embedding), the arrays are returned as is (without copy) if all the
+    candidates are known
+
+    :param candidates: array of candidates (array of string)
+    :param embeddings: ndarray of shape (number of candidates, dimension of embeddings)
+    :return: tuple (candidates, embeddings) restricted to the known candidates
+    """
+    valid_candidates_mask = embeddings.any(axis=1)
+    if valid_candidates_mask.all():
+        return candidates, embeddings
+    return candidates[valid_candidates_mask], embeddings[valid_candidates_mask]
+
+
+def extract_candidates_embedding_for_docs(embedding_distrib, inp_rprs, use_filtered=False, candidates_per_doc=None):
+    """
+    Batch version of @extract_candidates_embedding_for_doc and @extract_doc_embedding.
+
+    The candidate phrases and the document texts of all the documents are embedded with a single call to the
+    embedding distributor, the resulting matrix is then split back per document.
+
+    :param embedding_distrib: embedding distributor see @EmbeddingDistributor
+    :param inp_rprs: list of input text representations see @InputTextObj
+    :param use_filtered: if true keep only candidate words in the raw text before computing the doc embeddings
+    :param candidates_per_doc: list containing for each document its candidate phrases (see @extract_candidates),
+    extracted if None
+    :return: list containing for each document a tuple of three elements 1) the list of candidate phrases
+    2) a numpy array of shape (number of candidate phrases, dimension of embeddings) 3) a numpy array of shape
+    (1, dimension of embeddings) that contains the document embedding
+    """
+    if candidates_per_doc is None:
+        with stage('candidates', nb_docs=len(inp_rprs)):
+            candidates_per_doc = [extract_candidates(inp_rpr) for inp_rpr in inp_rprs]
+    candidates_per_doc = [np.array(candidates) for candidates in candidates_per_doc]
+    doc_texts = [extract_tokenized_doc_text(inp_rpr, use_filtered) for inp_rpr in inp_rprs]
+    if len(doc_texts) == 0:
+        return []
+
+    sents = [candidate for candidates in candidates_per_doc for candidate in candidates] + doc_texts
+    with stage('batch_embedding', nb_docs=len(doc_texts), nb_sents=len(sents)):
+        embeddings = np.asarray(embedding_distrib.get_tokenized_sents_embeddings(sents))
+    doc_embeddings = embeddings[-len(doc_texts):]
+
+    results = []
+    start = 0
+    for doc_idx, candidates in enumerate(candidates_per_doc):
+        end = start + len(candidates)
+        doc_embedd = doc_embeddings[doc_idx:doc_idx + 1]
+        if len(candidates) > 0:
+            # Only candidates which are not unknown.
+            results.append(remove_unknown_candidates(candidates, embeddings[start:end]) + (doc_embedd,))
+        else:
+            results.append((np.array([]), np.array([]), doc_embedd))
+        start = end
 
-    valid_candidates_mask = ~np.all(embeddings == 0, axis=1)
-    return candidates[valid_candidates_mask], embeddings[valid_candidates_mask, :]
+    return results
@@ -0,0 +1,112 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Cosine similarity helpers : similarities between the candidates and the document used by MMR, and their
+computation by blocks of columns, s.t. the full (nb candidates, nb candidates) matrix is never created"""
+
+import numpy as np
+
+from swisscom_ai.research_keyphrase.embeddings.precision import compute_dtype, to_precision
+
+
+def normalize_rows(X, dtype=np.float32):
+    """
+    :param X: ndarray of shape (n, dimension of embeddings)
+    :param dtype: dtype of the result
+    :return: ndarray of shape (n, dimension of embeddings) where each row has a L2 norm of 1 (zero rows are kept)
+    """
+    X = np.asarray(X, dtype=dtype)
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return X / norms
+
+
+def cosine_similarity(X, Y=None):
+    """
+    Same as sklearn.metrics.pairwise.cosine_similarity for dense arrays
+
+    :param X: ndarray of shape (n, dimension of embeddings)
+    :param Y: ndarray of shape (m, dimension of embeddings) (default : X)
+    :return: ndarray of shape (n, m) cosine similarity between each row of X and each row of Y (0 for a zero row),
+    float32 if X and Y are float32, float64 otherwise
+    """
+    X = np.asarray(X)
+    Y = X if Y is None else np.asarray(Y)
+    dtype = np.float32 if X.dtype == np.float32 and Y.dtype == np.float32 else np.float64
+    X_normalized = _sklearn_normalize(X, dtype)
+    Y_normalized = X_normalized if Y is X else _sklearn_normalize(Y, dtype)
+    return np.dot(X_normalized, Y_normalized.T)
+
+
+def _sklearn_normalize(X, dtype):
+    # Norms computed as sklearn.preprocessing.normalize does, s.t. the similarities are exactly the same
+    X = np.array(X, dtype=dtype)
+    norms = np.sqrt(np.einsum('ij,ij->i', X, X))
+    norms[norms == 0] = 1
+    X /= norms[:, np.newaxis]
+    return X
+
+
+def blocked_column_stats(X_normalized, block_size=1024):
+    """
+    Compute for each column of the cosine similarity matrix between candidates (diagonal excluded) the statistics
+    used by MMR to normalize it : the maximum of the column, and the mean and standard deviation of the
+    column divided by its maximum.
+
+    :param X_normalized: ndarray of shape (nb candidates, dimension of embeddings) with L2 normalized rows
+    :param block_size: number of columns of the similarity matrix computed at once
+    :return: tuple of three ndarray of shape (nb candidates,) : max, mean and std
+    """
+    nb_candidates = X_normalized.shape[0]
+    col_max = np.empty(nb_candidates, dtype=X_normalized.dtype)
+    col_mean = np.empty(nb_candidates, dtype=X_normalized.dtype)
+    col_std = np.empty(nb_candidates, dtype=X_normalized.dtype)
+
+    for start in range(0, nb_candidates, block_size):
+        end = min(start + block_size, nb_candidates)
+        block = np.dot(X_normalized, X_normalized[start:end].T)
+        block[np.arange(start, end), np.arange(end - start)] = np.nan
+
+        col_max[start:end] = np.nanmax(block, axis=0)
+        block /= col_max[start:end]
+        col_mean[start:end] = np.nanmean(block, axis=0)
+        col_std[start:end] = np.nanstd(block, axis=0)
+
+    return col_max, col_mean, col_std
+
+
+def normalized_similarity_column(X_normalized, j, col_max, col_mean, col_std):
+    """
+    :param X_normalized: ndarray of shape (nb candidates, dimension of embeddings) with L2 normalized rows
+    :param j: index of the candidate
+    :param col_max, col_mean, col_std: statistics returned by @blocked_column_stats
+    :return: column j of the normalized similarity matrix between candidates (ndarray of shape (nb candidates,))
+    """
+    column = np.dot(X_normalized, X_normalized[j])
+    column[j] = np.nan
+    return 0.5 + (column / col_max[j] - col_mean[j]) / col_std[j]
+
+
+def candidate_similarities(X, doc_embedd, precision=None):
+    """
+    :param X: numpy array with the embedding of each candidate in each row
+    :param doc_embedd: document embedding of shape (1, dimension of embeddings)
+    :param precision: precision of the candidate embeddings and of the similarities see @PRECISIONS (default : dtype
+    of the embeddings)
+    :return: tuple (doc_sim, sim_between) : ndarray of shape (nb candidates, 1) cosine similarity between each
+    candidate and the document, ndarray of shape (nb candidates, nb candidates) cosine similarity between the
+    candidates with NaN on the diagonal
+    """
+    if precision is None:
+        doc_sim = cosine_similarity(X, doc_embedd.reshape(1, -1))
+        sim_between = cosine_similarity(X)
+    else:
+        dtype = compute_dtype(precision)
+        X_normalized = normalize_rows(to_precision(X, precision), dtype)
+        doc_sim = np.dot(X_normalized, normalize_rows(doc_embedd.reshape(1, -1), dtype).T)
+        sim_between = np.dot(X_normalized, X_normalized.T)
+
+    np.fill_diagonal(sim_between, np.nan)
+    return doc_sim, sim_between
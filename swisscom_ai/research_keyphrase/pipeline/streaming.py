@@ -0,0 +1,311 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Streaming pipeline : a chain of stages connected by bounded queues, each stage having its own pool of worker
+threads (or processes), s.t. I/O bound stages (reading, POS tagging) overlap with CPU bound stages (embedding, MMR).
+
+    pipeline = keyphrase_pipeline(embedding_distrib, pos_tagger, N=10, workers={'tag': 8})
+    for result in pipeline.run(paths):
+        print(result.key, result.value)
+    print(pipeline.stats())
+"""
+
+import functools
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from swisscom_ai.research_keyphrase.model.extractor import extract_candidates
+from swisscom_ai.research_keyphrase.model.input_representation import InputTextObj
+from swisscom_ai.research_keyphrase.model.method import _MMR
+from swisscom_ai.research_keyphrase.model.methods_embeddings import extract_candidates_embedding_for_docs
+from swisscom_ai.research_keyphrase.util.fileIO import read_file
+
+StreamResult = namedtuple('StreamResult', ['key', 'value', 'error'])
+
+_END = object()  # Marks the end of the stream in the queues
+_POLL_INTERVAL = 0.1  # Interval in seconds at which blocked threads check whether the pipeline was stopped
+
+
+class Stage:
+    """A step of a @StreamingPipeline applying fn to each item"""
+
+    def __init__(self, name, fn, workers=1, use_processes=False):
+        """
+        :param name: name of the stage (used in the stats)
+        :param fn: function applied to each item (must be picklable if use_processes is true)
+        :param workers: number of worker threads (or processes)
+        :param use_processes: if true fn is run in a pool of worker processes (for CPU bound pure python stages)
+        """
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.use_processes = use_processes
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.processed = 0
+        self.busy_time = 0.0
+        self.max_queue_depth = 0
+        self._queue_depth_sum = 0
+
+    def record(self, duration, queue_depth):
+        with self._lock:
+            self.processed += 1
+            self.busy_time += duration
+            self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+            self._queue_depth_sum += queue_depth
+
+    def stats(self, elapsed):
+        """
+        :param elapsed: wall time since the start of the pipeline in seconds
+        :return: dict with the number of processed items, the throughput (items per second), the busy time (sum over
+        the workers) and the mean and max depth of the input queue of the stage (sampled when an item is taken)
+        """
+        return {'stage': self.name, 'workers': self.workers, 'processed': self.processed,
+                'throughput': self.processed / elapsed if elapsed > 0 else 0.0,
+                'busy_time': self.busy_time,
+                'mean_queue_depth': self._queue_depth_sum / self.processed if self.processed else 0.0,
+                'max_queue_depth': self.max_queue_depth}
+
+
+class StreamingPipeline:
+    """Chain of @Stage connected by bounded queues"""
+
+    def __init__(self, stages, queue_size=16, ordered=False, max_in_flight=None):
+        """
+        :param stages: list of @Stage
+        :param queue_size: maximum number of items waiting in each queue
+        :param ordered: if true results are returned in the order of the input items
+        :param max_in_flight: if ordered, maximum number of items read and not yet returned (the results waiting for a
+        slower item before them count), default : the number of items the queues and the workers can hold
+        """
+        if max_in_flight is None:
+            max_in_flight = queue_size * (len(stages) + 1) + sum(stage.workers for stage in stages)
+        if max_in_flight < 1:
+            raise ValueError('max_in_flight must be at least 1')
+        self.stages = stages
+        self.queue_size = queue_size
+        self.ordered = ordered
+        self.max_in_flight = max_in_flight
+        self._start_time = None
+        self._end_time = None
+
+    def run(self, items, key=None):
+        """
+        :param items: iterable over the input items of the first stage
+        :param key: function returning the key of an input item (default : the item itself)
+        :return: generator over @StreamResult (key of the input item, output of the last stage, exception raised by
+        a stage or None). An item for which a stage failed skips the next stages.
+        An exception raised by items or key is raised by the generator once the items read before it are processed.
+        Closing the generator early stops the workers (after the items they are processing).
+        """
+        self._start_time = time.time()
+        self._end_time = None
+        for stage in self.stages:
+            stage.reset()
+        queues = [queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+        executors = []
+        threads = []
+        stop = threading.Event()
+        feed_error = []
+        # In ordered mode the results following a slow item wait in pending : bound them with the items read
+        in_flight = threading.Semaphore(self.max_in_flight) if self.ordered else None
+
+        feeder = threading.Thread(target=self._feed, args=(items, key, queues[0], stop, feed_error, in_flight),
+                                  daemon=True)
+        threads.append(feeder)
+        for stage, in_queue, out_queue in zip(self.stages, queues[:-1], queues[1:]):
+            executor = ProcessPoolExecutor(stage.workers) if stage.use_processes else None
+            if executor is not None:
+                executors.append(executor)
+            remaining = [stage.workers]
+            for _ in range(stage.workers):
+                threads.append(threading.Thread(target=self._work,
+                                                args=(stage, executor, in_queue, out_queue, remaining, stop),
+                                                daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            pending = {}
+            next_seq = 0
+            while True:
+                item = queues[-1].get()
+                if item is _END:
+                    if feed_error:
+                        raise feed_error[0]
+                    break
+                seq, item_key, value, error = item
+                if not self.ordered:
+                    yield StreamResult(item_key, value, error)
+                    continue
+                pending[seq] = StreamResult(item_key, value, error)
+                while next_seq in pending:
+                    result = pending.pop(next_seq)
+                    next_seq += 1
+                    in_flight.release()
+                    yield result
+        finally:
+            self._end_time = time.time()
+            stop.set()
+            for item_queue in queues:
+                _drain(item_queue)
+            for thread in threads:
+                thread.join()
+            for executor in executors:
+                executor.shutdown(wait=False)
+
+    def stats(self):
+        """
+        :return: list containing the stats of each stage see @Stage.stats
+        """
+        if self._start_time is None:
+            return []
+        elapsed = (self._end_time or time.time()) - self._start_time
+        return [stage.stats(elapsed) for stage in self.stages]
+
+    def _feed(self, items, key, out_queue, stop, feed_error, in_flight):
+        try:
+            for seq, item in enumerate(items):
+                if in_flight is not None and not _acquire(in_flight, stop):
+                    return
+                if not _put(out_queue, (seq, item if key is None else key(item), item, None), stop):
+                    return
+        except Exception as e:
+            feed_error.append(e)  # Raised by run once the items read before are processed
+        finally:
+            _put(out_queue, _END, stop)
+
+    def _work(self, stage, executor, in_queue, out_queue, remaining, stop):
+        while True:
+            queue_depth = in_queue.qsize()
+            item = _get(in_queue, stop)
+            if item is None:
+                return
+            if item is _END:
+                _put(in_queue, _END, stop)  # Let the other workers of the stage stop
+                with stage._lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    _put(out_queue, _END, stop)
+                return
+
+            seq, item_key, value, error = item
+            if error is None:
+                start = time.time()
+                try:
+                    if executor is None:
+                        value = stage.fn(value)
+                    else:
+                        value = executor.submit(stage.fn, value).result()
+                except Exception as e:
+                    value, error = None, e
+                stage.record(time.time() - start, queue_depth)
+            if not _put(out_queue, (seq, item_key, value, error), stop):
+                return
+
+
+def _put(item_queue, item, stop):
+    """
+    :return: True once the item is put, False if the pipeline was stopped before
+    """
+    while not stop.is_set():
+        try:
+            item_queue.put(item, timeout=_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _acquire(semaphore, stop):
+    """
+    :return: True once the semaphore is acquired, False if the pipeline was stopped before
+    """
+    while not stop.is_set():
+        if semaphore.acquire(timeout=_POLL_INTERVAL):
+            return True
+    return False
+
+
+def _get(item_queue, stop):
+    """
+    :return: the next item, None if the pipeline was stopped before
+    """
+    while not stop.is_set():
+        try:
+            return item_queue.get(timeout=_POLL_INTERVAL)
+        except queue.Empty:
+            pass
+    return None
+
+
+def _drain(item_queue):
+    while True:
+        try:
+            item_queue.get_nowait()
+        except queue.Empty:
+            return
+
+
+def _represent(lang, tagged):
+    text_obj = InputTextObj(tagged, lang)
+    return text_obj, extract_candidates(text_obj)
+
+
+def _embed(embedding_distrib, use_filtered, doc):
+    text_obj, candidates = doc
+    candidates, X, doc_embedd = extract_candidates_embedding_for_docs(embedding_distrib, [text_obj], use_filtered,
+                                                                      candidates_per_doc=[candidates])[0]
+    return text_obj, candidates, X, doc_embedd
+
+
+def _mmr(embedding_distrib, N, beta, alias_threshold, use_filtered, doc):
+    text_obj, candidates, X, doc_embedd = doc
+    if len(candidates) == 0:
+        return None, None, None
+    return _MMR(embedding_distrib, text_obj, candidates, X, beta, N, use_filtered, alias_threshold,
+                doc_embedd=doc_embedd)
+
+
+def keyphrase_pipeline(embedding_distrib, pos_tagger, N=10, lang='en', beta=0.55, alias_threshold=0.7,
+                       read_files=True, workers=None, processes=(), queue_size=16, ordered=False,
+                       max_in_flight=None):
+    """
+    Build the keyphrase extraction pipeline : read -> tag -> represent (@InputTextObj and candidates) -> embed -> mmr
+
+    :param embedding_distrib: embedding distributor see @EmbeddingDistributor
+    :param pos_tagger: pos tagger see @PosTagging (called concurrently by the workers of the tag stage)
+    :param N: number of keyphrases to extract
+    :param lang: language
+    :param beta: hyperparameter beta for MMR (control tradeoff between informativeness and diversity)
+    :param alias_threshold: threshold to group candidates as aliases
+    :param read_files: if true the input items are paths of files, otherwise raw texts
+    :param workers: dict stage name -> number of workers (default : 4 for read and tag, 1 for the others)
+    :param processes: names of the stages run in worker processes (only the represent stage is picklable)
+    :param queue_size: maximum number of items waiting between two stages
+    :param ordered: if true results are returned in the order of the input items
+    :param max_in_flight: @see StreamingPipeline
+    :return: @StreamingPipeline whose run method yields for each document the tuple returned by @MMRPhrase
+    """
+    nb_workers = {'read': 4, 'tag': 4, 'represent': 1, 'embed': 1, 'mmr': 1}
+    nb_workers.update(workers or {})
+
+    stages = []
+    if read_files:
+        stages.append(Stage('read', read_file, nb_workers['read'], 'read' in processes))
+    stages += [
+        Stage('tag', pos_tagger.pos_tag_raw_text, nb_workers['tag'], 'tag' in processes),
+        Stage('represent', functools.partial(_represent, lang), nb_workers['represent'], 'represent' in processes),
+        Stage('embed', functools.partial(_embed, embedding_distrib, True), nb_workers['embed'], 'embed' in processes),
+        Stage('mmr', functools.partial(_mmr, embedding_distrib, N, beta, alias_threshold, True), nb_workers['mmr'],
+              'mmr' in processes),
+    ]
+    return StreamingPipeline(stages, queue_size=queue_size, ordered=ordered, max_in_flight=max_in_flight)
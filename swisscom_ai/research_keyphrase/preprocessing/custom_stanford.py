@@ -5,39 +5,173 @@
 
 """Implementation of StanfordPOSTagger with tokenization in the specific language, s.t. the tag and tag_sent methods
 perform tokenization in the specific language.
+
+@StanfordTaggerProcess keeps a MaxentTagger running with the same options, s.t. the JVM is started and the model
+loaded only once instead of once per call to tag_sents.
 """
+import os
+import subprocess
+import threading
+import uuid
+import warnings
+from collections import deque
+
+from nltk import internals
 from nltk.tag import StanfordPOSTagger
 
+MAXENT_TAGGER = 'edu.stanford.nlp.tagger.maxent.MaxentTagger'
+
+
+class CustomStanfordPOSTagger(StanfordPOSTagger):
+    """
+    StanfordPOSTagger whose MaxentTagger options (_options) are defined by the subclasses, the same options are used
+    to tag a temporary file (tag_sents) and by a persistent process reading its stdin (@stdin_cmd)
+    """
 
-class EnglishStanfordPOSTagger(StanfordPOSTagger):
+    _options = ['-outputFormatOptions', 'keepEmptySentences']
 
     @property
     def _cmd(self):
-        return ['edu.stanford.nlp.tagger.maxent.MaxentTagger',
-                '-model', self._stanford_model, '-textFile', self._input_file_path,
-                '-outputFormatOptions', 'keepEmptySentences']
+        return [MAXENT_TAGGER, '-model', self._stanford_model, '-textFile', self._input_file_path] + self._options
+
+    def stdin_cmd(self):
+        """
+        :return: command of a MaxentTagger tagging each line of its stdin (see @StanfordTaggerProcess)
+        """
+        return [MAXENT_TAGGER, '-model', self._stanford_model] + self._options + ['-encoding', self._encoding]
 
 
-class FrenchStanfordPOSTagger(StanfordPOSTagger):
+class EnglishStanfordPOSTagger(CustomStanfordPOSTagger):
+    pass
+
+
+class FrenchStanfordPOSTagger(CustomStanfordPOSTagger):
     """
     Taken from github mhkuu/french-learner-corpus
     Extends the StanfordPosTagger with a custom command that calls the FrenchTokenizerFactory.
     """
 
-    @property
-    def _cmd(self):
-        return ['edu.stanford.nlp.tagger.maxent.MaxentTagger',
-                '-model', self._stanford_model, '-textFile',
-                self._input_file_path, '-tokenizerFactory',
+    _options = ['-tokenizerFactory',
                 'edu.stanford.nlp.international.french.process.FrenchTokenizer$FrenchTokenizerFactory',
                 '-outputFormatOptions', 'keepEmptySentences']
 
 
-class GermanStanfordPOSTagger(StanfordPOSTagger):
+class GermanStanfordPOSTagger(CustomStanfordPOSTagger):
     """ Use english tokenizer for german """
+    pass
 
-    @property
-    def _cmd(self):
-        return ['edu.stanford.nlp.tagger.maxent.MaxentTagger',
-                '-model', self._stanford_model, '-textFile', self._input_file_path,
-                '-outputFormatOptions', 'keepEmptySentences']
+
+class StanfordTaggerProcess:
+    """
+    Long-lived MaxentTagger process tagging the documents written on its stdin, one document per line.
+
+    The tagger writes one line per sentence it finds in a line (an empty line for an empty sentence with
+    keepEmptySentences), so the number of output lines of a document is unknown : each document is followed by a
+    sentinel line, a single token that can't appear in the documents, whose tagged output marks the end of the
+    sentences of the document. The process is started on the first request and restarted if it died.
+    """
+
+    def __init__(self, tagger, max_stderr_lines=50):
+        """
+        :param tagger: @CustomStanfordPOSTagger whose jar, model, options and encoding are used
+        :param max_stderr_lines: number of the last lines of the stderr of the process kept to report errors
+        """
+        self.tagger = tagger
+        self.sentinel = 'kpsentinel' + uuid.uuid4().hex
+        self.nb_starts = 0
+        self._process = None
+        self._stderr = deque(maxlen=max_stderr_lines)
+        self._lock = threading.Lock()
+
+    def start(self):
+        internals.config_java(verbose=False)
+        jar = self.tagger._stanford_jar
+        classpath = jar if isinstance(jar, str) else os.pathsep.join(jar)
+        cmd = [internals._java_bin] + self.tagger.java_options.split() + ['-cp', classpath] + self.tagger.stdin_cmd()
+        self._stderr.clear()
+        self._process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        # The stderr (logs of the tagger) must be read s.t. the process never blocks on it
+        threading.Thread(target=self._read_stderr, args=(self._process,), daemon=True).start()
+        self.nb_starts += 1
+
+    def is_alive(self):
+        return self._process is not None and self._process.poll() is None
+
+    def close(self, timeout=5):
+        """
+        Stop the process (it exits when its stdin is closed)
+        """
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+    def tag_lines(self, lines):
+        """
+        Tag several documents with a single round-trip, the process is restarted and the documents sent again once if
+        the process died
+
+        :param lines: list of documents (string without newline)
+        :return: list containing for each document the output of the tagger (one line per sentence), as tag_sents
+        would get it from a MaxentTagger tagging the document
+        """
+        with self._lock:
+            try:
+                return self._round_trip(lines)
+            except (EOFError, OSError):
+                warnings.warn('The Stanford tagger process died, restarting it')
+                self.close()
+            try:
+                return self._round_trip(lines)
+            except (EOFError, OSError):
+                self.close()
+                raise RuntimeError('The Stanford tagger process failed :\n' + '\n'.join(self._stderr))
+
+    def _round_trip(self, lines):
+        if not self.is_alive():
+            self.start()
+        process = self._process
+        encoding = self.tagger._encoding
+        payload = ''.join(line + '\n' + self.sentinel + '\n' for line in lines).encode(encoding)
+
+        # Written by another thread : the tagger stops reading its stdin when its stdout is full
+        writer = threading.Thread(target=self._write, args=(process, payload), daemon=True)
+        writer.start()
+
+        outputs = []
+        sentences = []
+        while len(outputs) < len(lines):
+            raw_line = process.stdout.readline()
+            if not raw_line:
+                raise EOFError('The Stanford tagger process stopped')
+            line = raw_line.decode(encoding).rstrip('\r\n')
+            if self._is_sentinel(line):
+                outputs.append('\n'.join(sentences))
+                sentences = []
+            else:
+                sentences.append(line)
+        writer.join()
+        return outputs
+
+    def _is_sentinel(self, line):
+        tokens = line.split()
+        return len(tokens) == 1 and tokens[0].startswith(self.sentinel + self.tagger._SEPARATOR)
+
+    @staticmethod
+    def _write(process, payload):
+        try:
+            process.stdin.write(payload)
+            process.stdin.flush()
+        except OSError:
+            pass  # The process died, noticed by the reader
+
+    def _read_stderr(self, process):
+        for raw_line in process.stderr:
+            self._stderr.append(raw_line.decode(self.tagger._encoding, 'replace').rstrip())
+        process.stderr.close()
@@ -4,21 +4,28 @@
 #Authors: Kamil Bennani-Smires, Yann Savary
 
 import argparse
+import bisect
 import os
 import re
+import sys
 import warnings
 from abc import ABC, abstractmethod
 
-# NLTK imports
-import nltk
-from nltk.tag.util import tuple2str
-from nltk.parse import CoreNLPParser
-
-import swisscom_ai.research_keyphrase.preprocessing.custom_stanford as custom_stanford
 from swisscom_ai.research_keyphrase.util.fileIO import read_file, write_string
 
-# If you want to use spacy , install it and uncomment the following import
-# import spacy
+# Two newlines always end a sentence with the default CoreNLP ssplit.newlineIsSentenceBreak option
+PACKED_TEXT_BOUNDARY = '\n\n'
+# Default maximum number of characters accepted by a CoreNLP server (-maxCharLength)
+PACKED_MAX_CHARS = 100000
+# Default spaCy model of each language see @PosTaggingSpacy
+SPACY_MODELS = {'en': 'en_core_web_sm', 'de': 'de_core_news_sm', 'fr': 'fr_core_news_sm'}
+# spaCy components not needed for POS tagging and sentence splitting
+SPACY_UNUSED_COMPONENTS = ['ner', 'lemmatizer', 'textcat', 'entity_linker', 'entity_ruler']
+# Universal POS tags to the French Treebank tags of the Stanford French tagger
+UD_TO_FRENCH_TREEBANK = {'NOUN': 'NC', 'PROPN': 'NPP', 'ADJ': 'ADJ', 'VERB': 'V', 'AUX': 'V', 'ADP': 'P', 'DET': 'DET',
+                         'ADV': 'ADV', 'PRON': 'PRO', 'CCONJ': 'CC', 'SCONJ': 'CS', 'PUNCT': 'PONCT'}
+# Line breaks of the Java BufferedReader.readLine used by the Stanford tagger process
+NEWLINES = re.compile(r'\r\n|[\r\n]')
 
 
 class PosTagging(ABC):
@@ -62,6 +69,13 @@ class PosTagging(ABC):
 
         pass
 
+    def configuration_id(self):
+        """
+        :return: string identifying the tagger and its configuration (model, server...), s.t. two taggers with the same
+        id tag a text identically (used as key by @PosTaggingCache), None if the configuration is unknown
+        """
+        return None
+
     def pos_tag_file(self, input_path, output_path=None):
 
         """
@@ -119,13 +133,18 @@ class PosTaggingStanford(PosTagging):
 
     """
 
-    def __init__(self, jar_path, model_path_directory, separator='|', lang='en'):
+    def __init__(self, jar_path, model_path_directory, separator='|', lang='en', persistent=True):
         """
         :param model_path_directory: path of the model directory
         :param jar_path: path of the jar for StanfordPOSTagger (override the configuration file)
         :param separator: Separator between a token and a tag in the resulting string (default : |)
+        :param persistent: if true the texts are tagged by a long-lived tagger process (see @StanfordTaggerProcess),
+        otherwise a new java process is started for each call
 
         """
+        # NLTK imports (only needed by this tagger)
+        import nltk
+        import swisscom_ai.research_keyphrase.preprocessing.custom_stanford as custom_stanford
 
         if lang == 'en':
             model_path = os.path.join(model_path_directory, 'english-left3words-distsim.tagger')
@@ -142,50 +161,159 @@ class PosTaggingStanford(PosTagging):
         else:
             raise ValueError('Language ' + lang + 'not handled')
 
+        self.model_path = model_path
+        self.jar_path = jar_path
         self.separator = separator
+        self.process = custom_stanford.StanfordTaggerProcess(self.tagger) if persistent else None
+
+    def configuration_id(self):
+        """
+        @see PosTagging
+        """
+        return 'stanford:{}:{}'.format(os.path.abspath(self.model_path), self.jar_path)
 
     def pos_tag_raw_text(self, text, as_tuple_list=True):
         """
         Implementation of abstract method from PosTagging
         @see PosTagging
         """
-        tagged_text = self.tagger.tag_sents([self.sent_tokenizer.sentences_from_text(text)])
+        if self.process is None:
+            tagged_text = self.tagger.tag_sents([self.sent_tokenizer.sentences_from_text(text)])
+        else:
+            tagged_text = self._pos_tag_persistent([text])[0]
 
         if as_tuple_list:
             return tagged_text
-        return '[ENDSENT]'.join(
-            [' '.join([tuple2str(tagged_token, self.separator) for tagged_token in sent]) for sent in tagged_text])
+        return tagged_text_to_string(tagged_text, self.separator)
+
+    def pos_tag_raw_texts(self, texts, as_tuple_list=True):
+        """
+        POS tag several texts, with a single round-trip to the tagger process if persistent
+
+        :param texts: list of string to POS tag
+        :param as_tuple_list: @see PosTagging.pos_tag_raw_text
+        :return: list containing the result of @pos_tag_raw_text for each text (in the same order as texts)
+        """
+        if self.process is None:
+            return [self.pos_tag_raw_text(text, as_tuple_list) for text in texts]
+
+        tagged_texts = self._pos_tag_persistent(texts)
+        if as_tuple_list:
+            return tagged_texts
+        return [tagged_text_to_string(tagged_text, self.separator) for tagged_text in tagged_texts]
+
+    def _pos_tag_persistent(self, texts):
+        # Same input as tag_sents : the sentences of a text joined by a space, on a single line since the process
+        # tags each line separately (a newline is only a whitespace for the tokenizer of the tagger)
+        lines = [NEWLINES.sub(' ', ' '.join(self.sent_tokenizer.sentences_from_text(text))) for text in texts]
+        return [self.tagger.parse_output(output) for output in self.process.tag_lines(lines)]
+
+    def close(self):
+        """
+        Stop the tagger process (it is started again by the next call)
+        """
+        if self.process is not None:
+            self.process.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
 
 class PosTaggingSpacy(PosTagging):
     """
-        Concrete class of PosTagging using StanfordPOSTokenizer and StanfordPOSTagger
+    Concrete class of PosTagging using spaCy (imported only when a model is loaded, install it to use this class).
+    Several texts are tagged at once with nlp.pipe (see @pos_tag_many) and the components not needed for POS tagging
+    are disabled.
     """
 
-    def __init__(self, nlp=None, separator='|' ,lang='en'):
+    def __init__(self, nlp=None, separator='|', lang='en', model=None, batch_size=64, n_process=1, use_senter=True):
+        """
+        :param nlp: loaded spaCy pipeline (it is not modified, the components to skip are disabled for each call of
+        nlp.pipe), the model of the language is loaded if None
+        :param separator: Separator between a token and a tag in the resulting string (default : |)
+        :param lang: language (en, de or fr), the spaCy tags are mapped to the tags expected by the grammar of the
+        language (see @spacy_token_tag)
+        :param model: name or path of the spaCy model to load (default : SPACY_MODELS[lang])
+        :param batch_size: number of texts per batch of nlp.pipe
+        :param n_process: number of processes used by nlp.pipe
+        :param use_senter: if true and the model has a sentence recognizer, use it instead of the (slower) parser to
+        split sentences (with a given nlp, only if its sentence recognizer is enabled)
+        """
+        if lang not in SPACY_MODELS:
+            raise ValueError('Language ' + lang + ' not handled')
+        self.disabled_components = []  # Disabled for each call of nlp.pipe
         if not nlp:
+            import spacy
+            model = model or SPACY_MODELS[lang]
             print('Loading Spacy model')
-            #  self.nlp = spacy.load(lang, entity=False)
-            print('Spacy model loaded ' + lang)
-        else:
-            self.nlp = nlp
+            nlp = spacy.load(model, disable=SPACY_UNUSED_COMPONENTS)
+            print('Spacy model loaded ' + model)
+            if use_senter and 'senter' in getattr(nlp, 'disabled', []) and 'parser' in nlp.pipe_names:
+                nlp.enable_pipe('senter')
+                nlp.disable_pipe('parser')
+        elif use_senter and 'senter' in nlp.pipe_names and 'parser' in nlp.pipe_names:
+            self.disabled_components = ['parser']
+        self.nlp = nlp
         self.separator = separator
+        self.lang = lang
+        self.batch_size = batch_size
+        self.n_process = n_process
+
+    def configuration_id(self):
+        """
+        @see PosTagging
+        """
+        meta = getattr(self.nlp, 'meta', {})
+        pipe_names = [name for name in getattr(self.nlp, 'pipe_names', []) if name not in self.disabled_components]
+        return 'spacy:{}:{}_{}-{}:{}'.format(getattr(sys.modules.get('spacy'), '__version__', ''), meta.get('lang'),
+                                             meta.get('name'), meta.get('version'), ','.join(pipe_names))
 
     def pos_tag_raw_text(self, text, as_tuple_list=True):
         """
             Implementation of abstract method from PosTagging
             @see PosTagging
         """
+        return self.pos_tag_many([text], as_tuple_list)[0]
+
+    def pos_tag_many(self, texts, as_tuple_list=True, batch_size=None, n_process=None):
+        """
+        POS tag several texts with nlp.pipe
 
+        :param texts: list of string to POS tag
+        :param as_tuple_list: @see PosTagging.pos_tag_raw_text
+        :param batch_size: number of texts per batch (default : self.batch_size)
+        :param n_process: number of processes (default : self.n_process)
+        :return: list containing the result of @pos_tag_raw_text for each text (in the same order as texts)
+        """
         # This step is not necessary int the stanford tokenizer.
         # This is used to avoid such tags :  ('      ', 'SP')
-        text = re.sub('[ ]+', ' ', text).strip()  # Convert multiple whitespaces into one
+        texts = [re.sub('[ ]+', ' ', text).strip() for text in texts]  # Convert multiple whitespaces into one
+
+        n_process = n_process or self.n_process
+        kwargs = {'n_process': n_process} if n_process != 1 else {}
+        if self.disabled_components:
+            kwargs['disable'] = self.disabled_components
+        docs = self.nlp.pipe(texts, batch_size=batch_size or self.batch_size, **kwargs)
+
+        tagged_texts = []
+        for doc in docs:
+            tagged_text = [[(token.text, spacy_token_tag(token, self.lang)) for token in sent if not token.is_space]
+                           for sent in doc.sents]
+            tagged_texts.append([sent for sent in tagged_text if sent])
 
-        doc = self.nlp(text)
         if as_tuple_list:
-            return [[(token.text, token.tag_) for token in sent] for sent in doc.sents]
-        return '[ENDSENT]'.join(' '.join(self.separator.join([token.text, token.tag_]) for token in sent) for sent in doc.sents)
-    
+            return tagged_texts
+        return [tagged_text_to_string(tagged_text, self.separator) for tagged_text in tagged_texts]
+
+    def pos_tag_raw_texts(self, texts, as_tuple_list=True):
+        """
+        @see pos_tag_many
+        """
+        return self.pos_tag_many(texts, as_tuple_list)
+
 
 class PosTaggingCoreNLP(PosTagging):
     """
@@ -194,8 +322,15 @@ class PosTaggingCoreNLP(PosTagging):
     """
 
     def __init__(self, host='localhost' ,port=9000, separator='|'):
+        from nltk.parse import CoreNLPParser
         self.parser = CoreNLPParser(url=f'http://{host}:{port}')
         self.separator = separator
+
+    def configuration_id(self):
+        """
+        @see PosTagging
+        """
+        return 'corenlp:' + self.parser.url
     
     def pos_tag_raw_text(self, text, as_tuple_list=True):
         # Unfortunately for the moment there is no method to do sentence split + pos tagging in nltk.parse.corenlp
@@ -209,18 +344,112 @@ class PosTaggingCoreNLP(PosTagging):
             """
             properties = {'annotators':'tokenize,ssplit,pos'}
             tagged_data = self.parser.api_call(text, properties=properties)
-            for tagged_sentence in tagged_data['sentences']:
-                yield [(token['word'], token['pos']) for token in tagged_sentence['tokens']]
+            return corenlp_json_to_tagged_text(tagged_data)
         
-        tagged_text = list(raw_tag_text())
+        tagged_text = raw_tag_text()
 
         if as_tuple_list:
             return tagged_text
-        return '[ENDSENT]'.join(
-            [' '.join([tuple2str(tagged_token, self.separator) for tagged_token in sent]) for sent in tagged_text])
-        
+        return tagged_text_to_string(tagged_text, self.separator)
+
+    def pos_tag_raw_texts(self, texts, as_tuple_list=True, max_chars=PACKED_MAX_CHARS):
+        """
+        POS tag several texts with as few requests as possible : the texts are packed into requests of at most
+        max_chars characters, separated by PACKED_TEXT_BOUNDARY, and the sentences returned by the server are mapped
+        back to their text with their character offsets.
+        If a sentence overlaps two texts, the texts of the request are POS tagged one by one, s.t. the result is
+        always the same as calling @pos_tag_raw_text on each text.
+
+        :param texts: list of string to POS tag
+        :param as_tuple_list: @see PosTagging.pos_tag_raw_text
+        :param max_chars: maximum number of characters of a request (a longer text is sent alone)
+        :return: list containing the result of @pos_tag_raw_text for each text (in the same order as texts)
+        """
+        tagged_texts = []
+        for packed_texts in _pack_texts(texts, max_chars):
+            tagged_texts.extend(self._pos_tag_packed(packed_texts))
+
+        if as_tuple_list:
+            return tagged_texts
+        return [tagged_text_to_string(tagged_text, self.separator) for tagged_text in tagged_texts]
+
+    def _pos_tag_packed(self, texts):
+        if len(texts) == 1:
+            return [self.pos_tag_raw_text(texts[0])]
+
+        # CoreNLP character offsets count UTF-16 code units
+        text_ends = []
+        offset = 0
+        for text in texts:
+            offset += len(text.encode('utf-16-le')) // 2
+            text_ends.append(offset)
+            offset += len(PACKED_TEXT_BOUNDARY)
+
+        properties = {'annotators': 'tokenize,ssplit,pos'}
+        tagged_data = self.parser.api_call(PACKED_TEXT_BOUNDARY.join(texts), properties=properties)
+
+        tagged_texts = [[] for _ in texts]
+        for tagged_sentence in tagged_data['sentences']:
+            tokens = tagged_sentence['tokens']
+            text_idx = bisect.bisect_right(text_ends, tokens[0]['characterOffsetBegin'])
+            if text_idx == len(texts) or tokens[-1]['characterOffsetEnd'] > text_ends[text_idx]:
+                warnings.warn('A sentence overlaps two packed texts, POS tagging them one by one')
+                return [self.pos_tag_raw_text(text) for text in texts]
+            tagged_texts[text_idx].append([(token['word'], token['pos']) for token in tokens])
+        return tagged_texts
+
+
+def _pack_texts(texts, max_chars):
+    """
+    :return: generator over lists of consecutive texts whose total length (boundaries included) is at most max_chars
+    (or containing a single text longer than max_chars)
+    """
+    packed_texts = []
+    packed_length = 0
+    for text in texts:
+        length = len(text) + (len(PACKED_TEXT_BOUNDARY) if packed_texts else 0)
+        if packed_texts and packed_length + length > max_chars:
+            yield packed_texts
+            packed_texts = []
+            packed_length = 0
+            length = len(text)
+        packed_texts.append(text)
+        packed_length += length
+    if packed_texts:
+        yield packed_texts
+
+
+def spacy_token_tag(token, lang):
+    """
+    :param token: spaCy token
+    :param lang: language
+    :return: tag of the token in the tag set expected by @convert and the grammar of the language : the fine-grained
+    tag (Penn Treebank for en, STTS for de) or the universal POS tag mapped to the French Treebank tags for fr (whose
+    spaCy models have no fine-grained tags)
+    """
+    if lang == 'fr':
+        return UD_TO_FRENCH_TREEBANK.get(token.pos_, token.pos_)
+    return token.tag_ or token.pos_
 
 
+def tagged_text_to_string(tagged_text, separator='|'):
+    """
+    :param tagged_text: list of list of tuple (word, tag), one list per sentence
+    :param separator: Separator between a token and a tag
+    :return: string word1|tag1 word2|tag2[ENDSENT]word3|tag3 ...
+    """
+    return '[ENDSENT]'.join(
+        [' '.join([word + separator + tag for word, tag in sent]) for sent in tagged_text])
+
+
+def corenlp_json_to_tagged_text(tagged_data):
+    """
+    :param tagged_data: json answer (as a dict) of a CoreNLP server queried with the tokenize,ssplit,pos annotators
+    :return: list of list of tuple (word, tag), one list per sentence
+    """
+    return [[(token['word'], token['pos']) for token in tagged_sentence['tokens']]
+            for tagged_sentence in tagged_data['sentences']]
+
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Write POS tagged files, the resulting file will be written'
@@ -0,0 +1,229 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""asyncio client for a CoreNLP server, keeping a pool of keep-alive connections and several requests in flight"""
+
+import asyncio
+import json
+import threading
+import weakref
+from urllib.parse import quote
+
+from swisscom_ai.research_keyphrase.preprocessing.postagging import PosTagging, corenlp_json_to_tagged_text, \
+    tagged_text_to_string
+
+
+class _ConnectionPool:
+    """Pool of keep-alive HTTP connections (asyncio streams) to a single host"""
+
+    def __init__(self, host, port, max_connections, loop):
+        self.host = host
+        self.port = port
+        self.loop = loop
+        self._idle = []
+        self._semaphore = asyncio.Semaphore(max_connections)
+
+    async def acquire(self):
+        """
+        :return: tuple (reader, writer, reused) reused is True if the connection was already used for a request
+        """
+        await self._semaphore.acquire()
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        try:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        except Exception:
+            self._semaphore.release()
+            raise
+        return reader, writer, False
+
+    def release(self, reader, writer, keep_alive):
+        if keep_alive:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        self._semaphore.release()
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle = []
+
+
+class PosTaggingCoreNLPAsync(PosTagging):
+    """
+    Concrete class of PosTagging using a CoreNLP server through asyncio.
+    Several documents are sent concurrently (up to max_in_flight) over a pool of keep-alive connections,
+    see @pos_tag_many.
+
+    The blocking methods (@pos_tag_raw_text, @pos_tag_raw_texts) run the requests on an event loop private to the
+    tagger and to the calling thread, they cannot be called from a coroutine (use the coroutines
+    @pos_tag_raw_text_async and @pos_tag_many there).
+    """
+
+    def __init__(self, host='localhost', port=9000, separator='|', max_in_flight=8, timeout=60):
+        """
+        :param host: CoreNLP server host
+        :param port: CoreNLP server port
+        :param separator: Separator between a token and a tag in the resulting string (default : |)
+        :param max_in_flight: maximum number of concurrent requests (and of open connections)
+        :param timeout: timeout in seconds of a request
+        """
+        self.host = host
+        self.port = int(port)
+        self.separator = separator
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.properties = {'annotators': 'tokenize,ssplit,pos', 'outputFormat': 'json'}
+        self._pools = weakref.WeakKeyDictionary()  # event loop -> connection pool
+        self._local = threading.local()  # private event loop of each thread calling the blocking methods
+        self._loops = []  # all the private event loops
+
+    def configuration_id(self):
+        """
+        @see PosTagging
+        """
+        return 'corenlp:http://{}:{}'.format(self.host, self.port)
+
+    def pos_tag_raw_text(self, text, as_tuple_list=True):
+        """
+        Implementation of abstract method from PosTagging (blocking call)
+        @see PosTagging
+        """
+        return self._run(self.pos_tag_raw_text_async(text, as_tuple_list))
+
+    def pos_tag_raw_texts(self, texts, as_tuple_list=True):
+        """
+        Blocking version of @pos_tag_many
+        """
+        return self._run(self.pos_tag_many(texts, as_tuple_list))
+
+    async def pos_tag_raw_text_async(self, text, as_tuple_list=True):
+        """
+        Coroutine version of @pos_tag_raw_text
+        """
+        tagged_data = await self._api_call(text, self.properties)
+        tagged_text = corenlp_json_to_tagged_text(tagged_data)
+
+        if as_tuple_list:
+            return tagged_text
+        return tagged_text_to_string(tagged_text, self.separator)
+
+    async def pos_tag_many(self, texts, as_tuple_list=True):
+        """
+        POS tag several texts concurrently (at most max_in_flight requests at the same time)
+
+        :param texts: list of string to POS tag
+        :param as_tuple_list: @see PosTagging.pos_tag_raw_text
+        :return: list containing the result of @pos_tag_raw_text for each text (in the same order as texts)
+        """
+        return await asyncio.gather(*[self.pos_tag_raw_text_async(text, as_tuple_list) for text in texts])
+
+    def close(self):
+        """Close the idle connections of the pools and the private event loops (no request must be in progress)"""
+        for loop, pool in list(self._pools.items()):
+            pool.close()
+            if not loop.is_running() and not loop.is_closed():
+                loop.run_until_complete(asyncio.sleep(0))  # Let the transports close their sockets
+        self._pools.clear()
+        for loop in self._loops:
+            loop.close()
+        self._loops = []
+        self._local = threading.local()
+
+    def _run(self, coroutine):
+        if _running_loop() is not None:
+            coroutine.close()
+            raise RuntimeError('Blocking method called from a running event loop, await the coroutine version instead')
+        loop = getattr(self._local, 'loop', None)
+        if loop is None or loop.is_closed():
+            loop = self._local.loop = asyncio.new_event_loop()
+            self._loops.append(loop)
+        return loop.run_until_complete(coroutine)
+
+    def _get_pool(self):
+        loop = _running_loop()
+        pool = self._pools.get(loop)
+        if pool is None:
+            pool = self._pools[loop] = _ConnectionPool(self.host, self.port, self.max_in_flight, loop)
+        return pool
+
+    async def _api_call(self, text, properties):
+        pool = self._get_pool()
+        body = text.encode('utf8')
+        request = ('POST /?properties={} HTTP/1.1\r\n'
+                   'Host: {}:{}\r\n'
+                   'Content-Type: text/plain; charset=utf-8\r\n'
+                   'Content-Length: {}\r\n'
+                   'Connection: keep-alive\r\n\r\n').format(quote(json.dumps(properties)), self.host, self.port,
+                                                            len(body)).encode('latin-1') + body
+
+        reader, writer, reused = await pool.acquire()
+        keep_alive = False
+        try:
+            try:
+                writer.write(request)
+                status, headers, content = await asyncio.wait_for(_read_response(reader), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if not reused:
+                    raise
+                # The server closed the idle keep-alive connection, retry once with a new connection
+                writer.close()
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                writer.write(request)
+                status, headers, content = await asyncio.wait_for(_read_response(reader), self.timeout)
+            keep_alive = headers.get('connection', '').lower() != 'close'
+        finally:
+            pool.release(reader, writer, keep_alive)
+
+        if status != 200:
+            raise RuntimeError('CoreNLP server answered with status {} : {}'.format(status, content[:200]))
+        return json.loads(content.decode('utf8'))
+
+
+async def _read_response(reader):
+    """
+    Read a HTTP/1.1 response
+    :return: tuple (status code, dict of headers (lowercase names), body as bytes)
+    """
+    status_line = await reader.readline()
+    if not status_line:
+        raise asyncio.IncompleteReadError(b'', None)
+    status = int(status_line.split()[1])
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if 'content-length' in headers:
+        content = await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await reader.readline()
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        content = b''.join(chunks)
+    else:
+        content = await reader.read()
+        headers['connection'] = 'close'
+    return status, headers, content
+
+
+def _running_loop():
+    """
+    :return: the event loop running in the current thread (None if there is none)
+    """
+    return asyncio._get_running_loop()  # asyncio.get_running_loop raises instead (and needs Python >= 3.7)
@@ -0,0 +1,229 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+import hashlib
+import os
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+
+from swisscom_ai.research_keyphrase.preprocessing.postagging import PosTagging, tagged_text_to_string
+
+# Control characters used to serialize a tagged text (they never appear in the tokens returned by the taggers)
+_TAG_SEPARATOR = '\x1f'
+_TOKEN_SEPARATOR = '\x1e'
+_SENTENCE_SEPARATOR = '\x1d'
+# Part of the key, change it when the serialization changes
+_FORMAT_VERSION = '1'
+_ENTRY_SUFFIX = '.tag'
+
+
+class PosTaggingCache(PosTagging):
+    """
+    Concrete class of @PosTagging wrapping another @PosTagging with a persistent cache of the tagged texts.
+
+    Each tagged text is stored in its own zlib compressed file named by the hash of the tagger id, the language and
+    the raw text. When the total size of the files exceeds max_size the least recently used entries are removed.
+    On a hit the wrapped tagger is not called at all.
+    """
+
+    def __init__(self, pos_tagger, cache_dir, lang='en', tagger_id=None, max_size=1024 ** 3):
+        """
+        :param pos_tagger: the wrapped pos tagger see @PosTagging
+        :param cache_dir: directory containing the cache entries (created if needed)
+        :param lang: language of the texts (part of the key)
+        :param tagger_id: string identifying the tagger and its model (part of the key), default : the
+        configuration_id of the tagger (see @PosTagging.configuration_id), required if the tagger does not have one
+        :param max_size: maximum total size in bytes of the cache entries
+        """
+        self.pos_tagger = pos_tagger
+        self.cache_dir = cache_dir
+        self.lang = lang
+        self.tagger_id = tagger_id or pos_tagger.configuration_id()
+        if not self.tagger_id:
+            raise ValueError('tagger_id is required, the configuration of {} is unknown'.format(
+                type(pos_tagger).__name__))
+        self.max_size = max_size
+        self.separator = getattr(pos_tagger, 'separator', '|')
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size in bytes, ordered from least to most recently used
+        self._size = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        """Total size in bytes of the cache entries"""
+        return self._size
+
+    def configuration_id(self):
+        """
+        @see PosTagging
+        """
+        return self.tagger_id
+
+    def pos_tag_raw_text(self, text, as_tuple_list=True):
+        """
+        Implementation of abstract method from PosTagging
+        @see PosTagging
+        """
+        key = self._key(text)
+        tagged_text = self._get(key)
+        if tagged_text is None:
+            tagged_text = self.pos_tagger.pos_tag_raw_text(text, as_tuple_list=True)
+            self._put(key, tagged_text)
+
+        if as_tuple_list:
+            return tagged_text
+        return tagged_text_to_string(tagged_text, self.separator)
+
+    def pos_tag_raw_texts(self, texts, as_tuple_list=True):
+        """
+        POS tag several texts, the texts missing from the cache are sent together to the pos_tag_raw_texts method
+        of the wrapped tagger if it has one (e.g @PosTaggingCoreNLP.pos_tag_raw_texts)
+
+        :param texts: list of string to POS tag
+        :param as_tuple_list: @see PosTagging.pos_tag_raw_text
+        :return: list containing the result of @pos_tag_raw_text for each text (in the same order as texts)
+        """
+        keys = [self._key(text) for text in texts]
+        tagged_texts = [self._get(key) for key in keys]
+        missing = OrderedDict()  # key -> positions in texts
+        for idx, (key, tagged_text) in enumerate(zip(keys, tagged_texts)):
+            if tagged_text is None:
+                missing.setdefault(key, []).append(idx)
+
+        if missing:
+            missing_texts = [texts[positions[0]] for positions in missing.values()]
+            if hasattr(self.pos_tagger, 'pos_tag_raw_texts'):
+                missing_tagged = self.pos_tagger.pos_tag_raw_texts(missing_texts, as_tuple_list=True)
+            else:
+                missing_tagged = [self.pos_tagger.pos_tag_raw_text(text, as_tuple_list=True) for text in missing_texts]
+            for (key, positions), tagged_text in zip(missing.items(), missing_tagged):
+                self._put(key, tagged_text)
+                for idx in positions:
+                    tagged_texts[idx] = tagged_text
+
+        if as_tuple_list:
+            return tagged_texts
+        return [tagged_text_to_string(tagged_text, self.separator) for tagged_text in tagged_texts]
+
+    def cache_info(self):
+        """
+        :return: dict with the number of hits, misses, evictions, entries and the total size of the entries in bytes
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self._entries), 'size': self._size, 'max_size': self.max_size}
+
+    def clear(self):
+        """Remove all the entries of the cache"""
+        with self._lock:
+            for key in self._entries:
+                self._remove_file(key)
+            self._entries.clear()
+            self._size = 0
+
+    def _key(self, text):
+        content = '\0'.join([_FORMAT_VERSION, self.tagger_id, self.lang, text])
+        return hashlib.sha1(content.encode('utf8', errors='surrogatepass')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + _ENTRY_SUFFIX)
+
+    def _load_index(self):
+        entries = []
+        for root, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                if filename.endswith(_ENTRY_SUFFIX):
+                    stat = os.stat(os.path.join(root, filename))
+                    entries.append((stat.st_mtime, filename[:-len(_ENTRY_SUFFIX)], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._size += size
+        self._evict()
+
+    def _get(self, key):
+        # The file is looked up even if the key is not in the index : it may have been written by another process
+        # sharing the cache directory (or removed by it)
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, 'rb') as entry_file:
+                    data = entry_file.read()
+                os.utime(path)
+            except OSError:
+                if key in self._entries:
+                    self._size -= self._entries.pop(key)
+                self.misses += 1
+                return None
+        try:
+            tagged_text = deserialize_tagged_text(zlib.decompress(data).decode('utf8'))
+        except (zlib.error, ValueError):
+            # Truncated or corrupted entry : it is a miss, the entry is rewritten by the caller
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self._size += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self.hits += 1
+        return tagged_text
+
+    def _put(self, key, tagged_text):
+        data = zlib.compress(serialize_tagged_text(tagged_text).encode('utf8'))
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file then rename it, s.t. a reader never sees a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as entry_file:
+            entry_file.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._size += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._evict()
+
+    def _evict(self):
+        while self._size > self.max_size and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            self._remove_file(key)
+            self.evictions += 1
+
+    def _remove_file(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+def serialize_tagged_text(tagged_text):
+    """
+    :param tagged_text: list of list of tuple (word, tag), one list per sentence
+    :return: compact string representation of tagged_text (each sentence is terminated by a separator, s.t. empty
+    sentences are kept) see @deserialize_tagged_text
+    """
+    return ''.join(_TOKEN_SEPARATOR.join(word + _TAG_SEPARATOR + tag for word, tag in sent) + _SENTENCE_SEPARATOR
+                   for sent in tagged_text)
+
+
+def deserialize_tagged_text(serialized):
+    """
+    :param serialized: string returned by @serialize_tagged_text
+    :return: list of list of tuple (word, tag), one list per sentence
+    """
+    return [[tuple(token.split(_TAG_SEPARATOR)) for token in sent.split(_TOKEN_SEPARATOR)] if sent else []
+            for sent in serialized.split(_SENTENCE_SEPARATOR)[:-1]]
@@ -0,0 +1,106 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+import queue
+import threading
+import time
+import warnings
+from concurrent.futures import Future
+
+from swisscom_ai.research_keyphrase.model.method import _MMR
+from swisscom_ai.research_keyphrase.model.methods_embeddings import extract_candidates_embedding_for_docs
+
+
+class MicroBatcher:
+    """
+    Queue keyphrase extraction requests and process the requests arriving within a short time window together :
+    the candidates and documents of a batch are embedded with a single call to the embedding distributor
+    (see @extract_candidates_embedding_for_docs), then MMR is run for each request with its own parameters.
+    """
+
+    def __init__(self, embedding_distrib, max_batch_size=32, max_wait=0.01):
+        """
+        :param embedding_distrib: embedding distributor see @EmbeddingDistributor
+        :param max_batch_size: maximum number of documents in a batch
+        :param max_wait: maximum time in seconds a request waits for other requests before its batch is processed
+        """
+        self.embedding_distrib = embedding_distrib
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.nb_batches = 0
+        self.nb_requests = 0
+
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='MicroBatcher', daemon=True)
+        self._thread.start()
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def submit(self, text_obj, N, beta=0.55, alias_threshold=0.7):
+        """
+        :param text_obj: Input text representation see @InputTextObj
+        :param N: number of keyphrases to extract
+        :param beta: hyperparameter beta for MMR (control tradeoff between informativeness and diversity)
+        :param alias_threshold: threshold to group candidates as aliases
+        :return: concurrent.futures.Future whose result is the tuple returned by @MMRPhrase
+        """
+        future = Future()
+        self._requests.put((text_obj, N, beta, alias_threshold, future))
+        return future
+
+    def close(self):
+        """Process the pending requests and stop the batching thread"""
+        self._requests.put(None)
+        self._thread.join()
+
+    def _next_batch(self):
+        first = self._requests.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                self._requests.put(None)  # Stop after this batch
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self.nb_batches += 1
+            self.nb_requests += len(batch)
+            self._process(batch)
+
+    def _process(self, batch):
+        try:
+            embeddings_per_doc = extract_candidates_embedding_for_docs(self.embedding_distrib,
+                                                                       [request[0] for request in batch], True)
+        except Exception as e:
+            for request in batch:
+                request[-1].set_exception(e)
+            return
+
+        for (text_obj, N, beta, alias_threshold, future), (candidates, X, doc_embedd) in zip(batch, embeddings_per_doc):
+            try:
+                if len(candidates) == 0:
+                    warnings.warn('No keyphrase extracted for this document')
+                    future.set_result((None, None, None))
+                else:
+                    future.set_result(_MMR(self.embedding_distrib, text_obj, candidates, X, beta, N, True,
+                                           alias_threshold, doc_embedd=doc_embedd))
+            except Exception as e:
+                future.set_exception(e)
@@ -0,0 +1,213 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Long-running HTTP keyphrase extraction service
+
+Endpoints :
+    POST /extract : json body {"text": ..., "N": 10, "lang": "en", "beta": 0.55, "alias_threshold": 0.7}
+                    answers {"keyphrases": [...], "relevance": [...], "aliases": [[...], ...]}
+    GET /health : liveness (200 as long as the server answers)
+    GET /ready : readiness (200 once the service can process requests, 503 otherwise)
+"""
+
+import argparse
+import json
+import math
+from configparser import ConfigParser
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from swisscom_ai.research_keyphrase.model.input_representation import InputTextObj
+from swisscom_ai.research_keyphrase.service.batching import MicroBatcher
+
+LANGUAGES = ('en', 'de', 'fr')  # Languages having a grammar see @get_grammar
+MAX_BODY_SIZE = 10 * 1024 * 1024  # Default maximum size of a request body in bytes
+
+
+class KeyphraseService:
+    """Keep the embedding distributor, the pos tagger and the @MicroBatcher resident"""
+
+    def __init__(self, embedding_distrib, pos_tagger, max_batch_size=32, max_wait=0.01):
+        """
+        :param embedding_distrib: embedding distributor see @EmbeddingDistributor
+        :param pos_tagger: pos tagger see @PosTagging (called concurrently by the request threads)
+        :param max_batch_size: @see MicroBatcher
+        :param max_wait: @see MicroBatcher
+        """
+        self.embedding_distrib = embedding_distrib
+        self.pos_tagger = pos_tagger
+        self.batcher = MicroBatcher(embedding_distrib, max_batch_size=max_batch_size, max_wait=max_wait)
+
+    def is_ready(self):
+        # The embedding distributor may still be loading in the background (see @EmbeddingDistributorPreload)
+        distributor_ready = self.embedding_distrib.is_ready() if hasattr(self.embedding_distrib, 'is_ready') else True
+        return self.batcher.is_alive() and distributor_ready
+
+    def extract_keyphrases(self, raw_text, N=10, lang='en', beta=0.55, alias_threshold=0.7):
+        """
+        @see launch.extract_keyphrases
+        """
+        text_obj = InputTextObj(self.pos_tagger.pos_tag_raw_text(raw_text), lang)
+        return self.batcher.submit(text_obj, N, beta, alias_threshold).result()
+
+    def close(self):
+        self.batcher.close()
+
+
+class KeyphraseRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        elif self.path == '/ready':
+            if self.server.service.is_ready():
+                self._send_json(200, {'status': 'ready'})
+            else:
+                self._send_json(503, {'status': 'not ready'})
+        else:
+            self._send_json(404, {'error': 'Unknown path ' + self.path})
+
+    def do_POST(self):
+        if self.path != '/extract':
+            self._send_json(404, {'error': 'Unknown path ' + self.path})
+            return
+
+        try:
+            content_length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            content_length = -1
+        if content_length < 0 or content_length > self.server.max_body_size:
+            # The body is not read, the next bytes of the connection cannot be parsed as a request
+            self.close_connection = True
+            if content_length < 0:
+                self._send_json(400, {'error': 'Invalid Content-Length'})
+            else:
+                self._send_json(413, {'error': 'The request body exceeds {} bytes'.format(self.server.max_body_size)})
+            return
+
+        try:
+            request = json.loads(self.rfile.read(content_length).decode('utf8'))
+            raw_text, params = parse_request(request)
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {'error': 'Invalid request : ' + repr(e)})
+            return
+
+        if not self.server.service.is_ready():
+            self._send_json(503, {'error': 'Service not ready'})
+            return
+
+        try:
+            keyphrases, relevance, aliases = self.server.service.extract_keyphrases(raw_text, **params)
+        except Exception as e:
+            self._send_json(500, {'error': repr(e)})
+            return
+        self._send_json(200, {'keyphrases': keyphrases, 'relevance': relevance, 'aliases': aliases})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def _send_json(self, status, content):
+        body = json.dumps(content).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def parse_request(request):
+    """
+    Validate the body of an extraction request
+
+    :param request: decoded json body
+    :return: tuple (raw text, dict of the extraction parameters present in the request)
+    """
+    if not isinstance(request, dict):
+        raise TypeError('The request must be a json object')
+    raw_text = request['text']
+    if not isinstance(raw_text, str):
+        raise TypeError('text must be a string')
+
+    params = {}
+    if 'N' in request:
+        N = request['N']
+        if not isinstance(N, int) or isinstance(N, bool) or N < 1:
+            raise ValueError('N must be a positive integer')
+        params['N'] = N
+    if 'lang' in request:
+        if request['lang'] not in LANGUAGES:
+            raise ValueError('lang must be one of ' + ', '.join(LANGUAGES))
+        params['lang'] = request['lang']
+    for key in ('beta', 'alias_threshold'):
+        if key in request:
+            value = request[key]
+            if not isinstance(value, (int, float)) or isinstance(value, bool) or not math.isfinite(value):
+                raise ValueError(key + ' must be a number')
+            params[key] = value
+    if 'beta' in params and not 0 <= params['beta'] <= 1:
+        raise ValueError('beta must be between 0 and 1')
+    return raw_text, params
+
+
+class KeyphraseHTTPServer(ThreadingMixIn, HTTPServer):
+    """Threaded HTTP server (one thread per connection) serving a @KeyphraseService"""
+    daemon_threads = True
+
+    def __init__(self, server_address, service, verbose=False, max_body_size=MAX_BODY_SIZE):
+        """
+        :param server_address: tuple (host, port)
+        :param service: @KeyphraseService
+        :param verbose: log each request
+        :param max_body_size: maximum size of a request body in bytes (larger requests are answered 413)
+        """
+        HTTPServer.__init__(self, server_address, KeyphraseRequestHandler)
+        self.service = service
+        self.verbose = verbose
+        self.max_body_size = max_body_size
+
+
+if __name__ == '__main__':
+    from swisscom_ai.research_keyphrase.embeddings.emb_distrib_local import EmbeddingDistributorLocal
+    from swisscom_ai.research_keyphrase.embeddings.emb_distrib_preload import EmbeddingDistributorPreload
+    from swisscom_ai.research_keyphrase.preprocessing.postagging import PosTaggingCoreNLP
+
+    parser = argparse.ArgumentParser(description='Launch the keyphrase extraction HTTP service')
+    parser.add_argument('-host', help='host to bind', default='0.0.0.0')
+    parser.add_argument('-port', help='port to bind', default=8080, type=int)
+    parser.add_argument('-model_path', help='path to the sent2vec model (default taken from config.ini)')
+    parser.add_argument('-tagger_host', help='CoreNLP host', default='localhost')
+    parser.add_argument('-tagger_port', help='CoreNLP port', default=9000)
+    parser.add_argument('-max_batch_size', help='maximum number of documents embedded together', default=32, type=int)
+    parser.add_argument('-max_wait', help='maximum time (in seconds) a request waits for other requests',
+                        default=0.01, type=float)
+    parser.add_argument('-preload', help='serve (and answer not ready) while the model is loading',
+                        action='store_true')
+    parser.add_argument('-max_body_size', help='maximum size of a request body in bytes', default=MAX_BODY_SIZE,
+                        type=int)
+    parser.add_argument('-verbose', help='log each request', action='store_true')
+    args = parser.parse_args()
+
+    model_path = args.model_path
+    if model_path is None:
+        config_parser = ConfigParser()
+        config_parser.read('config.ini')
+        model_path = config_parser.get('SENT2VEC', 'model_path')
+
+    if args.preload:
+        embedding_distributor = EmbeddingDistributorPreload(EmbeddingDistributorLocal, model_path)
+    else:
+        embedding_distributor = EmbeddingDistributorLocal(model_path)
+    keyphrase_service = KeyphraseService(embedding_distributor,
+                                         PosTaggingCoreNLP(args.tagger_host, args.tagger_port),
+                                         max_batch_size=args.max_batch_size, max_wait=args.max_wait)
+    server = KeyphraseHTTPServer((args.host, args.port), keyphrase_service, verbose=args.verbose,
+                                 max_body_size=args.max_body_size)
+    print('Serving on', args.host, args.port)
+    try:
+        server.serve_forever()
+    finally:
+        keyphrase_service.close()
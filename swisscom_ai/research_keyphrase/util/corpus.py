@@ -0,0 +1,74 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Helper functions to read a corpus of documents and to write/resume JSONL results"""
+
+import json
+import os
+
+from swisscom_ai.research_keyphrase.util.fileIO import read_file
+
+
+def read_corpus(corpus_path, id_field='id', text_field='text'):
+    """
+    Read a corpus which is either :
+        - a directory : each file (recursively, sorted by path) is a document, its id is its relative path
+        - a JSONL file (.jsonl extension) : each line is a json object with an id and a text field
+        - a text file containing in each row a path to a document, its id is the path
+
+    :param corpus_path: path of the directory or file
+    :param id_field: name of the id field of the JSONL objects
+    :param text_field: name of the text field of the JSONL objects
+    :return: generator over tuple (document id, raw text)
+    """
+    if os.path.isdir(corpus_path):
+        paths = sorted(os.path.join(root, filename) for root, _, filenames in os.walk(corpus_path)
+                       for filename in filenames)
+        for path in paths:
+            yield os.path.relpath(path, corpus_path), read_file(path)
+    elif corpus_path.endswith('.jsonl'):
+        with open(corpus_path, 'r') as corpus_file:
+            for line in corpus_file:
+                if line.strip():
+                    document = json.loads(line)
+                    yield str(document[id_field]), document[text_field]
+    else:
+        for path in read_file(corpus_path).splitlines():
+            yield path, read_file(path)
+
+
+def read_done_ids(output_path, id_field='id', retry_errors=True):
+    """
+    Return the ids of the documents already written in a JSONL output file and remove a possibly incomplete last
+    line (e.g after a crash), s.t. new results can be appended to the file.
+
+    :param output_path: path of the JSONL output file
+    :param id_field: name of the id field of the JSONL objects
+    :param retry_errors: if true the documents whose record has an error field are not done (they are processed
+    again and their new record is appended after the error one)
+    :return: set of document ids
+    """
+    done_ids = set()
+    if not os.path.isfile(output_path):
+        return done_ids
+
+    valid_length = 0
+    with open(output_path, 'rb') as output_file:
+        for line in output_file:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                record = json.loads(line.decode('utf8'))
+                doc_id = str(record[id_field])
+            except (ValueError, KeyError, TypeError):
+                break
+            if not (retry_errors and 'error' in record):
+                done_ids.add(doc_id)
+            valid_length += len(line)
+
+    if valid_length != os.path.getsize(output_path):
+        with open(output_path, 'r+b') as output_file:
+            output_file.truncate(valid_length)
+    return done_ids
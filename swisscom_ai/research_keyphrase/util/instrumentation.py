@@ -0,0 +1,208 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Instrumentation of the stages of the keyphrase extraction.
+
+The extraction code wraps each stage in a stage block and attaches metrics to it (candidate counts, matrix sizes...) :
+
+    with stage('candidate_embedding') as s:
+        embeddings = ...
+        s.record(nb_candidates=len(candidates))
+
+When a stage ends, each registered callback is called with the name of the stage and its metrics (the wall time in
+seconds under 'time', and the peak memory allocated during the stage under 'peak_memory' if tracemalloc is tracing).
+Without callback, stage returns a shared no-op object : the cost of an instrumented stage is a function call.
+
+    registry = MetricsRegistry()
+    with instrumented(registry):
+        extract_keyphrases(...)
+    print(registry.report())
+"""
+
+import threading
+import time
+import tracemalloc
+
+_callbacks = ()  # Replaced (never modified in place) s.t. it can be read without lock
+_callbacks_lock = threading.Lock()
+_local = threading.local()  # stack of the running stages of each thread
+
+
+class _NullStage:
+    """Stage used when instrumentation is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def record(self, **metrics):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+
+    def __init__(self, name, metrics):
+        self.name = name
+        self.metrics = metrics
+        self._start = None
+        self._memory_start = None
+        self._peak = 0
+
+    def record(self, **metrics):
+        """
+        Attach metrics (numbers) to the stage
+        """
+        self.metrics.update(metrics)
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        if _traces_peak():
+            if stack:
+                stack[-1]._peak = max(stack[-1]._peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._memory_start = tracemalloc.get_traced_memory()[0]
+            self._peak = self._memory_start
+        stack.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics['time'] = time.perf_counter() - self._start
+        stack = _local.stack
+        stack.pop()
+        if self._memory_start is not None and tracemalloc.is_tracing():
+            self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            self.metrics['peak_memory'] = self._peak - self._memory_start
+            if stack:
+                # The peak of the parent stage was reset by this stage
+                stack[-1]._peak = max(stack[-1]._peak, self._peak)
+        if exc_type is not None:
+            self.metrics['error'] = 1
+        for callback in _callbacks:
+            callback(self.name, self.metrics)
+        return False
+
+
+def _traces_peak():
+    # tracemalloc.reset_peak is needed to measure the peak of each stage (Python >= 3.9)
+    return tracemalloc.is_tracing() and hasattr(tracemalloc, 'reset_peak')
+
+
+def stage(name, **metrics):
+    """
+    :param name: name of the stage
+    :param metrics: metrics of the stage known at its start
+    :return: context manager timing the stage, its record method attaches more metrics to the stage
+    """
+    if not _callbacks:
+        return _NULL_STAGE
+    return _Stage(name, metrics)
+
+
+def is_enabled():
+    """
+    :return: True if at least one callback is registered (to skip computing costly metrics otherwise)
+    """
+    return bool(_callbacks)
+
+
+def add_callback(callback):
+    """
+    :param callback: function called with (stage name, dict of metrics) at the end of each stage
+    """
+    global _callbacks
+    with _callbacks_lock:
+        _callbacks = _callbacks + (callback,)
+
+
+def remove_callback(callback):
+    global _callbacks
+    with _callbacks_lock:
+        _callbacks = tuple(registered for registered in _callbacks if registered is not callback)
+
+
+class instrumented:
+    """Context manager registering a callback for the duration of a block"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def __enter__(self):
+        add_callback(self.callback)
+        return self.callback
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        remove_callback(self.callback)
+        return False
+
+
+class MetricsRegistry:
+    """Callback aggregating the metrics of each stage : number of calls, and total, mean and maximum of each metric
+    (over the calls recording it)"""
+
+    def __init__(self):
+        self._stats = {}  # stage name -> {'calls': int, metric name -> [total, max, number of values]}
+        self._lock = threading.Lock()
+
+    def __call__(self, name, metrics):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = {'calls': 0}
+            stats['calls'] += 1
+            for metric, value in metrics.items():
+                aggregate = stats.get(metric)
+                if aggregate is None:
+                    stats[metric] = [value, value, 1]
+                else:
+                    aggregate[0] += value
+                    aggregate[1] = max(aggregate[1], value)
+                    aggregate[2] += 1
+
+    def stats(self):
+        """
+        :return: dict containing for each stage a dict with its number of calls and for each metric a dict with its
+        total, mean and max
+        """
+        result = {}
+        with self._lock:
+            for name, stats in self._stats.items():
+                result[name] = {'calls': stats['calls']}
+                for metric, aggregate in stats.items():
+                    if metric != 'calls':
+                        total, maximum, count = aggregate
+                        result[name][metric] = {'total': total, 'mean': total / count, 'max': maximum}
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def report(self):
+        """
+        :return: string with one line per stage (sorted by total time)
+        """
+        stats = self.stats()
+        lines = []
+        for name in sorted(stats, key=lambda name: -stats[name]['time']['total']):
+            stage_stats = stats[name]
+            metrics = ['calls={}'.format(stage_stats['calls'])]
+            for metric in sorted(stage_stats):
+                if metric == 'calls':
+                    continue
+                values = stage_stats[metric]
+                if metric == 'time':
+                    metrics.insert(0, 'time={:.4f}s (mean {:.6f}s)'.format(values['total'], values['mean']))
+                else:
+                    metrics.append('{}: mean={:.6g} max={:.6g}'.format(metric, values['mean'], values['max']))
+            lines.append('{:<22} {}'.format(name, '  '.join(metrics)))
+        return '\n'.join(lines)
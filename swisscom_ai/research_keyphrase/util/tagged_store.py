@@ -0,0 +1,267 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Compact binary format for POS tagged documents (instead of the word|tag ...[ENDSENT] text format).
+
+A shard is a directory containing :
+    - vocabulary.json : list of the distinct tokens of the shard
+    - tags.json : list of the distinct tags of the shard (at most 256)
+    - token_ids.npy : uint32 id (in the vocabulary) of each token of all the documents
+    - tag_ids.npy : uint8 id (in the tags) of each token
+    - sent_offsets.npy : int64 the i-th sentence contains the tokens sent_offsets[i] to sent_offsets[i + 1]
+    - doc_offsets.npy : int64 the i-th document contains the sentences doc_offsets[i] to doc_offsets[i + 1]
+    - doc_ids.json : id of each document
+The .npy files are opened memory-mapped. A corpus is either a single shard or a directory of shards (see
+@write_tagged_corpus).
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from array import array
+
+import numpy as np
+
+from swisscom_ai.research_keyphrase.model.input_representation import InputTextObj, convert, get_tag_id
+from swisscom_ai.research_keyphrase.util.fileIO import read_file
+from swisscom_ai.research_keyphrase.util.solr_fields import process_tagged_text
+
+VOCABULARY_FILE = 'vocabulary.json'
+TAGS_FILE = 'tags.json'
+TOKEN_IDS_FILE = 'token_ids.npy'
+TAG_IDS_FILE = 'tag_ids.npy'
+SENT_OFFSETS_FILE = 'sent_offsets.npy'
+DOC_OFFSETS_FILE = 'doc_offsets.npy'
+DOC_IDS_FILE = 'doc_ids.json'
+
+SHARD_PREFIX = 'shard_'
+MAX_TAGS = 256
+
+
+class TaggedShardWriter:
+    """Write POS tagged documents to a shard, the shard is written in a temporary directory and moved in place by
+    @close"""
+
+    def __init__(self, shard_path):
+        """
+        :param shard_path: path of the shard directory to create
+        """
+        self.shard_path = shard_path
+        self.vocabulary = {}  # token -> id
+        self.tags = {}  # tag -> id
+        self.token_ids = array('I')
+        self.tag_ids = array('B')
+        self.sent_offsets = array('q', [0])
+        self.doc_offsets = array('q', [0])
+        self.doc_ids = []
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def add(self, doc_id, tagged_text):
+        """
+        :param doc_id: id of the document (string)
+        :param tagged_text: list of list of tuple (word, tag), one list per sentence
+        """
+        vocabulary, tags = self.vocabulary, self.tags
+        for sent in tagged_text:
+            for word, tag in sent:
+                token_id = vocabulary.get(word)
+                if token_id is None:
+                    token_id = vocabulary[word] = len(vocabulary)
+                tag_id = tags.get(tag)
+                if tag_id is None:
+                    if len(tags) == MAX_TAGS:
+                        raise ValueError('More than {} distinct tags in a shard'.format(MAX_TAGS))
+                    tag_id = tags[tag] = len(tags)
+                self.token_ids.append(token_id)
+                self.tag_ids.append(tag_id)
+            self.sent_offsets.append(len(self.token_ids))
+        self.doc_offsets.append(len(self.sent_offsets) - 1)
+        self.doc_ids.append(doc_id)
+
+    def close(self):
+        tmp_path = self.shard_path + '.tmp'
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+
+        for filename, values in [(VOCABULARY_FILE, list(self.vocabulary)), (TAGS_FILE, list(self.tags)),
+                                 (DOC_IDS_FILE, self.doc_ids)]:
+            with open(os.path.join(tmp_path, filename), 'w', encoding='utf-8') as json_file:
+                json.dump(values, json_file, ensure_ascii=False)
+        for filename, values, dtype in [(TOKEN_IDS_FILE, self.token_ids, np.uint32),
+                                        (TAG_IDS_FILE, self.tag_ids, np.uint8),
+                                        (SENT_OFFSETS_FILE, self.sent_offsets, np.int64),
+                                        (DOC_OFFSETS_FILE, self.doc_offsets, np.int64)]:
+            np.save(os.path.join(tmp_path, filename), np.frombuffer(values, dtype=dtype))
+
+        if os.path.exists(self.shard_path):
+            shutil.rmtree(self.shard_path)
+        os.rename(tmp_path, self.shard_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+
+class TaggedShardReader:
+    """Read-only access to the documents of a shard written by @TaggedShardWriter"""
+
+    def __init__(self, shard_path):
+        """
+        :param shard_path: path of the shard directory
+        """
+        self.shard_path = shard_path
+        with open(os.path.join(shard_path, VOCABULARY_FILE), 'r', encoding='utf-8') as json_file:
+            self.vocabulary = json.load(json_file)
+        with open(os.path.join(shard_path, TAGS_FILE), 'r', encoding='utf-8') as json_file:
+            self.tags = json.load(json_file)
+        with open(os.path.join(shard_path, DOC_IDS_FILE), 'r', encoding='utf-8') as json_file:
+            self.doc_ids = json.load(json_file)
+        self.token_ids = np.load(os.path.join(shard_path, TOKEN_IDS_FILE), mmap_mode='r')
+        self.tag_ids = np.load(os.path.join(shard_path, TAG_IDS_FILE), mmap_mode='r')
+        self.sent_offsets = np.load(os.path.join(shard_path, SENT_OFFSETS_FILE), mmap_mode='r')
+        self.doc_offsets = np.load(os.path.join(shard_path, DOC_OFFSETS_FILE), mmap_mode='r')
+
+        if len(self.doc_offsets) != len(self.doc_ids) + 1 or len(self.token_ids) != len(self.tag_ids):
+            raise RuntimeError('Corrupted tagged shard ' + shard_path)
+
+        self._lowercased_vocabulary = None
+        self._vocabulary_lengths = None
+        self._tag_id_maps = {}  # lang -> array containing for each tag of the shard its id in @TAGS
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def tagged_text(self, idx):
+        """
+        :param idx: index of the document in the shard
+        :return: list of list of tuple (word, tag), one list per sentence
+        """
+        vocabulary, tags = self.vocabulary, self.tags
+        token_ids, tag_ids = self.token_ids, self.tag_ids
+        sent_start, sent_end = self.doc_offsets[idx], self.doc_offsets[idx + 1]
+        offsets = self.sent_offsets[sent_start:sent_end + 1].tolist()
+        return [[(vocabulary[token_id], tags[tag_id])
+                 for token_id, tag_id in zip(token_ids[start:end].tolist(), tag_ids[start:end].tolist())]
+                for start, end in zip(offsets[:-1], offsets[1:])]
+
+    def text_obj(self, idx, lang, min_word_len=3):
+        """
+        :param idx: index of the document in the shard
+        :param lang: language
+        :param min_word_len: see @InputTextObj
+        :return: @InputTextObj of the document, built directly from the arrays of the shard (the same as
+        InputTextObj(self.tagged_text(idx), lang))
+        """
+        if self._lowercased_vocabulary is None:
+            self._lowercased_vocabulary = [sys.intern(token.lower()) for token in self.vocabulary]
+            self._vocabulary_lengths = np.array([len(token) for token in self._lowercased_vocabulary], dtype=np.int64)
+
+        tag_id_map = self._tag_id_maps.get(lang)
+        if tag_id_map is None:
+            convert_tags = lang in ['fr', 'de']
+            tag_id_map = self._tag_id_maps[lang] = np.array(
+                [get_tag_id(convert(tag) if convert_tags else tag) for tag in self.tags], dtype=np.uint16)
+
+        sent_start, sent_end = self.doc_offsets[idx], self.doc_offsets[idx + 1]
+        offsets = np.asarray(self.sent_offsets[sent_start:sent_end + 1])
+        start, end = offsets[0], offsets[-1]
+        token_ids = np.asarray(self.token_ids[start:end])
+        tag_ids = np.where(self._vocabulary_lengths[token_ids] < min_word_len, get_tag_id('LESS'),
+                           tag_id_map[self.tag_ids[start:end]]).astype(np.uint16)
+
+        lowercased_vocabulary = self._lowercased_vocabulary
+        return InputTextObj.from_flat([lowercased_vocabulary[token_id] for token_id in token_ids.tolist()],
+                                      array('H', tag_ids.tobytes()),
+                                      array('L', (offsets - start).tolist()),
+                                      lang, min_word_len=min_word_len)
+
+
+class TaggedCorpusReader:
+    """Read a tagged corpus : a single shard or a directory of shards (read in the order of their names)"""
+
+    def __init__(self, corpus_path):
+        """
+        :param corpus_path: path of a shard or of a directory of shards
+        """
+        if os.path.isfile(os.path.join(corpus_path, DOC_IDS_FILE)):
+            shard_paths = [corpus_path]
+        else:
+            shard_paths = sorted(os.path.join(corpus_path, name) for name in os.listdir(corpus_path)
+                                 if name.startswith(SHARD_PREFIX) and not name.endswith('.tmp'))
+        self.shards = [TaggedShardReader(shard_path) for shard_path in shard_paths]
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def tagged_texts(self):
+        """
+        :return: generator over tuple (document id, list of list of tuple (word, tag))
+        """
+        for shard in self.shards:
+            for idx, doc_id in enumerate(shard.doc_ids):
+                yield doc_id, shard.tagged_text(idx)
+
+    def text_objs(self, lang, min_word_len=3):
+        """
+        :return: generator over tuple (document id, @InputTextObj) see @TaggedShardReader.text_obj
+        """
+        for shard in self.shards:
+            for idx, doc_id in enumerate(shard.doc_ids):
+                yield doc_id, shard.text_obj(idx, lang, min_word_len)
+
+
+def write_tagged_corpus(corpus_path, tagged_texts, shard_size=10000):
+    """
+    Write a tagged corpus as a directory of shards of at most shard_size documents
+
+    :param corpus_path: path of the directory to create
+    :param tagged_texts: iterable over tuple (document id, list of list of tuple (word, tag))
+    :return: number of documents written
+    """
+    os.makedirs(corpus_path, exist_ok=True)
+    nb_docs = 0
+    writer = None
+    for doc_id, tagged_text in tagged_texts:
+        if writer is None:
+            writer = TaggedShardWriter(os.path.join(corpus_path, '{}{:05d}'.format(SHARD_PREFIX,
+                                                                                   nb_docs // shard_size)))
+        writer.add(doc_id, tagged_text)
+        nb_docs += 1
+        if len(writer) == shard_size:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+    return nb_docs
+
+
+def read_tagged_text_files(list_of_path):
+    """
+    :param list_of_path: list of files in the word|tag ...[ENDSENT] format (e.g written by @PosTagging.pos_tag_file)
+    :return: generator over tuple (path, list of list of tuple (word, tag))
+    """
+    for path in list_of_path:
+        yield path, process_tagged_text(read_file(path))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert POS tagged files (word|tag ...[ENDSENT] format) '
+                                                 'to a binary tagged corpus')
+    parser.add_argument('listing_file_path', help='path to a text file containing in each row a path to a tagged file')
+    parser.add_argument('corpus_path', help='path of the binary tagged corpus directory to create')
+    parser.add_argument('-shard_size', help='number of documents per shard', default=10000, type=int)
+    args = parser.parse_args()
+
+    list_of_path = read_file(args.listing_file_path).splitlines()
+    nb_docs = write_tagged_corpus(args.corpus_path, read_tagged_text_files(list_of_path), args.shard_size)
+    print('Converted', nb_docs, 'documents to', args.corpus_path)
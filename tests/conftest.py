@@ -0,0 +1,103 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+
+_TOKEN = re.compile(r'\w+|[^\w\s]')
+_NEWLINES = re.compile(r'\n\s*\n')
+
+
+def stub_corenlp_annotate(text, newline_is_sentence_break=True):
+    """
+    Tokenize, sentence split and tag a text like the tokenize,ssplit,pos annotators of CoreNLP : a sentence ends after
+    a '.' token or (ssplit.newlineIsSentenceBreak=two) at two consecutive newlines, the character offsets count UTF-16
+    code units. Words are tagged NN and punctuation is tagged with itself.
+
+    :return: json answer as a dict
+    """
+    sentences = []
+    tokens = []
+    previous_end = 0
+    for match in _TOKEN.finditer(text):
+        if tokens and newline_is_sentence_break and _NEWLINES.search(text, previous_end, match.start()):
+            sentences.append({'tokens': tokens})
+            tokens = []
+        word = match.group()
+        tokens.append({'word': word, 'pos': 'NN' if word[0].isalnum() else word,
+                       'characterOffsetBegin': len(text[:match.start()].encode('utf-16-le')) // 2,
+                       'characterOffsetEnd': len(text[:match.end()].encode('utf-16-le')) // 2})
+        previous_end = match.end()
+        if word == '.':
+            sentences.append({'tokens': tokens})
+            tokens = []
+    if tokens:
+        sentences.append({'tokens': tokens})
+    return {'sentences': sentences}
+
+
+class _StubCoreNLPHandler(BaseHTTPRequestHandler):
+    """Answer like a CoreNLP server (see @stub_corenlp_annotate), after a random delay s.t. answers arrive out of
+    order"""
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.nb_connections += 1
+
+    def do_POST(self):
+        text = self.rfile.read(int(self.headers['Content-Length'])).decode('utf8')
+        with self.server.lock:
+            self.server.nb_requests += 1
+            self.server.texts.append(text)
+            self.server.in_flight += 1
+            self.server.peak_in_flight = max(self.server.peak_in_flight, self.server.in_flight)
+        try:
+            time.sleep(random.uniform(0, 0.02))
+            body = json.dumps(stub_corenlp_annotate(text, self.server.newline_is_sentence_break)).encode('utf8')
+        finally:
+            with self.server.lock:
+                self.server.in_flight -= 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _StubCoreNLPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _StubCoreNLPHandler)
+        self.lock = threading.Lock()
+        self.nb_connections = 0
+        self.nb_requests = 0
+        self.texts = []  # Body of each request
+        self.in_flight = 0  # Requests being answered
+        self.peak_in_flight = 0  # Maximum number of requests answered at the same time
+        self.newline_is_sentence_break = True
+
+
+@pytest.fixture
+def corenlp_server():
+    """Local stub of a CoreNLP server"""
+    stub = _StubCoreNLPServer()
+    thread = threading.Thread(target=stub.serve_forever, daemon=True)
+    thread.start()
+    yield stub
+    stub.shutdown()
+    stub.server_close()
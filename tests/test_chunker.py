@@ -0,0 +1,81 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""@CompiledChunker finds the same chunks as nltk.RegexpParser with the grammar of each language"""
+
+import nltk
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from swisscom_ai.research_keyphrase.model.chunker import CompiledChunker
+from swisscom_ai.research_keyphrase.model.extractor import extract_candidates, get_chunker, get_grammar
+from swisscom_ai.research_keyphrase.model.input_representation import InputTextObj
+
+# Tags after the conversion of @InputTextObj, including the ones used by the German NBAR/NP cascade
+TAGS = {
+    'en': ['NN', 'NNS', 'NNP', 'NNPS', 'JJ', 'VB', 'DT', 'IN', 'LESS', '.'],
+    'de': ['NN', 'JJ', 'CARD', 'PPOSAT', 'APPR', 'APPRART', 'ART', 'VVFIN', 'LESS', '$.'],
+    'fr': ['NN', 'NNP', 'JJ', 'DET', 'P', 'V', 'LESS', 'PONCT'],
+}
+
+
+def tree_chunks(tree):
+    """
+    :param tree: nltk Tree returned by nltk.RegexpParser
+    :return: sorted list of tuple (label, start, end) of every subtree (except the root)
+    """
+    chunks = []
+
+    def visit(node, start):
+        for child in node:
+            if isinstance(child, nltk.Tree):
+                end = start + len(child.leaves())
+                chunks.append((child.label(), start, end))
+                visit(child, start)
+                start = end
+            else:
+                start += 1
+
+    visit(tree, 0)
+    return sorted(chunks)
+
+
+def reference_candidates(text_obj):
+    """
+    Candidates of the original extract_candidates (nltk.RegexpParser on pos_tagged)
+    """
+    parser = nltk.RegexpParser(get_grammar(text_obj.lang))
+    candidates = set()
+    for tree in parser.parse_sents(text_obj.pos_tagged):
+        for subtree in tree.subtrees(filter=lambda t: t.label() == 'NP'):
+            candidates.add(' '.join(word for word, tag in subtree.leaves()))
+    return {kp for kp in candidates if len(kp.split()) <= 5}
+
+
+@st.composite
+def tagged_sentence(draw, lang):
+    tags = draw(st.lists(st.sampled_from(TAGS[lang]), max_size=25))
+    return [('w{}'.format(i), tag) for i, tag in enumerate(tags)]
+
+
+@settings(max_examples=300, deadline=None)
+@given(st.data(), st.sampled_from(['en', 'de', 'fr']))
+def test_same_chunks_as_regexp_parser(data, lang):
+    sent = data.draw(tagged_sentence(lang))
+    expected = tree_chunks(nltk.RegexpParser(get_grammar(lang)).parse(sent))
+
+    assert sorted(CompiledChunker(get_grammar(lang)).chunk([tag for word, tag in sent])) == expected
+    assert sorted(get_chunker(lang).chunk([tag for word, tag in sent])) == expected
+
+
+@settings(max_examples=200, deadline=None)
+@given(st.data(), st.sampled_from(['en', 'de', 'fr']))
+def test_same_candidates_as_regexp_parser(data, lang):
+    words = st.sampled_from(['neural', 'network', 'deep', 'learning', 'bahn', 'réseau', 'of', 'the'])
+    raw_tags = TAGS[lang] + (['NE', 'NC', 'NPP', 'ADJA', 'ADJ'] if lang != 'en' else [])
+    pos_tagged = data.draw(st.lists(st.lists(st.tuples(words, st.sampled_from(raw_tags)), max_size=15), max_size=4))
+    text_obj = InputTextObj(pos_tagged, lang)
+
+    assert set(extract_candidates(text_obj)) == reference_candidates(text_obj)
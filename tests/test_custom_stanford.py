@@ -0,0 +1,160 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""@StanfordTaggerProcess with a small Python script standing for the java MaxentTagger process"""
+
+import json
+import os
+import stat
+import sys
+import time
+
+import pytest
+from nltk import internals
+
+from swisscom_ai.research_keyphrase.preprocessing.custom_stanford import MAXENT_TAGGER, EnglishStanfordPOSTagger, \
+    StanfordTaggerProcess
+
+# Tag each line of stdin like a MaxentTagger with keepEmptySentences : one output line per sentence (ending after a
+# '.' token), an empty line for an empty document. The files of FAKE_TAGGER_DIR control the process :
+# crash : exit on a document containing CRASH (once, or at each start if it contains 'always'),
+# ignore_eof : keep running after stdin is closed
+FAKE_TAGGER = '''
+import json
+import os
+import sys
+import time
+
+directory = os.environ['FAKE_TAGGER_DIR']
+with open(os.path.join(directory, 'starts'), 'a') as starts_file:
+    starts_file.write(json.dumps(sys.argv[1:]) + '\\n')
+crash_path = os.path.join(directory, 'crash')
+
+for line in sys.stdin:
+    tokens = line.split()
+    if 'CRASH' in tokens and os.path.exists(crash_path):
+        with open(crash_path) as crash_file:
+            always = crash_file.read() == 'always'
+        if not always:
+            os.remove(crash_path)
+        sys.stderr.write('Exception in thread "main" java.lang.OutOfMemoryError\\n')
+        sys.exit(1)
+    sentences = [[]]
+    for token in tokens:
+        sentences[-1].append(token + '_' + ('.' if token == '.' else 'nn'))
+        if token == '.':
+            sentences.append([])
+    if len(sentences) > 1 and not sentences[-1]:
+        sentences.pop()
+    for sentence in sentences:
+        sys.stdout.write(' '.join(sentence) + '\\n')
+    sys.stdout.flush()
+
+if os.path.exists(os.path.join(directory, 'ignore_eof')):
+    time.sleep(60)
+'''
+
+
+@pytest.fixture
+def tagger(tmp_path, monkeypatch):
+    """EnglishStanfordPOSTagger whose java binary is the fake tagger script"""
+    java = tmp_path / 'java'
+    java.write_text('#!{}\n{}'.format(sys.executable, FAKE_TAGGER))
+    java.chmod(java.stat().st_mode | stat.S_IXUSR)
+    (tmp_path / 'stanford-postagger.jar').write_text('')
+    (tmp_path / 'english.tagger').write_text('')
+
+    monkeypatch.setenv('FAKE_TAGGER_DIR', str(tmp_path))
+    monkeypatch.setattr(internals, 'config_java', lambda *args, **kwargs: None)
+    monkeypatch.setattr(internals, '_java_bin', str(java))
+    with pytest.warns(DeprecationWarning):
+        return EnglishStanfordPOSTagger(str(tmp_path / 'english.tagger'), str(tmp_path / 'stanford-postagger.jar'))
+
+
+def starts(tmp_path):
+    with open(str(tmp_path / 'starts')) as starts_file:
+        return [json.loads(line) for line in starts_file]
+
+
+def test_round_trip(tagger, tmp_path):
+    process = StanfordTaggerProcess(tagger)
+    lines = ['Neural networks learn .', 'First sentence . Second one .', '', 'no final punctuation', 'word']
+
+    outputs = process.tag_lines(lines)
+    assert outputs == ['Neural_nn networks_nn learn_nn ._.', 'First_nn sentence_nn ._.\nSecond_nn one_nn ._.', '',
+                       'no_nn final_nn punctuation_nn', 'word_nn']
+    assert tagger.parse_output(outputs[1]) == [[('First', 'NN'), ('sentence', 'NN'), ('.', '.')],
+                                               [('Second', 'NN'), ('one', 'NN'), ('.', '.')]]
+
+    # The same process tags the next calls, started with the options of the tagger
+    assert process.tag_lines(['Réseaux de neurones']) == ['Réseaux_nn de_nn neurones_nn']
+    assert process.tag_lines([]) == []
+    assert process.nb_starts == 1
+    cmd, = starts(tmp_path)
+    assert cmd == ['-mx1000m', '-cp', str(tmp_path / 'stanford-postagger.jar')] + tagger.stdin_cmd()
+    assert cmd[3:6] == [MAXENT_TAGGER, '-model', str(tmp_path / 'english.tagger')]
+    process.close()
+
+
+def test_large_batch_does_not_block(tagger):
+    process = StanfordTaggerProcess(tagger)
+    lines = ['document {} with some words .'.format(idx) * 20 for idx in range(2000)]
+
+    outputs = process.tag_lines(lines)
+    assert len(outputs) == len(lines)
+    assert outputs[1999].startswith('document_nn 1999_nn')
+    process.close()
+
+
+def test_crash_restarts_the_process_once(tagger, tmp_path):
+    process = StanfordTaggerProcess(tagger)
+    process.tag_lines(['warm up'])
+    (tmp_path / 'crash').write_text('once')
+
+    # The process dies in the middle of the batch, the whole batch is sent again to a new process
+    with pytest.warns(UserWarning, match='restarting'):
+        outputs = process.tag_lines(['before', 'CRASH here', 'after'])
+    assert outputs == ['before_nn', 'CRASH_nn here_nn', 'after_nn']
+    assert process.nb_starts == 2
+    assert process.is_alive()
+    process.close()
+
+
+def test_crash_after_restart_raises(tagger, tmp_path):
+    process = StanfordTaggerProcess(tagger)
+    (tmp_path / 'crash').write_text('always')
+
+    with pytest.warns(UserWarning, match='restarting'):
+        with pytest.raises(RuntimeError, match='OutOfMemoryError'):
+            process.tag_lines(['before', 'CRASH here'])
+    assert process.nb_starts == 2
+    assert not process.is_alive()
+
+    # The next call starts a new process
+    os.remove(str(tmp_path / 'crash'))
+    assert process.tag_lines(['CRASH again']) == ['CRASH_nn again_nn']
+    assert process.nb_starts == 3
+    process.close()
+
+
+def test_close(tagger, tmp_path):
+    process = StanfordTaggerProcess(tagger)
+    process.close()  # Not started
+    process.tag_lines(['a'])
+    child = process._process
+
+    process.close()
+    assert child.returncode == 0
+    assert not process.is_alive()
+    process.close()
+
+    # A process which does not exit when its stdin is closed is killed after the timeout
+    (tmp_path / 'ignore_eof').write_text('')
+    process.tag_lines(['b'])
+    child = process._process
+    start = time.time()
+    process.close(timeout=0.5)
+    assert child.returncode != 0
+    assert time.time() - start < 5
@@ -0,0 +1,136 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""@EmbeddingDistributorCache : counters, LRU eviction, precision and concurrent callers"""
+
+import threading
+import zlib
+
+import numpy as np
+import pytest
+
+from swisscom_ai.research_keyphrase.embeddings.emb_distrib_cache import EmbeddingDistributorCache
+from swisscom_ai.research_keyphrase.embeddings.emb_distrib_interface import EmbeddingDistributor
+from swisscom_ai.research_keyphrase.embeddings.precision import to_precision
+
+
+class StubEmbeddingDistributor(EmbeddingDistributor):
+    """Deterministic float64 vector per sentence, records the sentences of each call"""
+
+    def __init__(self, dim=8, barrier=None):
+        self.dim = dim
+        self.calls = []
+        self.barrier = barrier
+
+    def get_tokenized_sents_embeddings(self, sents):
+        self.calls.append(list(sents))
+        if self.barrier is not None:
+            self.barrier.wait()
+        return np.array([vector(sent, self.dim) for sent in sents]).reshape(len(sents), self.dim)
+
+
+def vector(sent, dim=8):
+    return np.random.RandomState(zlib.crc32(sent.encode('utf8'))).randn(dim)
+
+
+def expected(sents, precision='float64'):
+    return to_precision(np.array([vector(sent) for sent in sents]), precision)
+
+
+def test_only_missing_phrases_are_embedded():
+    distributor = StubEmbeddingDistributor()
+    cache = EmbeddingDistributorCache(distributor)
+
+    np.testing.assert_array_equal(cache.get_tokenized_sents_embeddings(['a', 'b', 'a']), expected(['a', 'b', 'a']))
+    np.testing.assert_array_equal(cache.get_tokenized_sents_embeddings(['b', 'c', 'a']), expected(['b', 'c', 'a']))
+    assert distributor.calls == [['a', 'b'], ['c']]
+    assert len(cache) == 3
+
+
+def test_counters_per_requested_sentence():
+    cache = EmbeddingDistributorCache(StubEmbeddingDistributor())
+
+    # A missing phrase repeated in the same call is a miss each time
+    cache.get_tokenized_sents_embeddings(['a', 'a', 'a', 'b'])
+    assert (cache.hits, cache.misses) == (0, 4)
+    cache.get_tokenized_sents_embeddings(['a', 'b', 'c', 'c'])
+    assert (cache.hits, cache.misses) == (2, 6)
+    assert cache.cache_info()['size'] == 3
+
+    cache.clear()
+    assert (cache.hits, cache.misses, cache.evictions, len(cache)) == (0, 0, 0, 0)
+
+
+def test_least_recently_used_phrases_are_evicted():
+    distributor = StubEmbeddingDistributor()
+    cache = EmbeddingDistributorCache(distributor, max_entries=3)
+
+    cache.get_tokenized_sents_embeddings(['a', 'b', 'c'])
+    cache.get_tokenized_sents_embeddings(['a'])  # b is now the least recently used
+    cache.get_tokenized_sents_embeddings(['d'])
+    assert cache.evictions == 1
+    assert len(cache) == 3
+
+    np.testing.assert_array_equal(cache.get_tokenized_sents_embeddings(['a', 'c', 'd', 'b']),
+                                  expected(['a', 'c', 'd', 'b']))
+    assert distributor.calls[-1] == ['b']  # evicted, the others were hits
+    assert cache.evictions == 2
+
+
+def test_max_memory_bounds_the_capacity():
+    cache = EmbeddingDistributorCache(StubEmbeddingDistributor(), max_entries=1000, max_memory=5 * 8 * 4,
+                                      precision='float32')
+    cache.get_tokenized_sents_embeddings(['p{}'.format(i) for i in range(12)])
+
+    assert cache.capacity == 5
+    assert cache.cache_info()['memory'] <= 5 * 8 * 4
+    assert len(cache) == 5
+    assert cache.evictions == 7
+
+    with pytest.raises(ValueError):
+        EmbeddingDistributorCache(StubEmbeddingDistributor(), max_memory=4).get_tokenized_sents_embeddings(['a'])
+    with pytest.raises(ValueError):
+        EmbeddingDistributorCache(StubEmbeddingDistributor(), max_entries=0)
+
+
+@pytest.mark.parametrize('precision,dtype', [(None, np.float64), ('float64', np.float64), ('float32', np.float32),
+                                             ('int8', np.float32)])
+def test_precision(precision, dtype):
+    cache = EmbeddingDistributorCache(StubEmbeddingDistributor(), precision=precision)
+    sents = ['a', 'b', 'c']
+
+    # The misses return the same values as the next hits
+    missed = cache.get_tokenized_sents_embeddings(sents)
+    hit = cache.get_tokenized_sents_embeddings(sents)
+    mixed = cache.get_tokenized_sents_embeddings(['d', 'b'])
+    assert missed.dtype == hit.dtype == mixed.dtype == dtype
+    np.testing.assert_array_equal(missed, hit)
+    np.testing.assert_array_equal(missed, expected(sents, precision or 'float64'))
+    np.testing.assert_array_equal(mixed, expected(['d', 'b'], precision or 'float64'))
+    if precision == 'int8':
+        np.testing.assert_allclose(hit, expected(sents), atol=np.abs(expected(sents)).max() / 127)
+        assert cache.cache_info()['memory'] == cache.capacity * (8 + 4)
+
+
+def test_wrapped_distributor_is_called_without_the_lock():
+    # Both calls miss and must be inside the wrapped distributor at the same time to pass the barrier
+    distributor = StubEmbeddingDistributor(barrier=threading.Barrier(2, timeout=5))
+    cache = EmbeddingDistributorCache(distributor, max_entries=10)
+    results = {}
+
+    def embed(sents):
+        results[sents[0]] = cache.get_tokenized_sents_embeddings(sents)
+
+    threads = [threading.Thread(target=embed, args=(sents,)) for sents in (['a', 'shared'], ['b', 'shared'])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    np.testing.assert_array_equal(results['a'], expected(['a', 'shared']))
+    np.testing.assert_array_equal(results['b'], expected(['b', 'shared']))
+    # The phrase missed by both calls is stored once
+    assert len(cache) == 3
+    assert (cache.hits, cache.misses) == (0, 4)
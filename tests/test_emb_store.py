@@ -0,0 +1,109 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""@build_store, @PhraseEmbeddingStore and @EmbeddingDistributorStore with a stub embedding distributor"""
+
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+import pytest
+
+from swisscom_ai.research_keyphrase.embeddings.emb_distrib_interface import EmbeddingDistributor
+from swisscom_ai.research_keyphrase.embeddings.emb_distrib_store import EmbeddingDistributorStore
+from swisscom_ai.research_keyphrase.embeddings.emb_store import PhraseEmbeddingStore, build_store
+
+PHRASES = ['neural networks', 'deep learning', 'graph', 'réseaux de neurones', 'language models']
+
+
+class StubEmbeddingDistributor(EmbeddingDistributor):
+    """Deterministic vector per sentence, records the sentences of each call"""
+
+    def __init__(self, dim=8):
+        self.dim = dim
+        self.calls = []
+
+    def get_tokenized_sents_embeddings(self, sents):
+        self.calls.append(list(sents))
+        return np.array([vector(sent, self.dim) for sent in sents]).reshape(len(sents), self.dim)
+
+
+def vector(sent, dim=8):
+    return np.random.RandomState(zlib.crc32(sent.encode('utf8'))).randn(dim)
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    path = str(tmp_path / 'store')
+    assert build_store(path, PHRASES + ['', 'graph', 'deep learning'], StubEmbeddingDistributor(), batch_size=2) == 5
+    return path
+
+
+def test_round_trip(store_path):
+    store = PhraseEmbeddingStore(store_path)
+
+    assert len(store) == len(PHRASES)
+    assert store.dim == 8
+    assert 'graph' in store and '' not in store
+    assert store.lookup(['deep learning', 'unknown', 'neural networks']) == [1, None, 0]
+    np.testing.assert_array_equal(store.vectors, np.array([vector(phrase) for phrase in PHRASES], dtype=np.float32))
+    assert not os.path.exists(store_path + '.tmp')
+
+
+@pytest.mark.parametrize('phrase', ['deep\nlearning', 'deep\rlearning', 'deep learning\r\n'])
+def test_line_break_rejected(tmp_path, phrase):
+    path = str(tmp_path / 'store')
+    distributor = StubEmbeddingDistributor()
+
+    with pytest.raises(ValueError):
+        build_store(path, PHRASES + [phrase], distributor)
+    assert distributor.calls == []
+    assert not os.path.exists(path)
+
+
+def test_misses_sent_to_the_fallback(store_path):
+    fallback = StubEmbeddingDistributor()
+    distributor = EmbeddingDistributorStore(store_path, fallback=fallback)
+
+    sents = ['graph', 'unknown phrase', 'neural networks', 'other unknown']
+    embeddings = distributor.get_tokenized_sents_embeddings(sents)
+
+    assert fallback.calls == [['unknown phrase', 'other unknown']]
+    np.testing.assert_allclose(embeddings, np.array([vector(sent) for sent in sents]), rtol=1e-6)
+
+    # Only known phrases : the fallback is not called
+    distributor.get_tokenized_sents_embeddings(['graph', 'deep learning'])
+    assert len(fallback.calls) == 1
+
+
+def test_without_fallback_misses_are_zero(store_path):
+    embeddings = EmbeddingDistributorStore(store_path).get_tokenized_sents_embeddings(['graph', 'unknown phrase'])
+
+    np.testing.assert_allclose(embeddings[0], vector('graph'), rtol=1e-6)
+    assert not embeddings[1].any()
+
+
+def test_fallback_created_once(store_path):
+    created = []
+
+    def factory():
+        time.sleep(0.2)  # Loading the model
+        created.append(StubEmbeddingDistributor())
+        return created[-1]
+
+    distributor = EmbeddingDistributorStore(store_path, fallback_factory=factory)
+    distributor.get_tokenized_sents_embeddings(['graph'])
+    assert created == []
+
+    threads = [threading.Thread(target=distributor.get_tokenized_sents_embeddings, args=(['unknown', 'graph'],))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1
+    assert len(created[0].calls) == 8
@@ -0,0 +1,60 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""@unique_ngram_candidates keeps the same candidates as the original pairwise filter"""
+
+import re
+
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from swisscom_ai.research_keyphrase.model.extractor import extract_candidates, unique_ngram_candidates
+from swisscom_ai.research_keyphrase.model.input_representation import InputTextObj
+
+# Words which are prefixes, suffixes or infixes of other words, non ASCII letters and non word characters
+WORDS = ['net', 'network', 'networks', 'work', 'neural', 'neur', 'ral', 'réseau', 'réseaux', 'eau', 'c', 'c++', '++',
+         'e-mail', 'mail', 'e', '3d', 'd', '.', 'x_y', 'y']
+
+
+def reference_unique_ngram_candidates(strings):
+    """Original implementation of @unique_ngram_candidates (one regex search per pair of strings)"""
+    results = []
+    for s in sorted(set(strings), key=len, reverse=True):
+        if not any(re.search(r'\b{}\b'.format(re.escape(s)), r) for r in results):
+            results.append(s)
+    return results
+
+
+phrases = st.lists(st.sampled_from(WORDS), min_size=1, max_size=4).map(' '.join)
+
+
+@settings(max_examples=500, deadline=None)
+@given(st.lists(phrases, max_size=30))
+def test_matches_pairwise_filter(strings):
+    assert unique_ngram_candidates(strings) == reference_unique_ngram_candidates(strings)
+
+
+@settings(max_examples=200, deadline=None)
+@given(st.lists(st.text(alphabet='ab é-+.', max_size=8), max_size=15))
+def test_matches_pairwise_filter_on_any_text(strings):
+    assert unique_ngram_candidates(strings) == reference_unique_ngram_candidates(strings)
+
+
+def test_words_inside_a_word_are_kept():
+    unique = unique_ngram_candidates(['network', 'net', 'neural network', 'work', 'network', 'neural network'])
+
+    # 'net' and 'work' are inside the word 'network', not words of a kept candidate
+    assert unique[0] == 'neural network'
+    assert sorted(unique) == ['net', 'neural network', 'work']
+    assert sorted(unique_ngram_candidates(['e-mail', 'mail', 'email'])) == ['e-mail', 'email']
+    assert unique_ngram_candidates([]) == []
+
+
+def test_extract_candidates_without_subset():
+    text_obj = InputTextObj([[('Neural', 'JJ'), ('networks', 'NNS'), ('and', 'CC'), ('networks', 'NNS'), ('of', 'IN'),
+                              ('net', 'NN'), ('.', '.')]], 'en')
+
+    assert sorted(extract_candidates(text_obj)) == ['net', 'networks', 'neural networks']
+    assert sorted(extract_candidates(text_obj, no_subset=True)) == ['net', 'neural networks']
@@ -0,0 +1,190 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""@KeyphraseHTTPServer and @MicroBatcher with a stub tagger and a stub embedding distributor"""
+
+import http.client
+import json
+import threading
+import time
+import zlib
+
+import numpy as np
+import pytest
+
+from swisscom_ai.research_keyphrase.embeddings.emb_distrib_interface import EmbeddingDistributor
+from swisscom_ai.research_keyphrase.embeddings.emb_distrib_preload import EmbeddingDistributorPreload
+from swisscom_ai.research_keyphrase.model.input_representation import InputTextObj
+from swisscom_ai.research_keyphrase.service.batching import MicroBatcher
+from swisscom_ai.research_keyphrase.service.http_service import KeyphraseHTTPServer, KeyphraseService
+
+TEXT = 'neural networks and the deep learning of graph models and the language models'
+
+
+class StubTagger:
+    """Tag 'and' and 'the' as DT and every other word as NN"""
+
+    def pos_tag_raw_text(self, text):
+        return [[(word, 'DT' if word in ('and', 'the') else 'NN') for word in text.split()]]
+
+
+class StubEmbeddingDistributor(EmbeddingDistributor):
+    """Deterministic vector per sentence, records the number of sentences of each call"""
+
+    def __init__(self, dim=16):
+        self.dim = dim
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get_tokenized_sents_embeddings(self, sents):
+        with self._lock:
+            self.calls.append(len(sents))
+        return np.array([np.random.RandomState(zlib.crc32(sent.encode('utf8'))).randn(self.dim)
+                         for sent in sents]).reshape(len(sents), self.dim)
+
+
+def text_obj(text=TEXT):
+    return InputTextObj(StubTagger().pos_tag_raw_text(text), 'en')
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(embedding_distrib, max_batch_size=32, max_wait=0.01, max_body_size=1024 * 1024):
+        service = KeyphraseService(embedding_distrib, StubTagger(), max_batch_size=max_batch_size, max_wait=max_wait)
+        server = KeyphraseHTTPServer(('127.0.0.1', 0), service, max_body_size=max_body_size)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+        server.service.close()
+
+
+def request(server, method, path, body=None, headers=None):
+    """
+    :return: tuple (status, decoded json answer)
+    """
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=10)
+    try:
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read().decode('utf8'))
+    finally:
+        connection.close()
+
+
+def test_health_and_ready_while_the_model_loads(serve):
+    loaded = threading.Event()
+    distributor = StubEmbeddingDistributor()
+    preload = EmbeddingDistributorPreload(lambda: loaded.wait() and distributor)
+    server = serve(preload)
+
+    assert request(server, 'GET', '/health') == (200, {'status': 'ok'})
+    assert request(server, 'GET', '/ready') == (503, {'status': 'not ready'})
+    assert request(server, 'POST', '/extract', {'text': TEXT})[0] == 503
+
+    loaded.set()
+    preload.wait(timeout=10)
+    assert request(server, 'GET', '/ready') == (200, {'status': 'ready'})
+    status, answer = request(server, 'POST', '/extract', {'text': TEXT, 'N': 2})
+    assert status == 200
+    assert len(answer['keyphrases']) == 2
+    assert set(answer['keyphrases']) <= {'neural networks', 'deep learning', 'graph models', 'language models'}
+    assert request(server, 'GET', '/unknown')[0] == 404
+
+
+@pytest.mark.parametrize('body', [
+    'not json',
+    [TEXT],
+    {'N': 10},
+    {'text': 42},
+    {'text': TEXT, 'N': 0},
+    {'text': TEXT, 'N': True},
+    {'text': TEXT, 'N': 2.5},
+    {'text': TEXT, 'lang': 'it'},
+    {'text': TEXT, 'beta': 1.5},
+    {'text': TEXT, 'beta': 'high'},
+    {'text': TEXT, 'alias_threshold': None},
+    '{"text": "neural networks", "alias_threshold": NaN}',
+])
+def test_invalid_requests_are_rejected(serve, body):
+    distributor = StubEmbeddingDistributor()
+    server = serve(distributor)
+
+    status, answer = request(server, 'POST', '/extract', body)
+    assert status == 400
+    assert 'error' in answer
+    assert distributor.calls == []
+
+
+def test_invalid_content_length(serve):
+    server = serve(StubEmbeddingDistributor(), max_body_size=100)
+
+    # A negative length must not block the handler waiting for the end of the connection
+    assert request(server, 'POST', '/extract', '{}', {'Content-Length': '-1'})[0] == 400
+    assert request(server, 'POST', '/extract', '{}', {'Content-Length': 'abc'})[0] == 400
+    assert request(server, 'POST', '/extract', {'text': TEXT * 2})[0] == 413
+    assert request(server, 'POST', '/extract', {'text': TEXT})[0] == 200
+
+
+def test_concurrent_requests_share_one_embedding_call(serve):
+    distributor = StubEmbeddingDistributor()
+    server = serve(distributor, max_batch_size=8, max_wait=1)
+    texts = [TEXT + ' topic{}'.format(i) for i in range(8)]
+    answers = [None] * len(texts)
+
+    def post(i):
+        answers[i] = request(server, 'POST', '/extract', {'text': texts[i], 'N': 3})
+
+    threads = [threading.Thread(target=post, args=(i,)) for i in range(len(texts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(status == 200 and len(answer['keyphrases']) == 3 for status, answer in answers)
+    assert len(distributor.calls) == 1
+    assert server.service.batcher.nb_batches == 1
+    assert server.service.batcher.nb_requests == len(texts)
+
+
+def test_batches_respect_max_batch_size():
+    distributor = StubEmbeddingDistributor()
+    batcher = MicroBatcher(distributor, max_batch_size=4, max_wait=1)
+    try:
+        futures = [batcher.submit(text_obj(TEXT + ' topic{}'.format(i)), 2) for i in range(10)]
+        results = [future.result(timeout=10) for future in futures]
+    finally:
+        batcher.close()
+
+    assert all(len(keyphrases) == 2 for keyphrases, relevance, aliases in results)
+    assert batcher.nb_batches == 3
+    assert len(distributor.calls) == 3
+
+
+def test_batches_respect_max_wait():
+    batcher = MicroBatcher(StubEmbeddingDistributor(), max_batch_size=2, max_wait=0.3)
+    try:
+        # A single request waits max_wait for other requests
+        start = time.time()
+        batcher.submit(text_obj(), 2).result(timeout=10)
+        assert 0.25 <= time.time() - start < 5
+
+        # A full batch is processed without waiting
+        batcher.max_wait = 30
+        start = time.time()
+        futures = [batcher.submit(text_obj(), 2) for _ in range(2)]
+        for future in futures:
+            future.result(timeout=10)
+        assert time.time() - start < 5
+    finally:
+        batcher.close()
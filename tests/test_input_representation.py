@@ -0,0 +1,106 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""The flat @InputTextObj exposes the same views as the original list of list of tuple implementation"""
+
+import pickle
+
+from hypothesis import given, settings
+from hypothesis import strategies as st
+from nltk.stem import PorterStemmer
+
+from swisscom_ai.research_keyphrase.model import input_representation
+from swisscom_ai.research_keyphrase.model.input_representation import InputTextObj, convert
+from swisscom_ai.research_keyphrase.model.methods_embeddings import extract_tokenized_doc_text
+
+TAGS = ['NN', 'NNS', 'NNP', 'NNPS', 'JJ', 'VB', 'DT', 'NC', 'NE', 'NPP', 'ADJA', 'ADJ', 'NOUN', 'ADV', '.']
+
+
+def reference_views(pos_tagged, lang, stem=False, min_word_len=3):
+    """
+    Original constructor of InputTextObj (before the flat arrays)
+
+    :return: tuple (pos_tagged, filtered_pos_tagged, candidates, filtered document text)
+    """
+    considered_tags = {'NN', 'NNS', 'NNP', 'NNPS', 'JJ'}
+    if stem:
+        stemmer = PorterStemmer()
+        pos_tagged = [[(stemmer.stem(t[0]), t[1]) for t in sent] for sent in pos_tagged]
+    else:
+        pos_tagged = [[(t[0].lower(), t[1]) for t in sent] for sent in pos_tagged]
+    pos_tagged = [[(word, 'LESS') if len(word) < min_word_len else (word, tag) for word, tag in sent]
+                  for sent in pos_tagged]
+    if lang in ['fr', 'de']:
+        pos_tagged = [[(word, convert(tag)) for word, tag in sent] for sent in pos_tagged]
+    filtered_pos_tagged = [[(t[0].lower(), t[1]) for t in sent if t[1] in considered_tags] for sent in pos_tagged]
+    candidates = {word.lower() for sent in pos_tagged for word, tag in sent
+                  if tag in considered_tags and len(word) >= min_word_len}
+    filtered_text = ' '.join(word.lower() for sent in filtered_pos_tagged for word, tag in sent)
+    return pos_tagged, filtered_pos_tagged, candidates, filtered_text
+
+
+# Words of 1 to 8 letters (the ones shorter than min_word_len are tagged 'LESS'), some capitalized
+words = st.text(alphabet='abcdeNRSingYé', min_size=1, max_size=8)
+tagged_docs = st.lists(st.lists(st.tuples(words, st.sampled_from(TAGS)), max_size=12), max_size=5)
+
+
+@settings(max_examples=300, deadline=None)
+@given(tagged_docs, st.sampled_from(['en', 'de', 'fr']), st.booleans(), st.integers(min_value=1, max_value=4))
+def test_views_match_original(pos_tagged, lang, stem, min_word_len):
+    text_obj = InputTextObj(pos_tagged, lang, stem=stem, min_word_len=min_word_len)
+    expected_pos_tagged, expected_filtered, expected_candidates, expected_text = reference_views(
+        pos_tagged, lang, stem, min_word_len)
+
+    assert text_obj.pos_tagged == expected_pos_tagged
+    assert text_obj.filtered_pos_tagged == expected_filtered
+    assert text_obj.extract_candidates() == expected_candidates
+    assert extract_tokenized_doc_text(text_obj, use_filtered=True) == expected_text
+
+
+def test_short_tokens_are_tagged_less():
+    text_obj = InputTextObj([[('An', 'DT'), ('ox', 'NN'), ('Network', 'NN')]], 'en')
+
+    assert text_obj.pos_tagged == [[('an', 'LESS'), ('ox', 'LESS'), ('network', 'NN')]]
+    assert text_obj.filtered_pos_tagged == [[('network', 'NN')]]
+
+
+def test_assign_pos_tagged_rebuilds_arrays():
+    text_obj = InputTextObj([[('first', 'NN')]], 'en')
+    text_obj.pos_tagged = [[('Neural', 'JJ'), ('networks', 'NNS')], [('run', 'VB')]]
+
+    assert text_obj.pos_tagged == [[('Neural', 'JJ'), ('networks', 'NNS')], [('run', 'VB')]]
+    assert text_obj.filtered_pos_tagged == [[('neural', 'JJ'), ('networks', 'NNS')], []]
+    assert text_obj.extract_candidates() == {'neural', 'networks'}
+    assert list(text_obj.sentence_spans()) == [(0, 2), (2, 3)]
+    assert extract_tokenized_doc_text(text_obj) == 'neural networks run'
+
+
+def test_assign_filtered_pos_tagged():
+    text_obj = InputTextObj([[('neural', 'JJ'), ('networks', 'NNS')]], 'en')
+    text_obj.filtered_pos_tagged = [[('Networks', 'NNS')]]
+
+    assert text_obj.filtered_pos_tagged == [[('Networks', 'NNS')]]
+    assert extract_tokenized_doc_text(text_obj, use_filtered=True) == 'networks'
+    assert extract_tokenized_doc_text(text_obj) == 'neural networks'
+    assert pickle.loads(pickle.dumps(text_obj)).filtered_pos_tagged == [[('Networks', 'NNS')]]
+
+
+def test_pickle_into_fresh_registry(monkeypatch):
+    text_obj = InputTextObj([[('Deutsche', 'ADJA'), ('Bahn', 'NE'), ('fährt', 'VVFIN')]], 'de', stem=True)
+    data = pickle.dumps(text_obj)
+    expected_pos_tagged = text_obj.pos_tagged
+    expected_candidates = text_obj.extract_candidates()
+    expected_text = extract_tokenized_doc_text(text_obj)
+
+    # Another process registers the tags in another order
+    monkeypatch.setattr(input_representation, 'TAGS', [])
+    monkeypatch.setattr(input_representation, 'TAG_IDS', {})
+    for tag in ['VVFIN', 'XX', 'NN', 'LESS', 'JJ']:
+        input_representation.get_tag_id(tag)
+
+    loaded = pickle.loads(data)
+    assert loaded.pos_tagged == expected_pos_tagged
+    assert loaded.extract_candidates() == expected_candidates == {'deutsch', 'bahn'}
+    assert extract_tokenized_doc_text(loaded) == expected_text
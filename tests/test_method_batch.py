@@ -0,0 +1,122 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""The vectorized MMR selects the same keyphrases as @MMRPhraseBatch, with the same relevance up to float32 precision"""
+
+import numpy as np
+import pytest
+
+from swisscom_ai.research_keyphrase.embeddings.emb_distrib_interface import EmbeddingDistributor
+from swisscom_ai.research_keyphrase.model.input_representation import InputTextObj
+from swisscom_ai.research_keyphrase.model.method import MMRPhraseBatch
+from swisscom_ai.research_keyphrase.model.method_batch import (MMRBatchVectorized, MMRPhraseBatchVectorized,
+                                                               _column_normalization)
+from swisscom_ai.research_keyphrase.model.methods_embeddings import extract_candidates_embedding_for_docs
+
+# Documents with one or two candidates have NaN normalized similarities, some documents have no candidate
+pytestmark = [pytest.mark.filterwarnings('ignore::RuntimeWarning'),
+              pytest.mark.filterwarnings('ignore:No keyphrase extracted')]
+
+# float32 similarities, the relevance is divided by the highest selected similarity which can be close to 0
+RTOL = 1e-4
+ATOL = 1e-5
+
+
+class RandomEmbeddingDistributor(EmbeddingDistributor):
+    """Stub giving each sentence a fixed random vector"""
+
+    def __init__(self, dim=32, seed=0):
+        self.dim = dim
+        self.rng = np.random.RandomState(seed)
+        self.vectors = {}
+
+    def get_tokenized_sents_embeddings(self, sents):
+        for sent in sents:
+            if sent not in self.vectors:
+                self.vectors[sent] = self.rng.randn(self.dim)
+        return np.array([self.vectors[sent] for sent in sents]).reshape(len(sents), self.dim)
+
+
+def tagged_doc(nb_candidates, rng):
+    """
+    :return: one sentence alternating distinct nouns (the candidates) and verbs
+    """
+    sent = []
+    for _ in range(nb_candidates):
+        sent += [('noun{}'.format(rng.randint(10 ** 6)), 'NN'), ('verb', 'VBZ')]
+    return [sent + [('.', '.')]]
+
+
+def text_objs(sizes, seed=0):
+    rng = np.random.RandomState(seed)
+    return [InputTextObj(tagged_doc(size, rng), 'en') for size in sizes]
+
+
+def assert_same_results(results, expected):
+    assert len(results) == len(expected)
+    for (keyphrases, relevance, aliases), (expected_keyphrases, expected_relevance, expected_aliases) in \
+            zip(results, expected):
+        assert keyphrases == expected_keyphrases
+        if expected_relevance is None:
+            assert relevance is None
+        else:
+            np.testing.assert_allclose(relevance, expected_relevance, rtol=RTOL, atol=ATOL)
+        assert aliases == expected_aliases
+
+
+@pytest.mark.parametrize('sizes', [
+    [1, 2, 30],
+    [2, 1, 1, 2, 3, 15, 60, 2],
+    [1],
+    [2, 2],
+    [0, 1, 5, 0, 2],
+])
+@pytest.mark.parametrize('max_elements', [2 ** 18, 100])
+@pytest.mark.parametrize('N', [1, 3, 10])
+def test_vectorized_matches_batch(sizes, max_elements, N):
+    embedding_distrib = RandomEmbeddingDistributor()
+    docs = text_objs(sizes)
+    expected = MMRPhraseBatch(embedding_distrib, docs, N=N)
+    results = MMRPhraseBatchVectorized(embedding_distrib, docs, N=N, max_elements=max_elements)
+    assert_same_results(results, expected)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_vectorized_matches_batch_random_sizes(seed):
+    rng = np.random.RandomState(seed)
+    sizes = rng.choice([1, 2, 3, 8, 40], size=20).tolist()
+    embedding_distrib = RandomEmbeddingDistributor(seed=seed)
+    docs = text_objs(sizes, seed)
+    beta = rng.uniform()
+    expected = MMRPhraseBatch(embedding_distrib, docs, beta=beta, N=10, alias_threshold=0.3)
+    results = MMRPhraseBatchVectorized(embedding_distrib, docs, beta=beta, N=10, alias_threshold=0.3,
+                                       max_elements=rng.choice([50, 2 ** 18]))
+    assert_same_results(results, expected)
+
+
+def test_mmr_step_on_embedded_documents():
+    embedding_distrib = RandomEmbeddingDistributor()
+    docs = text_objs([3, 0, 12, 1])
+    embeddings_per_doc = extract_candidates_embedding_for_docs(embedding_distrib, docs, True)
+    assert_same_results(MMRBatchVectorized(embeddings_per_doc, N=5),
+                        MMRPhraseBatchVectorized(embedding_distrib, docs, N=5))
+
+
+@pytest.mark.parametrize('sizes', [[1, 2, 3], [7, 30, 30], [2, 40]])
+def test_column_normalization_matches_nan_reductions(sizes):
+    rng = np.random.RandomState(len(sizes))
+    max_size = max(sizes)
+    sim_between = rng.uniform(-1, 1, size=(len(sizes), max_size, max_size)).astype(np.float32)
+    valid = np.arange(max_size) < np.array(sizes)[:, None]
+    pairs = valid[:, :, None] & valid[:, None, :]
+    pairs[:, np.arange(max_size), np.arange(max_size)] = False
+
+    expected = np.where(pairs, sim_between, np.nan)
+    expected = expected / np.nanmax(expected, axis=1, keepdims=True)
+    expected = 0.5 + (expected - np.nanmean(expected, axis=1, keepdims=True)) / np.nanstd(expected, axis=1,
+                                                                                          keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        normalized = _column_normalization(sim_between, pairs, np.array(sizes) - 1)
+    np.testing.assert_allclose(normalized, expected, rtol=RTOL, atol=ATOL)
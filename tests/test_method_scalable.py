@@ -0,0 +1,117 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Without pruning, @MMRPhraseScalable selects the same keyphrases as @MMRPhrase, with the same relevance up to float32
+precision"""
+
+import numpy as np
+import pytest
+
+from swisscom_ai.research_keyphrase.embeddings.emb_distrib_interface import EmbeddingDistributor
+from swisscom_ai.research_keyphrase.model.input_representation import InputTextObj
+from swisscom_ai.research_keyphrase.model.method import _MMR
+from swisscom_ai.research_keyphrase.model.method_scalable import _MMR_scalable, compare_rankings, \
+    scalable_mmr_report
+from swisscom_ai.research_keyphrase.model.methods_embeddings import extract_candidates_embedding_for_doc, \
+    extract_doc_embedding
+from swisscom_ai.research_keyphrase.model.similarity import blocked_column_stats, normalize_rows
+
+RTOL = 1e-4
+ATOL = 1e-5
+
+
+class RandomEmbeddingDistributor(EmbeddingDistributor):
+    """Stub giving each sentence a fixed random vector"""
+
+    def __init__(self, dim=32, seed=0):
+        self.dim = dim
+        self.rng = np.random.RandomState(seed)
+        self.vectors = {}
+
+    def get_tokenized_sents_embeddings(self, sents):
+        for sent in sents:
+            if sent not in self.vectors:
+                self.vectors[sent] = self.rng.randn(self.dim)
+        return np.array([self.vectors[sent] for sent in sents]).reshape(len(sents), self.dim)
+
+
+def text_obj(nb_candidates, seed=0):
+    """
+    :return: one sentence alternating distinct nouns (the candidates) and verbs
+    """
+    rng = np.random.RandomState(seed)
+    sent = []
+    for _ in range(nb_candidates):
+        sent += [('noun{}'.format(rng.randint(10 ** 6)), 'NN'), ('verb', 'VBZ')]
+    return InputTextObj([sent + [('.', '.')]], 'en')
+
+
+def embedded_doc(nb_candidates, seed=0):
+    embedding_distrib = RandomEmbeddingDistributor(seed=seed)
+    doc = text_obj(nb_candidates, seed)
+    candidates, X = extract_candidates_embedding_for_doc(embedding_distrib, doc)
+    return embedding_distrib, doc, candidates, X, extract_doc_embedding(embedding_distrib, doc, True)
+
+
+@pytest.mark.parametrize('nb_candidates', [3, 20, 150])
+@pytest.mark.parametrize('block_size', [1, 7, 1024])
+@pytest.mark.parametrize('N', [1, 5, 10])
+def test_without_pruning_matches_mmr(nb_candidates, block_size, N):
+    embedding_distrib, doc, candidates, X, doc_embedd = embedded_doc(nb_candidates, seed=nb_candidates)
+
+    expected = _MMR(embedding_distrib, doc, candidates, X, 0.65, N, True, 0.3, doc_embedd=doc_embedd)
+    keyphrases, relevance, aliases = _MMR_scalable(embedding_distrib, doc, candidates, X, 0.65, N, True, 0.3,
+                                                   doc_embedd=doc_embedd, max_candidates=None, block_size=block_size)
+
+    assert keyphrases == expected[0]
+    np.testing.assert_allclose(relevance, expected[1], rtol=RTOL, atol=ATOL)
+    assert aliases == expected[2]
+
+
+@pytest.mark.parametrize('max_candidates', [5, 20])
+def test_pruning_keeps_the_candidates_closest_to_the_document(max_candidates):
+    embedding_distrib, doc, candidates, X, doc_embedd = embedded_doc(60)
+
+    keyphrases = _MMR_scalable(embedding_distrib, doc, candidates, X, 0.65, 10, True, 0.8, doc_embedd=doc_embedd,
+                               max_candidates=max_candidates)[0]
+
+    doc_sim = np.dot(normalize_rows(X), normalize_rows(doc_embedd.reshape(1, -1))[0])
+    closest = set(candidates[np.argsort(-doc_sim)[:max_candidates]])
+    assert len(keyphrases) == min(10, max_candidates)
+    assert set(keyphrases) <= closest
+
+
+@pytest.mark.parametrize('nb_candidates', [2, 9, 100])
+@pytest.mark.parametrize('block_size', [1, 4, 1024])
+@pytest.mark.parametrize('dtype', [np.float32, np.float64])
+def test_blocked_column_stats_match_nan_reductions(nb_candidates, block_size, dtype):
+    X_normalized = normalize_rows(np.random.RandomState(nb_candidates).randn(nb_candidates, 16), dtype)
+
+    sim_between = np.dot(X_normalized, X_normalized.T)
+    np.fill_diagonal(sim_between, np.nan)
+    col_max = np.nanmax(sim_between, axis=0)
+    sim_between /= col_max
+
+    stats = blocked_column_stats(X_normalized, block_size)
+    assert all(stat.dtype == dtype for stat in stats)
+    for stat, expected in zip(stats, [col_max, np.nanmean(sim_between, axis=0), np.nanstd(sim_between, axis=0)]):
+        np.testing.assert_allclose(stat, expected, rtol=RTOL, atol=ATOL)
+
+
+def test_compare_rankings():
+    assert compare_rankings(['a', 'b', 'c'], ['a', 'b', 'c']) == {'overlap': 1, 'same_rank': 1,
+                                                                  'first_difference': None}
+    assert compare_rankings(['a', 'b', 'c', 'd'], ['a', 'c', 'b']) == {'overlap': 0.75, 'same_rank': 0.25,
+                                                                       'first_difference': 1}
+    assert compare_rankings(None, None) == {'overlap': 0, 'same_rank': 0, 'first_difference': None}
+
+
+def test_report_without_pruning():
+    report = scalable_mmr_report(RandomEmbeddingDistributor(), text_obj(40), N=10)
+
+    assert report['nb_candidates'] == 40
+    assert (report['overlap'], report['same_rank'], report['first_difference']) == (1, 1, None)
+    assert report['exact_time'] >= 0 and report['scalable_time'] >= 0
+    assert scalable_mmr_report(RandomEmbeddingDistributor(), text_obj(0)) is None
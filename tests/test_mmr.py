@@ -0,0 +1,117 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Equivalence of the incremental MMR selection with the original loop rebuilding the selected/unselected
+sub-matrices of the full similarity matrix at each step"""
+
+import warnings
+
+import numpy as np
+from hypothesis import given, settings, strategies as st
+from hypothesis.extra.numpy import arrays
+
+from swisscom_ai.research_keyphrase.model.method import _MMR, _MMR_selection, max_normalization
+from swisscom_ai.research_keyphrase.model.similarity import cosine_similarity
+
+
+def reference_mmr(candidates, X, doc_embedd, beta, N, alias_threshold):
+    """Original implementation of @_MMR"""
+    N = min(N, len(candidates))
+    doc_sim = cosine_similarity(X, doc_embedd.reshape(1, -1))
+
+    doc_sim_norm = doc_sim/np.max(doc_sim)
+    doc_sim_norm = 0.5 + (doc_sim_norm - np.average(doc_sim_norm)) / np.std(doc_sim_norm)
+
+    sim_between = cosine_similarity(X)
+    np.fill_diagonal(sim_between, np.nan)
+
+    sim_between_norm = sim_between/np.nanmax(sim_between, axis=0)
+    sim_between_norm = \
+        0.5 + (sim_between_norm - np.nanmean(sim_between_norm, axis=0)) / np.nanstd(sim_between_norm, axis=0)
+
+    selected_candidates = reference_selection(doc_sim, doc_sim_norm, sim_between_norm, beta, N)
+
+    relevance_list = max_normalization(doc_sim[selected_candidates]).tolist()
+    kp_sim_between = np.nan_to_num(sim_between[selected_candidates, :])
+    aliases_list = [[candidates[i] for i in np.flatnonzero(kp_sim >= alias_threshold)] for kp_sim in kp_sim_between]
+    return candidates[selected_candidates].tolist(), relevance_list, aliases_list
+
+
+def reference_selection(doc_sim, doc_sim_norm, sim_between_norm, beta, N):
+    """Original selection loop of @_MMR"""
+    selected_candidates = []
+    unselected_candidates = [c for c in range(doc_sim.shape[0])]
+
+    j = np.argmax(doc_sim)
+    selected_candidates.append(j)
+    unselected_candidates.remove(j)
+
+    for _ in range(N - 1):
+        selec_array = np.array(selected_candidates)
+        unselec_array = np.array(unselected_candidates)
+
+        distance_to_doc = doc_sim_norm[unselec_array, :]
+        dist_between = sim_between_norm[unselec_array][:, selec_array]
+        if dist_between.ndim == 1:
+            dist_between = dist_between[:, np.newaxis]
+        j = np.argmax(beta * distance_to_doc - (1 - beta) * np.max(dist_between, axis=1).reshape(-1, 1))
+        item_idx = unselected_candidates[j]
+        selected_candidates.append(item_idx)
+        unselected_candidates.remove(item_idx)
+    return selected_candidates
+
+
+@st.composite
+def mmr_inputs(draw):
+    """Small integer embeddings (many ties), some rows duplicated, N up to more than the number of candidates"""
+    nb_candidates = draw(st.integers(1, 25))
+    dim = draw(st.integers(2, 6))
+    X = draw(arrays(np.float64, (nb_candidates, dim), elements=st.integers(-3, 3).map(float)))
+    duplicates = draw(st.lists(st.tuples(st.integers(0, nb_candidates - 1), st.integers(0, nb_candidates - 1)),
+                               max_size=nb_candidates))
+    for source, target in duplicates:
+        X[target] = X[source]
+    X[~X.any(axis=1)] = 1.0  # Unknown (zero) candidates are removed before MMR
+    doc_embedd = draw(arrays(np.float64, (1, dim), elements=st.integers(-3, 3).map(float)))
+    beta = draw(st.sampled_from([0.0, 0.3, 0.55, 0.65, 1.0]) | st.floats(0, 1))
+    N = draw(st.integers(1, nb_candidates + 5))
+    return X, doc_embedd, beta, N
+
+
+@settings(max_examples=500, deadline=None)
+@given(mmr_inputs())
+def test_mmr_selection_matches_full_matrix_loop(inputs):
+    X, doc_embedd, beta, N = inputs
+    N = min(N, X.shape[0])
+    with warnings.catch_warnings(), np.errstate(all='ignore'):
+        warnings.simplefilter('ignore')
+        doc_sim = cosine_similarity(X, doc_embedd)
+        doc_sim_norm = doc_sim / np.max(doc_sim)
+        doc_sim_norm = 0.5 + (doc_sim_norm - np.average(doc_sim_norm)) / np.std(doc_sim_norm)
+        sim_between = cosine_similarity(X)
+        np.fill_diagonal(sim_between, np.nan)
+        sim_between_norm = sim_between / np.nanmax(sim_between, axis=0)
+        sim_between_norm = \
+            0.5 + (sim_between_norm - np.nanmean(sim_between_norm, axis=0)) / np.nanstd(sim_between_norm, axis=0)
+
+        expected = reference_selection(doc_sim, doc_sim_norm, sim_between_norm, beta, N)
+        selected = _MMR_selection(doc_sim, doc_sim_norm, lambda j: sim_between_norm[:, j], beta, N)
+    assert selected == expected
+
+
+@settings(max_examples=500, deadline=None)
+@given(mmr_inputs())
+def test_mmr_matches_original_implementation(inputs):
+    X, doc_embedd, beta, N = inputs
+    candidates = np.array(['candidate {}'.format(i) for i in range(X.shape[0])])
+    with warnings.catch_warnings(), np.errstate(all='ignore'):
+        warnings.simplefilter('ignore')
+        expected = reference_mmr(candidates, X, doc_embedd, beta, N, 0.8)
+        keyphrases, relevance, aliases = _MMR(None, None, candidates, X, beta, N, True, 0.8, doc_embedd=doc_embedd)
+
+    assert keyphrases == expected[0]
+    np.testing.assert_array_equal(relevance, expected[1])
+    # The aliases are the same, their order among equal similarities is not (see @get_aliases)
+    assert [sorted(kp_aliases) for kp_aliases in aliases] == [sorted(kp_aliases) for kp_aliases in expected[2]]
@@ -0,0 +1,70 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""@PosTaggingCoreNLPAsync against a local stub of the CoreNLP server (see conftest.py)"""
+
+import asyncio
+import threading
+
+import pytest
+
+from swisscom_ai.research_keyphrase.preprocessing.postagging_async import PosTaggingCoreNLPAsync
+
+
+def test_pos_tag_many_keeps_order_and_reuses_connections(corenlp_server):
+    tagger = PosTaggingCoreNLPAsync('127.0.0.1', corenlp_server.server_address[1], max_in_flight=4)
+    texts = ['document{} word{}'.format(i, i) for i in range(40)]
+
+    tagged_texts = tagger.pos_tag_raw_texts(texts)
+    assert tagged_texts == [[[(word, 'NN') for word in text.split()]] for text in texts]
+    assert corenlp_server.nb_requests == 40
+    assert corenlp_server.nb_connections <= 4
+    assert 1 < corenlp_server.peak_in_flight <= 4
+
+    # The idle keep-alive connections are reused by the next calls
+    nb_connections = corenlp_server.nb_connections
+    assert tagger.pos_tag_raw_text('one more', as_tuple_list=False) == 'one|NN more|NN'
+    assert tagger.pos_tag_raw_texts(texts[:4]) == tagged_texts[:4]
+    assert corenlp_server.nb_connections == nb_connections
+    tagger.close()
+
+
+def test_coroutines_run_on_the_caller_loop(corenlp_server):
+    tagger = PosTaggingCoreNLPAsync('127.0.0.1', corenlp_server.server_address[1], max_in_flight=2)
+
+    async def tag():
+        with pytest.raises(RuntimeError):
+            tagger.pos_tag_raw_text('blocking call')
+        return await tagger.pos_tag_many(['a b', 'c'])
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(tag()) == [[[('a', 'NN'), ('b', 'NN')]], [[('c', 'NN')]]]
+        assert loop.run_until_complete(tagger.pos_tag_many(['text {}'.format(i) for i in range(20)])) == \
+            [[[('text', 'NN'), (str(i), 'NN')]] for i in range(20)]
+        assert corenlp_server.peak_in_flight <= 2
+    finally:
+        tagger.close()
+        loop.close()
+
+
+def test_blocking_calls_from_several_threads(corenlp_server):
+    tagger = PosTaggingCoreNLPAsync('127.0.0.1', corenlp_server.server_address[1], max_in_flight=2)
+    results = {}
+
+    def tag(thread_idx):
+        results[thread_idx] = tagger.pos_tag_raw_texts(['thread{} text{}'.format(thread_idx, i) for i in range(5)])
+
+    threads = [threading.Thread(target=tag, args=(thread_idx,)) for thread_idx in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    tagger.close()
+    # The limit applies to the private event loop of each thread
+    assert corenlp_server.peak_in_flight <= 2 * 3
+    for thread_idx in range(3):
+        assert results[thread_idx] == [[[('thread{}'.format(thread_idx), 'NN'), ('text{}'.format(i), 'NN')]]
+                                       for i in range(5)]
@@ -0,0 +1,179 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""@PosTaggingCache with a stub tagger : keys, persistence, corrupted entries and size eviction"""
+
+import os
+
+import pytest
+
+from swisscom_ai.research_keyphrase.preprocessing.postagging import PosTagging
+from swisscom_ai.research_keyphrase.preprocessing.postagging_cache import PosTaggingCache, deserialize_tagged_text, \
+    serialize_tagged_text
+
+TEXTS = ['Neural networks learn. Graphs too.', 'Réseaux de neurones 😀', 'a|b c', '']
+
+
+class StubTagger(PosTagging):
+    """One sentence per '.', every word tagged with the configuration, records the texts of each call"""
+
+    def __init__(self, config='stub-1', batch=False):
+        self.config = config
+        self.calls = []
+        if batch:
+            self.pos_tag_raw_texts = self._pos_tag_raw_texts
+
+    def configuration_id(self):
+        return self.config
+
+    def pos_tag_raw_text(self, text, as_tuple_list=True):
+        assert as_tuple_list
+        self.calls.append([text])
+        return self._tag(text)
+
+    def _pos_tag_raw_texts(self, texts, as_tuple_list=True):
+        assert as_tuple_list
+        self.calls.append(list(texts))
+        return [self._tag(text) for text in texts]
+
+    def _tag(self, text):
+        return [[(word, self.config) for word in sent.split()] for sent in text.split('.')]
+
+
+def entry_paths(cache_dir):
+    return sorted(os.path.join(root, filename) for root, _, filenames in os.walk(str(cache_dir))
+                  for filename in filenames)
+
+
+def test_hits_do_not_call_the_tagger(tmp_path):
+    tagger = StubTagger()
+    cache = PosTaggingCache(tagger, str(tmp_path))
+
+    expected = [tagger._tag(text) for text in TEXTS]
+    assert [cache.pos_tag_raw_text(text) for text in TEXTS] == expected
+    assert [cache.pos_tag_raw_text(text) for text in TEXTS] == expected
+    assert cache.pos_tag_raw_text(TEXTS[2], as_tuple_list=False) == 'a|b|stub-1 c|stub-1'
+    assert tagger.calls == [[text] for text in TEXTS]
+    assert (cache.hits, cache.misses, len(cache)) == (5, 4, 4)
+    assert cache.size == sum(os.path.getsize(path) for path in entry_paths(tmp_path))
+
+    # The entries are reused by another cache on the same directory
+    other_tagger = StubTagger()
+    other = PosTaggingCache(other_tagger, str(tmp_path))
+    assert len(other) == 4 and other.size == cache.size
+    assert [other.pos_tag_raw_text(text) for text in TEXTS] == expected
+    assert other_tagger.calls == []
+
+
+def test_key(tmp_path):
+    cache = PosTaggingCache(StubTagger(), str(tmp_path))
+    key = cache._key(TEXTS[0])
+
+    assert key == PosTaggingCache(StubTagger(), str(tmp_path))._key(TEXTS[0])
+    assert len({key, cache._key(TEXTS[1]), PosTaggingCache(StubTagger('stub-2'), str(tmp_path))._key(TEXTS[0]),
+                PosTaggingCache(StubTagger(), str(tmp_path), lang='de')._key(TEXTS[0]),
+                PosTaggingCache(StubTagger(), str(tmp_path), tagger_id='other')._key(TEXTS[0])}) == 5
+    # Lone surrogates (e.g. read from a badly decoded file) are accepted
+    assert cache._key('\ud83d') != cache._key('\ud83e')
+
+
+def test_changed_configuration_is_a_miss(tmp_path):
+    PosTaggingCache(StubTagger('model-1'), str(tmp_path)).pos_tag_raw_text(TEXTS[0])
+
+    tagger = StubTagger('model-2')
+    cache = PosTaggingCache(tagger, str(tmp_path))
+    assert cache.pos_tag_raw_text(TEXTS[0]) == tagger._tag(TEXTS[0])
+    assert tagger.calls == [[TEXTS[0]]]
+    assert (cache.hits, cache.misses, len(cache)) == (0, 1, 2)
+
+
+def test_tagger_id_required_without_configuration(tmp_path):
+    tagger = StubTagger(config=None)
+    with pytest.raises(ValueError):
+        PosTaggingCache(tagger, str(tmp_path))
+    assert PosTaggingCache(tagger, str(tmp_path), tagger_id='stub').configuration_id() == 'stub'
+
+
+@pytest.mark.parametrize('corrupt', [lambda data: data[:len(data) // 2], lambda data: b'not zlib', lambda data: b''])
+def test_corrupted_entry_is_a_miss(tmp_path, corrupt):
+    tagger = StubTagger()
+    cache = PosTaggingCache(tagger, str(tmp_path))
+    cache.pos_tag_raw_text(TEXTS[0])
+    path, = entry_paths(tmp_path)
+    with open(path, 'rb') as entry_file:
+        data = entry_file.read()
+    with open(path, 'wb') as entry_file:
+        entry_file.write(corrupt(data))
+
+    assert cache.pos_tag_raw_text(TEXTS[0]) == tagger._tag(TEXTS[0])
+    assert len(tagger.calls) == 2
+    assert (cache.hits, cache.misses) == (0, 2)
+    # The entry is rewritten
+    with open(path, 'rb') as entry_file:
+        assert entry_file.read() == data
+    assert cache.pos_tag_raw_text(TEXTS[0]) == tagger._tag(TEXTS[0])
+    assert (cache.hits, len(tagger.calls)) == (1, 2)
+
+
+def test_entry_removed_by_another_process(tmp_path):
+    cache = PosTaggingCache(StubTagger(), str(tmp_path))
+    cache.pos_tag_raw_text(TEXTS[0])
+    os.remove(entry_paths(tmp_path)[0])
+
+    cache.pos_tag_raw_text(TEXTS[0])
+    assert (cache.hits, cache.misses, len(cache)) == (0, 2, 1)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    tagger = StubTagger()
+    texts = ['text number {}'.format(i) for i in range(6)]
+    cache = PosTaggingCache(tagger, str(tmp_path))
+    cache.pos_tag_raw_text(texts[0])
+    entry_size = cache.size
+    cache.clear()
+    assert (len(cache), cache.size, entry_paths(tmp_path)) == (0, 0, [])
+
+    cache = PosTaggingCache(tagger, str(tmp_path), max_size=3 * entry_size)
+    for text in texts[:3]:
+        cache.pos_tag_raw_text(text)
+    cache.pos_tag_raw_text(texts[0])  # texts[1] is now the least recently used
+    cache.pos_tag_raw_text(texts[3])
+    assert (cache.evictions, len(cache), cache.size) == (1, 3, 3 * entry_size)
+    assert len(entry_paths(tmp_path)) == 3
+
+    tagger.calls = []
+    for text in [texts[0], texts[2], texts[3], texts[1]]:
+        cache.pos_tag_raw_text(text)
+    assert tagger.calls == [[texts[1]]]
+    assert cache.cache_info() == {'hits': 4, 'misses': 5, 'evictions': 2, 'entries': 3, 'size': 3 * entry_size,
+                                  'max_size': 3 * entry_size}
+
+    # A smaller cache on the same directory evicts the entries above its size when it is created
+    smaller = PosTaggingCache(tagger, str(tmp_path), max_size=entry_size)
+    assert (smaller.evictions, len(smaller)) == (2, 1)
+    assert len(entry_paths(tmp_path)) == 1
+
+
+@pytest.mark.parametrize('batch', [False, True])
+def test_pos_tag_raw_texts(tmp_path, batch):
+    tagger = StubTagger(batch=batch)
+    cache = PosTaggingCache(tagger, str(tmp_path))
+    cache.pos_tag_raw_text(TEXTS[1])
+    tagger.calls = []
+
+    texts = [TEXTS[0], TEXTS[1], TEXTS[0], TEXTS[2]]
+    assert cache.pos_tag_raw_texts(texts) == [tagger._tag(text) for text in texts]
+    # The missing texts are tagged once, together if the tagger can tag several texts
+    assert tagger.calls == ([[TEXTS[0], TEXTS[2]]] if batch else [[TEXTS[0]], [TEXTS[2]]])
+    assert (cache.hits, cache.misses) == (1, 4)
+    assert cache.pos_tag_raw_texts(texts, as_tuple_list=False) == \
+        [cache.pos_tag_raw_text(text, as_tuple_list=False) for text in texts]
+
+
+def test_serialization():
+    tagged_text = [[('Neural', 'JJ'), ('a|b', 'NN'), ('', '')], [], [('😀', 'SYM')]]
+
+    assert deserialize_tagged_text(serialize_tagged_text(tagged_text)) == tagged_text
+    assert deserialize_tagged_text(serialize_tagged_text([])) == []
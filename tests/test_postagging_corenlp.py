@@ -0,0 +1,69 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""Packed multi-document mode of @PosTaggingCoreNLP against a local stub of the CoreNLP server (see conftest.py)"""
+
+import pytest
+
+from swisscom_ai.research_keyphrase.preprocessing.postagging import PACKED_TEXT_BOUNDARY, PosTaggingCoreNLP, _pack_texts
+
+TEXTS = [
+    'Neural networks learn representations. They are trained with gradient descent.',
+    'Emojis 😀 and math letters 𝔘𝔫𝔦𝔠𝔬𝔡𝔢 are outside the BMP 🚀. Offsets count UTF-16 units.',
+    'A text without final punctuation',
+    'Line\nbreaks inside a text.\nAnd a paragraph\n\nafter a blank line.',
+    '𝒳 starts with a non-BMP character 😀😀',
+    'Ünïcödé wörds ärë fïnë.',
+]
+
+
+@pytest.fixture
+def tagger(corenlp_server):
+    return PosTaggingCoreNLP('127.0.0.1', corenlp_server.server_address[1])
+
+
+def test_packed_results_equal_tagging_each_text(tagger, corenlp_server):
+    expected = [tagger.pos_tag_raw_text(text) for text in TEXTS]
+    nb_requests = corenlp_server.nb_requests
+
+    assert tagger.pos_tag_raw_texts(TEXTS) == expected
+    assert corenlp_server.nb_requests == nb_requests + 1
+    assert tagger.pos_tag_raw_texts(TEXTS, as_tuple_list=False) == \
+        [tagger.pos_tag_raw_text(text, as_tuple_list=False) for text in TEXTS]
+
+
+def test_long_batch_is_split(tagger, corenlp_server):
+    texts = TEXTS * 5
+    max_chars = 250
+    expected = [tagger.pos_tag_raw_text(text) for text in texts]
+    nb_requests = corenlp_server.nb_requests
+
+    assert tagger.pos_tag_raw_texts(texts, max_chars=max_chars) == expected
+    packed_requests = corenlp_server.texts[nb_requests:]
+    assert len(packed_requests) > 1
+    assert all(len(text) <= max_chars for text in packed_requests)
+    assert PACKED_TEXT_BOUNDARY.join(packed_requests) == PACKED_TEXT_BOUNDARY.join(texts)
+
+
+def test_pack_texts():
+    texts = ['a' * 10, 'b' * 10, 'c' * 30, 'd' * 5, 'e' * 5]
+    packs = list(_pack_texts(texts, 25))
+
+    # A text longer than max_chars is sent alone
+    assert packs == [texts[:2], texts[2:3], texts[3:]]
+    assert all(len(PACKED_TEXT_BOUNDARY.join(pack)) <= 25 for pack in packs if len(pack) > 1)
+    assert list(_pack_texts([], 25)) == []
+
+
+def test_fallback_when_a_sentence_overlaps_two_texts(tagger, corenlp_server):
+    # Without the newline rule, the sentence ending a text without final punctuation continues in the next text
+    corenlp_server.newline_is_sentence_break = False
+    expected = [tagger.pos_tag_raw_text(text) for text in TEXTS]
+    nb_requests = corenlp_server.nb_requests
+
+    with pytest.warns(UserWarning, match='overlaps'):
+        assert tagger.pos_tag_raw_texts(TEXTS) == expected
+    # The packed request, then one request per text
+    assert corenlp_server.nb_requests == nb_requests + 1 + len(TEXTS)
@@ -0,0 +1,105 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""@PosTaggingSpacy with a given pipeline and the mapping of the spaCy tags (no spaCy model needed)"""
+
+from collections import namedtuple
+
+import pytest
+
+from swisscom_ai.research_keyphrase.model.extractor import extract_candidates
+from swisscom_ai.research_keyphrase.model.input_representation import InputTextObj
+from swisscom_ai.research_keyphrase.preprocessing.postagging import (UD_TO_FRENCH_TREEBANK, PosTaggingSpacy,
+                                                                     spacy_token_tag)
+
+Token = namedtuple('Token', ['text', 'tag_', 'pos_', 'is_space'])
+Doc = namedtuple('Doc', ['sents'])
+
+
+class StubPipeline:
+    """
+    Stand-in for a loaded spaCy pipeline : each text is a sentence per line of 'word/TAG/POS' tokens, records the
+    calls of pipe and fails if the pipeline is modified
+    """
+
+    def __init__(self, pipe_names, disabled=()):
+        self.pipe_names = list(pipe_names)
+        self.disabled = list(disabled)
+        self.meta = {'lang': 'xx', 'name': 'stub', 'version': '1.0'}
+        self.pipe_kwargs = []
+
+    def enable_pipe(self, name):
+        raise AssertionError('The pipeline of the caller was modified')
+
+    disable_pipe = enable_pipe
+
+    def pipe(self, texts, batch_size=64, **kwargs):
+        self.pipe_kwargs.append(kwargs)
+        for text in texts:
+            yield Doc([[token(spec) for spec in line.split(' ')] for line in text.split(' \\ ')])
+
+
+def token(spec):
+    if spec == '_':
+        return Token(' ', '_SP', 'SPACE', True)
+    text, tag, pos = spec.split('/')
+    return Token(text, tag, pos, False)
+
+
+def test_given_pipeline_is_not_modified():
+    nlp = StubPipeline(['tok2vec', 'tagger', 'parser', 'senter'])
+    tagger = PosTaggingSpacy(nlp)
+
+    assert tagger.pos_tag_raw_text('Neural/JJ/ADJ networks/NNS/NOUN') == [[('Neural', 'JJ'), ('networks', 'NNS')]]
+    # The sentence recognizer splits the sentences, the parser is skipped for each call only
+    assert nlp.pipe_kwargs == [{'disable': ['parser']}]
+    assert nlp.pipe_names == ['tok2vec', 'tagger', 'parser', 'senter']
+    assert tagger.configuration_id().endswith(':xx_stub-1.0:tok2vec,tagger,senter')
+
+
+@pytest.mark.parametrize('pipe_names,disabled,use_senter', [
+    (['tok2vec', 'tagger', 'parser'], ['senter'], True),  # senter disabled by the caller : the parser splits
+    (['tok2vec', 'tagger', 'parser', 'senter'], [], False),
+    (['tok2vec', 'tagger', 'senter'], [], True),
+])
+def test_given_pipeline_used_as_it_is(pipe_names, disabled, use_senter):
+    nlp = StubPipeline(pipe_names, disabled)
+    tagger = PosTaggingSpacy(nlp, use_senter=use_senter)
+
+    tagger.pos_tag_many(['a/DT/DET', 'b/NN/NOUN'])
+    assert nlp.pipe_kwargs == [{}]
+    assert tagger.configuration_id().endswith(':' + ','.join(pipe_names))
+
+
+def test_spaces_and_empty_sentences_are_dropped():
+    tagger = PosTaggingSpacy(StubPipeline(['tagger', 'parser']))
+
+    tagged = tagger.pos_tag_many(['Deep/JJ/ADJ _ learning/NN/NOUN \\ _', 'Graphs/NNS/NOUN'], as_tuple_list=False)
+    assert tagged == ['Deep|JJ learning|NN', 'Graphs|NNS']
+
+
+def test_spacy_token_tag():
+    # Fine-grained tags for en (Penn Treebank) and de (STTS), universal tag if there is none
+    assert spacy_token_tag(Token('networks', 'NNS', 'NOUN', False), 'en') == 'NNS'
+    assert spacy_token_tag(Token('Bahn', 'NN', 'NOUN', False), 'de') == 'NN'
+    assert spacy_token_tag(Token('deutsche', 'ADJA', 'ADJ', False), 'de') == 'ADJA'
+    assert spacy_token_tag(Token('x', '', 'X', False), 'en') == 'X'
+
+    # fr models have no fine-grained tags : universal tags mapped to the French Treebank
+    assert spacy_token_tag(Token('réseau', 'NOUN', 'NOUN', False), 'fr') == 'NC'
+    assert spacy_token_tag(Token('Paris', 'PROPN', 'PROPN', False), 'fr') == 'NPP'
+    assert spacy_token_tag(Token('neuronal', 'ADJ', 'ADJ', False), 'fr') == 'ADJ'
+    assert spacy_token_tag(Token('3', 'NUM', 'NUM', False), 'fr') == 'NUM'
+    assert set(UD_TO_FRENCH_TREEBANK.values()) >= {'NC', 'NPP', 'ADJ', 'V', 'P', 'DET'}
+
+
+def test_french_tags_match_the_grammar():
+    tagger = PosTaggingSpacy(StubPipeline(['tagger', 'parser']), lang='fr')
+    tagged = tagger.pos_tag_raw_text('les/DET/DET réseaux/NOUN/NOUN neuronaux/ADJ/ADJ de/ADP/ADP Google/PROPN/PROPN '
+                                     'apprennent/VERB/VERB')
+
+    assert tagged == [[('les', 'DET'), ('réseaux', 'NC'), ('neuronaux', 'ADJ'), ('de', 'P'), ('Google', 'NPP'),
+                       ('apprennent', 'V')]]
+    assert sorted(extract_candidates(InputTextObj(tagged, 'fr'))) == ['google', 'réseaux neuronaux']
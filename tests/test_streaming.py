@@ -0,0 +1,151 @@
+# Copyright (c) 2017-present, Swisscom (Schweiz) AG.
+# All rights reserved.
+#
+#Authors: Kamil Bennani-Smires, Yann Savary
+
+"""@StreamingPipeline : ordering, error propagation, early stop, bounded in-flight items and stats"""
+
+import random
+import threading
+import time
+
+import pytest
+
+from swisscom_ai.research_keyphrase.pipeline.streaming import Stage, StreamingPipeline
+
+
+def slow_double(value):
+    time.sleep(random.uniform(0, 0.005))
+    return 2 * value
+
+
+def increment(value):
+    return value + 1
+
+
+def pipeline_threads():
+    return [thread for thread in threading.enumerate() if thread is not threading.current_thread()
+            and thread.daemon and thread.name.startswith('Thread-')]
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_results_and_order(ordered):
+    pipeline = StreamingPipeline([Stage('double', slow_double, workers=4), Stage('increment', increment, workers=2)],
+                                 queue_size=4, ordered=ordered)
+    results = list(pipeline.run(range(200), key=lambda item: 'doc{}'.format(item)))
+
+    assert all(result.error is None for result in results)
+    assert sorted((result.key, result.value) for result in results) == \
+        sorted(('doc{}'.format(item), 2 * item + 1) for item in range(200))
+    if ordered:
+        assert [result.key for result in results] == ['doc{}'.format(item) for item in range(200)]
+
+
+def test_stage_error_skips_next_stages():
+    def fail_on_multiple_of_seven(value):
+        if value % 7 == 0:
+            raise ValueError(value)
+        return value
+
+    pipeline = StreamingPipeline([Stage('check', fail_on_multiple_of_seven, workers=3), Stage('increment', increment)],
+                                 ordered=True)
+    results = list(pipeline.run(range(50)))
+
+    assert [result.key for result in results] == list(range(50))
+    for result in results:
+        if result.key % 7 == 0:
+            assert isinstance(result.error, ValueError) and result.value is None
+        else:
+            assert result.error is None and result.value == result.key + 1
+    stats = {stage['stage']: stage for stage in pipeline.stats()}
+    assert stats['check']['processed'] == 50
+    assert stats['increment']['processed'] == 50 - 8
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_input_error_is_raised_after_the_items_read_before(ordered):
+    def items():
+        yield from range(10)
+        raise IOError('corrupted corpus')
+
+    pipeline = StreamingPipeline([Stage('increment', increment, workers=2)], ordered=ordered)
+    results = []
+    with pytest.raises(IOError, match='corrupted corpus'):
+        for result in pipeline.run(items()):
+            results.append(result)
+    assert sorted(result.value for result in results) == list(range(1, 11))
+
+
+def test_closing_the_generator_stops_the_workers():
+    nb_read = [0]
+
+    def items():
+        for item in range(10 ** 6):
+            nb_read[0] += 1
+            yield item
+
+    before = set(pipeline_threads())
+    pipeline = StreamingPipeline([Stage('double', slow_double, workers=4), Stage('increment', increment)],
+                                 queue_size=2)
+    results = pipeline.run(items())
+    for _ in range(5):
+        next(results)
+    results.close()
+
+    assert set(pipeline_threads()) == before
+    read = nb_read[0]
+    time.sleep(0.2)
+    assert nb_read[0] == read < 100
+
+
+def test_ordered_mode_bounds_the_items_in_flight():
+    head_released = threading.Event()
+    nb_read = [0]
+
+    def items():
+        for item in range(1000):
+            nb_read[0] += 1
+            yield item
+
+    def slow_head(value):
+        if value == 0:
+            head_released.wait(10)
+        return value
+
+    pipeline = StreamingPipeline([Stage('slow_head', slow_head, workers=4)], queue_size=2, ordered=True,
+                                 max_in_flight=10)
+    results = pipeline.run(items())
+    consumer = threading.Thread(target=lambda: consumed.extend(results))
+    consumed = []
+    consumer.start()
+
+    time.sleep(0.5)  # The other workers keep processing while the first item is blocked
+    assert nb_read[0] <= 10 + 1  # The feeder reads the next item before waiting for a free slot
+    assert consumed == []
+
+    head_released.set()
+    consumer.join(10)
+    assert [result.value for result in consumed] == list(range(1000))
+
+
+def test_invalid_max_in_flight():
+    with pytest.raises(ValueError):
+        StreamingPipeline([Stage('increment', increment)], ordered=True, max_in_flight=0)
+
+
+def test_stats():
+    pipeline = StreamingPipeline([Stage('double', slow_double, workers=2), Stage('increment', increment)])
+    assert pipeline.stats() == []
+
+    list(pipeline.run(range(30)))
+    stats = pipeline.stats()
+
+    assert [stage['stage'] for stage in stats] == ['double', 'increment']
+    assert [stage['workers'] for stage in stats] == [2, 1]
+    assert all(stage['processed'] == 30 for stage in stats)
+    assert all(stage['throughput'] > 0 and stage['busy_time'] >= 0 for stage in stats)
+    assert all(0 <= stage['mean_queue_depth'] <= stage['max_queue_depth'] <= 16 for stage in stats)
+
+    # A second run resets the stats
+    list(pipeline.run(range(5)))
+    assert all(stage['processed'] == 5 for stage in pipeline.stats())